@@ -1,6 +1,10 @@
 # -*- mode: python ; coding: utf-8 -*-
 from PyInstaller.utils.hooks import collect_all
 from gpustack_helper.tools import download, get_package_dir
+from gpustack_helper.dedup import dedup
+from gpustack_helper.updates import public_key_datas
+from gpustack_helper.ui_assets import precompress, print_report, remove_siblings, spec_precompress
+from gpustack_helper.bundle_bench import spec_optimize, spec_upx, write_size_report
 import os
 
 # 
@@ -16,9 +20,17 @@ datas = [
   (os.path.join(get_package_dir('gpustack.detectors.fastfetch'),'*.jsonc'), './gpustack/detectors/fastfetch/'),
   ('./tray_icon.png', './'),
 ]
+# the key latest.json of the update channel is signed with
+datas += public_key_datas(os.path.join(os.getcwd(), 'build'))
 
 # keep it for testing. Will be removed if ci is added.
 download()
+# GPUSTACK_PRECOMPRESS_UI=0 builds without the precompressed siblings of
+# the web console, removing the ones an earlier build left in the package
+if spec_precompress():
+    print_report(precompress(get_package_dir('gpustack.ui')))
+else:
+    remove_siblings(get_package_dir('gpustack.ui'))
 
 binaries = []
 hiddenimports = []
@@ -37,7 +49,7 @@ helper = Analysis(
     runtime_hooks=[],
     excludes=[],
     noarchive=False,
-    optimize=0,
+    optimize=spec_optimize(),
 )
 
 helper_pyz = PYZ(helper.pure)
@@ -51,7 +63,7 @@ helper_exe = EXE(
     debug=False,
     bootloader_ignore_signals=False,
     strip=False,
-    upx=True,
+    upx=spec_upx(),
     console=False,
     disable_windowed_traceback=False,
     argv_emulation=True,
@@ -71,7 +83,7 @@ gpustack = Analysis(
     runtime_hooks=[],
     excludes=[],
     noarchive=False,
-    optimize=0,
+    optimize=spec_optimize(),
 )
 gpustack_pyz = PYZ(gpustack.pure)
 gpustack_exe = EXE(
@@ -83,7 +95,7 @@ gpustack_exe = EXE(
     debug=False,
     bootloader_ignore_signals=False,
     strip=False,
-    upx=True,
+    upx=spec_upx(),
     console=False,
     disable_windowed_traceback=False,
     argv_emulation=True,
@@ -101,7 +113,7 @@ vox_box_exe = EXE(
     debug=False,
     bootloader_ignore_signals=False,
     strip=False,
-    upx=True,
+    upx=spec_upx(),
     console=False,
     disable_windowed_traceback=False,
     argv_emulation=True,
@@ -119,7 +131,7 @@ coll = COLLECT(
     gpustack.binaries,
     gpustack.datas,
     strip=False,
-    upx=True,
+    upx=spec_upx(),
     upx_exclude=[],
     name='main',
 )
@@ -142,3 +154,12 @@ app = BUNDLE(
         'LSUIElement': True,
     },
 )
+
+# sizes per package of every analysis, see gpustack_helper/bundle_bench.py
+write_size_report({'helper': helper, 'gpustack': gpustack}, os.path.join(DISTPATH, 'bundle-sizes.json'))
+
+# replace identical files collected by both analyses with hardlinks
+dedup(os.path.join(DISTPATH, f'{app_name}.app'))
+
+# no update manifest in the bundle, any file added after BUNDLE breaks its
+# code signature. The updater scans the installed app instead.
@@ -0,0 +1,201 @@
+import hashlib
+import json
+import os
+import shutil
+import sys
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Optional
+from platformdirs import user_cache_dir
+
+default_cache_dir = os.getenv(
+    "GPUSTACK_TOOLS_CACHE",
+    os.path.join(user_cache_dir("GPUStack", appauthor=False), "tools"),
+)
+_hash_buffer = 1024 * 1024
+checksums_name = "sha256sum.txt"
+# release archive of each installed llama-box binary, kept next to the
+# binaries so the mirror can rebuild the release layout from the bundle
+installed_release_name = "release.json"
+# linux ioctl cloning a file on btrfs/xfs
+_FICLONE = 0x40049409
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(_hash_buffer), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _reflink(src: Path, dst: Path) -> bool:
+    """
+    Clone src to dst sharing the blocks copy-on-write, if the filesystem
+    supports it (APFS, btrfs, xfs).
+    """
+    if sys.platform == "darwin":
+        import ctypes
+
+        libc = ctypes.CDLL(None, use_errno=True)
+        return libc.clonefile(os.fsencode(src), os.fsencode(dst), 0) == 0
+    if sys.platform.startswith("linux"):
+        import fcntl
+
+        with open(src, "rb") as s, open(dst, "wb") as d:
+            try:
+                fcntl.ioctl(d.fileno(), _FICLONE, s.fileno())
+                return True
+            except OSError:
+                pass
+        os.remove(dst)
+    return False
+
+
+def link_or_copy(src: Path, dst: Path, hardlink: bool = True) -> str:
+    """
+    Place src at dst as cheaply as possible and return how it was done.
+    Hardlinks share the inode, they are only safe if dst is never written
+    in place afterwards.
+    """
+    if os.path.lexists(dst):
+        os.remove(dst)
+    if hardlink:
+        try:
+            os.link(src, dst)
+            return "hardlink"
+        except OSError:
+            # across filesystems or not supported, fall back
+            pass
+    try:
+        if _reflink(src, dst):
+            shutil.copystat(src, dst)
+            return "reflink"
+    except OSError:
+        if os.path.lexists(dst):
+            os.remove(dst)
+    shutil.copy2(src, dst)
+    return "copy"
+
+
+def clone_or_copy(src: Path, dst: Path, hardlink: bool = False) -> str:
+    """
+    Like link_or_copy, but a copy-on-write clone is preferred over a
+    hardlink: the clone is independent of src, the hardlink only falls back
+    for files which are never written in place.
+    """
+    if os.path.lexists(dst):
+        os.remove(dst)
+    try:
+        if _reflink(src, dst):
+            shutil.copystat(src, dst)
+            return "reflink"
+    except OSError:
+        if os.path.lexists(dst):
+            os.remove(dst)
+    return link_or_copy(src, dst, hardlink=hardlink)
+
+
+class ArtifactCache:
+    """
+    Content addressed store of downloaded tools shared by builds. Objects
+    are keyed by sha256, named refs point tools without published checksums
+    at the object of their last download. Verified release files are also
+    kept in the layout of the release server under mirror/, to be served to
+    the other nodes on the LAN.
+    """
+
+    root: Path
+
+    def __init__(self, root: str = default_cache_dir):
+        self.root = Path(root)
+
+    def object_path(self, key: str) -> Path:
+        key = key.lower()
+        return self.root / "objects" / key[:2] / key
+
+    def has(self, key: str) -> bool:
+        return self.object_path(key).is_file()
+
+    def put(self, key: str, path: Path, hardlink: bool = True) -> None:
+        target = self.object_path(key)
+        if target.is_file():
+            return
+        os.makedirs(target.parent, exist_ok=True)
+        tmp = target.with_name(f"{target.name}.{uuid.uuid4().hex}.tmp")
+        try:
+            link_or_copy(path, tmp, hardlink=hardlink)
+            os.replace(tmp, target)
+        finally:
+            if os.path.lexists(tmp):
+                os.remove(tmp)
+
+    def restore(
+        self, key: str, target: Path, hardlink: bool = True, verify: bool = False
+    ) -> Optional[str]:
+        """
+        Place the object at target, return how it was placed or None if it
+        isn't cached. With verify an object not matching its key, e.g. one
+        changed through a hardlink, is dropped instead.
+        """
+        source = self.object_path(key)
+        if not source.is_file():
+            return None
+        if verify and file_sha256(source) != key.lower():
+            os.remove(source)
+            return None
+        os.makedirs(target.parent, exist_ok=True)
+        return link_or_copy(source, target, hardlink=hardlink)
+
+    @property
+    def mirror_root(self) -> Path:
+        return self.root / "mirror"
+
+    def publish(self, url_path: str, path: Path) -> None:
+        """
+        Link a verified release file into the mirror at url_path, relative
+        to the base url. Release files are never written in place.
+        """
+        target = self.mirror_root / url_path
+        os.makedirs(target.parent, exist_ok=True)
+        tmp = target.with_name(f".{target.name}.{uuid.uuid4().hex}.tmp")
+        try:
+            link_or_copy(path, tmp)
+            os.replace(tmp, target)
+        finally:
+            if os.path.lexists(tmp):
+                os.remove(tmp)
+
+    def publish_checksums(self, url_dir: str, checksums: Dict[str, str]) -> Path:
+        """
+        Write the sha256sum.txt of url_dir into the mirror, listing only the
+        files which were published there.
+        """
+        directory = self.mirror_root / url_dir
+        os.makedirs(directory, exist_ok=True)
+        target = directory / checksums_name
+        tmp = directory / f".{checksums_name}.{uuid.uuid4().hex}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for name, checksum in sorted(checksums.items()):
+                if (directory / name).is_file():
+                    f.write(f"{checksum}  {name}\n")
+        os.replace(tmp, target)
+        return target
+
+    def _ref_path(self, name: str) -> Path:
+        return self.root / "refs" / f"{name}.json"
+
+    def get_ref(self, name: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._ref_path(name), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def set_ref(self, name: str, **data: Any) -> None:
+        path = self._ref_path(name)
+        os.makedirs(path.parent, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
@@ -0,0 +1,338 @@
+import argparse
+import json
+import logging
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# the spec files read them, so variants can be built without editing them
+UPX_ENV = "GPUSTACK_UPX"
+OPTIMIZE_ENV = "GPUSTACK_OPTIMIZE"
+size_report_name = "bundle-sizes.json"
+# commands exiting right after the imports, the first useful work
+default_commands: Dict[str, List[str]] = {
+    "gpustackhelper": ["--help"],
+    "gpustack": ["version"],
+    "vox-box": ["--help"],
+}
+_top_modules = 20
+
+
+def spec_upx() -> bool:
+    return os.getenv(UPX_ENV, "1") != "0"
+
+
+def spec_optimize() -> int:
+    return int(os.getenv(OPTIMIZE_ENV, "0"))
+
+
+def _file_size(path: Optional[str]) -> int:
+    try:
+        return os.path.getsize(path) if path else 0
+    except OSError:
+        return 0
+
+
+def _package_of(name: str, typecode: str) -> str:
+    if typecode == "PYMODULE":
+        return name.split(".", 1)[0]
+    return name.replace("\\", "/").split("/", 1)[0]
+
+
+def analysis_sizes(analysis) -> Dict[str, Any]:
+    """
+    Sizes of the inputs of a PyInstaller Analysis, by top level package and
+    by module. Pure modules are counted by their source size.
+    """
+    packages: Dict[str, int] = defaultdict(int)
+    modules: List[Tuple[str, int]] = []
+    kinds: Dict[str, int] = defaultdict(int)
+    for kind, toc in (
+        ("pure", analysis.pure),
+        ("binaries", analysis.binaries),
+        ("datas", analysis.datas),
+    ):
+        for name, path, typecode in toc:
+            size = _file_size(path)
+            packages[_package_of(name, typecode)] += size
+            kinds[kind] += size
+            modules.append((name, size))
+    modules.sort(key=lambda m: m[1], reverse=True)
+    return {
+        "total": sum(kinds.values()),
+        "kinds": dict(kinds),
+        "packages": dict(sorted(packages.items(), key=lambda p: p[1], reverse=True)),
+        "largest": dict(modules[:_top_modules]),
+    }
+
+
+def write_size_report(analyses: Dict[str, Any], path: str) -> str:
+    """
+    Write the sizes of the named Analysis objects, called from the specs.
+    """
+    report = {
+        "upx": spec_upx(),
+        "optimize": spec_optimize(),
+        "analyses": {name: analysis_sizes(a) for name, a in analyses.items()},
+    }
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    return path
+
+
+def dist_sizes(dist_dir: str) -> Dict[str, Any]:
+    """
+    On disk sizes of a collected app by top level entry of its contents,
+    after upx and bytecode compilation. Hardlinks are counted once.
+    """
+    seen = set()
+    entries: Dict[str, int] = defaultdict(int)
+    internal = os.path.join(dist_dir, "_internal")
+    base = internal if os.path.isdir(internal) else dist_dir
+    for root, _, names in os.walk(dist_dir):
+        for name in names:
+            path = os.path.join(root, name)
+            st = os.lstat(path)
+            if (st.st_dev, st.st_ino) in seen or os.path.islink(path):
+                continue
+            seen.add((st.st_dev, st.st_ino))
+            if path.startswith(base + os.sep):
+                entry = _package_of(os.path.relpath(path, base), "")
+            else:
+                # the executables, next to _internal
+                entry = f"./{os.path.relpath(path, dist_dir)}"
+            entries[entry] += st.st_size
+    return {
+        "total": sum(entries.values()),
+        "entries": dict(sorted(entries.items(), key=lambda e: e[1], reverse=True)),
+    }
+
+
+def _evict(paths: Iterable[str]) -> bool:
+    """
+    Drop the files from the page cache so the next start reads them from
+    disk. Return False if that isn't possible here, the start is warm then.
+    """
+    if sys.platform == "darwin":
+        # purge needs root
+        return subprocess.run(["purge"], capture_output=True).returncode == 0
+    if not hasattr(os, "posix_fadvise"):
+        return False
+    for path in paths:
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except OSError:
+            continue
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+    return True
+
+
+def _bundle_files(dist_dir: str) -> List[str]:
+    return [
+        os.path.join(root, name)
+        for root, _, names in os.walk(dist_dir)
+        for name in names
+    ]
+
+
+def _summary(samples: List[float]) -> Dict[str, Any]:
+    ordered = sorted(samples)
+    return {
+        "runs": ordered,
+        "min": ordered[0],
+        "median": statistics.median(ordered),
+        "p90": ordered[min(len(ordered) - 1, int(len(ordered) * 0.9))],
+    }
+
+
+def measure_startup(
+    dist_dir: str, binary: str, args: List[str], runs: int = 5
+) -> Dict[str, Any]:
+    """
+    Time exec to exit of a frozen binary, cold (bundle evicted from the
+    page cache before every run) and warm. Cold runs which couldn't evict
+    the bundle are marked as such, they are warm starts really.
+    """
+    path = os.path.join(dist_dir, binary + (".exe" if sys.platform == "win32" else ""))
+    files = _bundle_files(dist_dir)
+    result: Dict[str, Any] = {"command": [binary] + args}
+    for mode in ("cold", "warm"):
+        samples = []
+        evicted = True
+        if mode == "warm":
+            subprocess.run([path] + args, capture_output=True)
+        for _ in range(runs):
+            if mode == "cold":
+                evicted = _evict(files) and evicted
+            started = time.perf_counter()
+            completed = subprocess.run([path] + args, capture_output=True)
+            samples.append(time.perf_counter() - started)
+            if completed.returncode != 0:
+                result["returncode"] = completed.returncode
+        result[mode] = _summary(samples)
+    result["cold"]["evicted"] = evicted
+    if not evicted:
+        logger.warning(
+            f"{binary}: the bundle couldn't be evicted from the page cache, "
+            "the cold starts are warm (purge needs root on macOS)"
+        )
+    return result
+
+
+def measure(
+    dist_dir: str,
+    commands: Optional[Dict[str, List[str]]] = None,
+    runs: int = 5,
+) -> Dict[str, Any]:
+    results: Dict[str, Any] = {"dist": dist_sizes(dist_dir), "startup": {}}
+    report = os.path.join(dist_dir, os.pardir, size_report_name)
+    try:
+        with open(report, "r", encoding="utf-8") as f:
+            results["analysis"] = json.load(f)
+    except (OSError, ValueError):
+        logger.warning(f"No size report at {report}")
+    for binary, args in (commands or default_commands).items():
+        binary_path = os.path.join(dist_dir, binary)
+        if not os.path.exists(binary_path) and not os.path.exists(binary_path + ".exe"):
+            continue
+        results["startup"][binary] = measure_startup(dist_dir, binary, args, runs)
+    return results
+
+
+def build_variant(spec: str, upx: bool, optimize: int, out_dir: str) -> str:
+    """
+    Build spec with the given upx and optimize settings into out_dir and
+    return the collected app directory.
+    """
+    env = dict(
+        os.environ, **{UPX_ENV: "1" if upx else "0", OPTIMIZE_ENV: str(optimize)}
+    )
+    subprocess.run(
+        [
+            sys.executable,
+            "-m",
+            "PyInstaller",
+            spec,
+            "-y",
+            "--distpath",
+            os.path.join(out_dir, "dist"),
+            "--workpath",
+            os.path.join(out_dir, "build"),
+        ],
+        env=env,
+        check=True,
+    )
+    return os.path.join(out_dir, "dist", "main")
+
+
+def compare(
+    spec: str, variants: List[Tuple[bool, int]], out_dir: str, runs: int = 5
+) -> Dict[str, Any]:
+    results: Dict[str, Any] = {
+        "spec": spec,
+        "platform": sys.platform,
+        "upx_available": shutil.which("upx") is not None,
+        "variants": {},
+    }
+    for upx, optimize in variants:
+        name = f"upx{int(upx)}-O{optimize}"
+        dist_dir = build_variant(spec, upx, optimize, os.path.join(out_dir, name))
+        results["variants"][name] = measure(dist_dir, runs=runs)
+    return results
+
+
+def check_budget(results: Dict[str, Any], budget: Dict[str, Any]) -> List[str]:
+    """
+    Return the violations of a budget like
+    {"max_total_bytes": 1e9, "max_cold_seconds": {"gpustack": 5},
+     "max_warm_seconds": {"gpustack": 2}}, checked for every variant.
+    """
+    violations = []
+    for name, variant in results["variants"].items():
+        total = variant["dist"]["total"]
+        if total > budget.get("max_total_bytes", float("inf")):
+            violations.append(f"{name}: {total} bytes")
+        for mode in ("cold", "warm"):
+            limits = budget.get(f"max_{mode}_seconds", {})
+            for binary, startup in variant["startup"].items():
+                if binary in limits and not startup[mode].get("evicted", True):
+                    # a warm start would pass the cold limit unnoticed
+                    violations.append(f"{name}: {binary} {mode} start not measured")
+                    continue
+                median = startup[mode]["median"]
+                if median > limits.get(binary, float("inf")):
+                    violations.append(f"{name}: {binary} {mode} start {median:.2f}s")
+    return violations
+
+
+def _print_summary(results: Dict[str, Any]) -> None:
+    for name, variant in results["variants"].items():
+        print(f"{name}: {variant['dist']['total'] / 2**20:.1f} MiB")
+        for entry, size in list(variant["dist"]["entries"].items())[:10]:
+            print(f"  {entry}: {size / 2**20:.1f} MiB")
+        for binary, startup in variant["startup"].items():
+            cold = "cold" if startup["cold"].get("evicted", True) else "not evicted"
+            print(
+                f"  {binary}: {cold} {startup['cold']['median']:.2f}s, "
+                f"warm {startup['warm']['median']:.2f}s"
+            )
+
+
+def _variant(value: str) -> Tuple[bool, int]:
+    # e.g. upx1-O2, or 0:2
+    value = value.replace("upx", "").replace("-O", ":")
+    upx, optimize = value.split(":")
+    return upx == "1", int(optimize)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Bundle size and startup benchmark")
+    parser.add_argument("--spec", default="darwin.spec")
+    parser.add_argument(
+        "--variant",
+        action="append",
+        type=_variant,
+        help="upx and optimize level as upx1-O0, may be repeated",
+    )
+    parser.add_argument(
+        "--dist", default=None, help="measure a built app instead of building"
+    )
+    parser.add_argument("--out", default=os.path.join("build", "bundle-bench"))
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--output", default="bundle-bench.json")
+    parser.add_argument("--budget", default=None, help="json file with the budget")
+    args = parser.parse_args()
+
+    if args.dist:
+        results = {
+            "platform": sys.platform,
+            "variants": {"dist": measure(args.dist, runs=args.runs)},
+        }
+    else:
+        variants = args.variant or [(True, 0), (False, 0), (True, 2)]
+        results = compare(args.spec, variants, args.out, args.runs)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    _print_summary(results)
+    if args.budget:
+        with open(args.budget, "r", encoding="utf-8") as f:
+            violations = check_budget(results, json.load(f))
+        for violation in violations:
+            print(f"over budget: {violation}")
+        return 1 if violations else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,6 @@
 import yaml
 import os
+import sys
 import logging
 import threading
 import plistlib
@@ -19,6 +20,7 @@ from gpustack_helper.defaults import (
 
 logger = logging.getLogger(__name__)
 helper_config_file_name = "ai.gpustack.plist"
+helper_settings_file_name = "helper.yaml"
 
 
 class _FileConfigModel(BaseModel):
@@ -108,6 +110,17 @@ class CleanConfig(_FileConfigModel, Config):
         )
 
 
+# nssm only settings, launchd has no counterpart for them
+windows_only_keys = ("AppPriority", "AppAffinity")
+process_types = ("Background", "Standard", "Adaptive", "Interactive")
+
+
+class _ResourceLimits(BaseModel):
+    NumberOfFiles: Optional[int] = Field(
+        default=None, description="最大打开文件数, 为空时使用系统默认值"
+    )
+
+
 class _HelperConfig(BaseModel):
     Label: str = Field(default="ai.gpustack", description="服务名称")
     ProgramArguments: List[str] = Field(
@@ -127,6 +140,87 @@ class _HelperConfig(BaseModel):
     EnvironmentVariables: Dict[str, str] = Field(
         default_factory=dict, description="环境变量配置"
     )
+    ProcessType: Optional[str] = Field(
+        default=None,
+        description="launchd 调度类型, Background/Standard/Adaptive/Interactive",
+    )
+    Nice: Optional[int] = Field(default=None, description="进程 nice 值, -20 到 20")
+    LowPriorityIO: Optional[bool] = Field(
+        default=None, description="是否以低优先级进行磁盘 IO"
+    )
+    SoftResourceLimits: _ResourceLimits = Field(
+        default_factory=_ResourceLimits, description="软资源限制"
+    )
+    HardResourceLimits: _ResourceLimits = Field(
+        default_factory=_ResourceLimits, description="硬资源限制"
+    )
+    AppPriority: Optional[str] = Field(
+        default=None, description="nssm 进程优先级, 如 HIGH_PRIORITY_CLASS"
+    )
+    AppAffinity: Optional[str] = Field(
+        default=None, description="nssm 进程 CPU 亲和性, 如 0-3,6, 为空时不限制"
+    )
+
+
+class _HelperSettings(BaseModel):
+    """
+    Settings which only affect the helper itself. They are kept out of the
+    launchd plist / nssm registry so the service definition stays untouched.
+    """
+
+    proxy_enabled: bool = Field(default=False, description="是否启用前置代理")
+    proxy_internal_port: int = Field(
+        default=18080, description="启用代理时 GPUStack 实际监听的内部端口"
+    )
+    proxy_queue_size: int = Field(
+        default=128, description="服务重启期间最多排队等待的连接数"
+    )
+    proxy_queue_timeout: float = Field(
+        default=30.0, description="排队连接等待服务恢复的超时时间(秒)"
+    )
+    mirror_enabled: bool = Field(
+        default=False, description="是否在局域网内提供工具下载镜像"
+    )
+    mirror_port: int = Field(default=10161, description="工具下载镜像的监听端口")
+    qos_enabled: bool = Field(
+        default=False, description="用户使用电脑时是否降低服务的 CPU 和 IO 优先级"
+    )
+    qos_idle_seconds: float = Field(
+        default=30.0, description="用户输入后多少秒内视为正在使用电脑"
+    )
+    qos_restore_seconds: float = Field(
+        default=300.0, description="用户空闲多少秒后恢复服务的优先级"
+    )
+    qos_affinity: str = Field(
+        default="", description="降低优先级时服务可使用的 CPU, 如 0-3, 为空时不限制"
+    )
+    update_base_url: str = Field(
+        default="", description="增量更新服务器地址, 为空时不检查更新"
+    )
+    preflight_min_free_gb: float = Field(
+        default=5.0, description="启动前检查数据目录所在磁盘的最小剩余空间(GiB)"
+    )
+    log_rotate_bytes: int = Field(
+        default=256 * 1024 * 1024, description="日志超过该大小(字节)时轮转, 0 为不限制"
+    )
+    log_rotate_seconds: int = Field(
+        default=0, description="日志超过该时长(秒)时轮转, 0 为不限制"
+    )
+    log_keep: int = Field(default=5, description="保留的轮转日志数量")
+    log_compression: str = Field(
+        default="gzip", description="轮转日志的压缩方式: none, gzip 或 zstd"
+    )
+    snapshot_dir: str = Field(
+        default="", description="快照目录, 为空时使用数据目录旁的 .snapshots 目录"
+    )
+    snapshot_keep: int = Field(default=5, description="保留的快照数量, 0 为不限制")
+    snapshot_max_age_days: int = Field(
+        default=0, description="快照保留的最长天数, 0 为不限制"
+    )
+
+
+class HelperSettings(_FileConfigModel, _HelperSettings):
+    pass
 
 
 class HelperConfig(_FileConfigModel, _HelperConfig):
@@ -135,7 +229,15 @@ class HelperConfig(_FileConfigModel, _HelperConfig):
     _debug: bool = None
 
     def encode_to_data(self) -> bytes:
-        return plistlib.dumps(self.model_dump(by_alias=True, exclude_none=True))
+        data = self.model_dump(by_alias=True, exclude_none=True)
+        for key in ("SoftResourceLimits", "HardResourceLimits"):
+            # no limit set, leave the key out instead of an empty dict
+            if not data.get(key):
+                data.pop(key, None)
+        if sys.platform == "darwin":
+            for key in windows_only_keys:
+                data.pop(key, None)
+        return plistlib.dumps(data)
 
     def decode_from_data(self, f: BinaryIO) -> Dict[str, Any]:
         return plistlib.load(f)
@@ -171,6 +273,14 @@ class HelperConfig(_FileConfigModel, _HelperConfig):
             self.active_data_dir, os.path.join(self.user_data_dir, gpustack_config_name)
         )
 
+    @property
+    def helper_settings(self) -> HelperSettings:
+        # kept next to the helper config, so a privileged process started
+        # with --config finds the settings of the user
+        return HelperSettings(
+            os.path.join(os.path.dirname(self.filepath), helper_settings_file_name)
+        )
+
     @property
     def gpustack_binary_path(self):
         return _default_path(gpustack_binary_path, self._override_binary_path)
@@ -212,12 +322,23 @@ class HelperConfig(_FileConfigModel, _HelperConfig):
         Returns the default program arguments for the GPUStack service.
         """
         gpustack_config = self.user_gpustack_config
-        return [
+        args = [
             self.gpustack_binary_path,
             "start",
             f"--config-file={os.path.abspath(gpustack_config.active_config_path)}",
             f"--data-dir={os.path.abspath(self.active_data_dir)}",
         ]
+        settings = self.helper_settings
+        if settings.proxy_enabled:
+            # the front proxy owns the user facing port, gpustack listens on
+            # the internal port on loopback only.
+            args.extend(
+                [
+                    "--host=127.0.0.1",
+                    f"--port={settings.proxy_internal_port}",
+                ]
+            )
+        return args
 
 
 def _default_path(default: str, override: Optional[str] = None) -> str:
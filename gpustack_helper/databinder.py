@@ -1,13 +1,12 @@
-from PySide6.QtCore import Qt, QObject, Signal, Slot
+from PySide6.QtCore import QObject, Signal, Slot, QAbstractTableModel
 from PySide6.QtWidgets import (
+    QWidget,
     QLineEdit,
     QAbstractButton,
     QSpinBox,
-    QTableWidget,
     QComboBox,
-    QTableWidgetItem,
 )
-from typing import Callable, TypeVar, Type, Union, Dict, Any, Optional
+from typing import Callable, TypeVar, Type, Union, Dict, Any, Optional, List, Tuple
 from pydantic import BaseModel
 from PySide6.QtGui import QAction, QIntValidator
 from pydantic.fields import FieldInfo
@@ -35,10 +34,34 @@ def get_zero_value(t: Type[T]) -> T:
     return t()
 
 
+def _compile_getter(parts: Tuple[str, ...]) -> Callable[[BaseModel], Any]:
+    """
+    The accessor of a dotted field path, same as get_nested_field_value
+    without splitting the path on every call.
+    """
+    if len(parts) == 1:
+        name = parts[0]
+        return lambda model: getattr(model, name, None)
+
+    def _get(model: BaseModel) -> Any:
+        current = model
+        for part in parts:
+            current = getattr(current, part, None)
+            if current is None:
+                return None
+        return current
+
+    return _get
+
+
 class DataBinder(QObject):
     load_config = Signal(BaseModel)
     _key: str = None
+    _parts: Tuple[str, ...] = None
     _data_type: Type[T]
+    _zero_value: T = None
+    _get_value: Callable[[BaseModel], Any] = None
+    _widget: QObject = None
     _widget_getter: Callable[[], T] = None
     _widget_setter: Callable[[T], None] = None
     _ignore_zero_value: bool = False
@@ -48,7 +71,13 @@ class DataBinder(QObject):
         key: str,
         type_class: Type[T_BaseModel],
         widget: Union[
-            QAbstractButton, QSpinBox, QIntValidator, QLineEdit, QAction, QTableWidget
+            QAbstractButton,
+            QSpinBox,
+            QIntValidator,
+            QLineEdit,
+            QAction,
+            QAbstractTableModel,
+            QComboBox,
         ],
         /,
         ignore_zero_value=False,
@@ -63,7 +92,11 @@ class DataBinder(QObject):
                 f"type {base_type} is not supported, supported types are {supported_types}"
             )
         self._data_type = base_type
+        self._zero_value = get_zero_value(base_type)
         self._key = key
+        self._parts = tuple(key.split("."))
+        self._get_value = _compile_getter(self._parts)
+        self._widget = widget
         self._assign_widget_handlers(widget)
         self.load_config.connect(self._load_to_widget)
 
@@ -77,72 +110,118 @@ class DataBinder(QObject):
         elif isinstance(widget, QSpinBox):
             self._widget_getter = widget.value
             self._widget_setter = widget.setValue
-        elif isinstance(widget, QTableWidget):
-            self._widget_getter, self._widget_setter = self._table_widget_handlers(
-                widget
+        elif isinstance(widget, QComboBox):
+            # the item data is the stored value, the text is for display
+            self._widget_getter = widget.currentData
+            self._widget_setter = lambda value: widget.setCurrentIndex(
+                max(widget.findData(value), 0)
             )
+        elif isinstance(widget, QAbstractTableModel) and hasattr(widget, "load"):
+            # key-value models like quickconfig.envvar.EnvironmentVariableModel,
+            # which apply the difference on load instead of rebuilding
+            self._widget_getter = widget.to_dict
+            self._widget_setter = widget.load
         else:
             raise ValueError(
                 f"Widget {widget.__class__.__name__} has no text or isChecked method"
             )
 
-    def _table_widget_handlers(self, widget):
-        if widget.columnCount() != 2:
-            raise ValueError(
-                "QTableWidget must have exactly 2 columns for key-value pairs"
-            )
-
-        def _get_table_value() -> Dict[str, str]:
-            result = {}
-            for row in range(widget.rowCount()):
-                key_item = widget.cellWidget(row, 0)  # Assume first column is key
-                if isinstance(key_item, QComboBox):
-                    key = key_item.currentText()
-                else:
-                    continue
-                value_item = widget.item(row, 1)
-                if value_item and value_item.text() != "":
-                    result[key] = value_item.text()
-            return result
-
-        def _set_table_value(value: Dict[str, str]) -> None:
-            widget.setRowCount(0)
-            for k, v in value.items():
-                row_position = widget.rowCount()
-                widget.insertRow(row_position)
-                combo = QComboBox()
-                combo.setEditable(True)
-                combo.addItem(k)
-                widget.setCellWidget(row_position, 0, combo)
-                item = QTableWidgetItem(v)
-                item.setFlags(item.flags() | Qt.ItemFlag.ItemIsEditable)
-                widget.setItem(row_position, 1, item)
-
-        return _get_table_value, _set_table_value
-
     def ignore_zero_value(self, ignore: bool = True):
         self._ignore_zero_value = ignore
 
+    @property
+    def key(self) -> str:
+        return self._key
+
+    @property
+    def signal_source(self) -> Optional[QObject]:
+        """
+        The widget whose change signals fire on load. Models are left out,
+        their views repaint through those signals.
+        """
+        return None if isinstance(self._widget, QAbstractTableModel) else self._widget
+
+    def model_value(self, cfg: BaseModel) -> T:
+        attr = self._get_value(cfg)
+        return self._zero_value if attr is None else attr
+
+    def widget_value(self) -> T:
+        return self._widget_getter()
+
+    def set_widget_value(self, value: T) -> T:
+        """
+        Set the widget unless it shows value already, which would only cost
+        change signals and a repaint. Returns what the widget shows then,
+        a spin box clamps values out of its range.
+        """
+        current = self._widget_getter()
+        if current == value:
+            return current
+        self._widget_setter(value)
+        return self._widget_getter()
+
     @Slot(BaseModel)
     def _load_to_widget(self, cfg: BaseModel) -> None:
         if self._widget_setter is None:
             return
-        attr = get_nested_field_value(cfg, self._key, None)
-        value = get_zero_value(self._data_type) if attr is None else attr
-        self._widget_setter(value)
+        self._widget_setter(self.model_value(cfg))
 
     def update_config(self, content: Dict[str, Any]) -> None:
         value = self._widget_getter()
-        if value == get_zero_value(self._data_type) and self._ignore_zero_value:
+        if value == self._zero_value and self._ignore_zero_value:
             value = None
-        split_keys = self._key.split(".")
         current = content
-        for part in split_keys[:-1]:
-            if part not in current:
-                current[part] = {}
-            current = current[part]
+        for part in self._parts[:-1]:
+            current = current.setdefault(part, {})
         # 最后一个部分是实际的键
-        current[split_keys[-1]] = value
+        current[self._parts[-1]] = value
+
+
+class BindingPlan:
+    """
+    The binders of one model on a page, loaded in a single pass with the
+    change signals of the widgets blocked. Widgets already showing the value
+    are not touched, so they aren't repainted either. update_config() only
+    writes the keys whose widget changed since the last load.
+    """
+
+    _binders: Tuple[DataBinder, ...]
+    _loaded: Optional[List[Any]] = None
+
+    def __init__(self, binders: List[DataBinder]):
+        self._binders = tuple(binders)
+
+    def __len__(self) -> int:
+        return len(self._binders)
+
+    def load(self, cfg: BaseModel) -> None:
+        loaded = []
+        for binder in self._binders:
+            source = binder.signal_source
+            blocked = source.blockSignals(True) if source is not None else False
+            try:
+                loaded.append(binder.set_widget_value(binder.model_value(cfg)))
+            finally:
+                if source is not None:
+                    source.blockSignals(blocked)
+        # what the widgets show, so only edits of the user count as changes
+        self._loaded = loaded
+
+    def update_config(self, content: Dict[str, Any]) -> int:
+        """
+        Add the changed keys to content, nested by their path. Returns the
+        number of keys added.
+        """
+        changed = 0
+        for index, binder in enumerate(self._binders):
+            if (
+                self._loaded is not None
+                and binder.widget_value() == self._loaded[index]
+            ):
+                continue
+            binder.update_config(content)
+            changed += 1
+        return changed
 
 
 def get_nested_field_info(
@@ -241,3 +320,101 @@ def set_nested_data(
         return True
     except Exception:
         return False
+
+
+_bench_kinds = ((str, "QLineEdit"), (int, "QSpinBox"), (bool, "QCheckBox"))
+
+
+def _bench_value(kind: type, seed: int, i: int) -> Any:
+    if kind is str:
+        return f"{seed}-{i}"
+    if kind is int:
+        return (seed + i) % 100
+    return (seed + i) % 2 == 0
+
+
+def _bench_page(model: Type[BaseModel], flat: int, nested: int):
+    from PySide6 import QtWidgets
+
+    page = QWidget()
+    layout = QtWidgets.QFormLayout(page)
+    binders: List[DataBinder] = []
+    keys = [(f"f{i}", _bench_kinds[i % 3][1]) for i in range(flat)]
+    keys += [(f"inner.n{i}", "QLineEdit") for i in range(nested)]
+    for key, widget_class in keys:
+        widget = getattr(QtWidgets, widget_class)()
+        layout.addRow(key, widget)
+        binders.append(DataBinder(key, model, widget))
+    return page, binders
+
+
+def benchmark(bindings: int = 600, rounds: int = 20) -> None:
+    """
+    Load and save a page of line edits, spin boxes and check boxes, a tenth
+    of them bound to nested fields, through per binder signals and through
+    a BindingPlan.
+    """
+    import os
+    import time
+    from pydantic import create_model
+    from PySide6.QtWidgets import QApplication
+
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    app = QApplication.instance() or QApplication([])
+    nested = bindings // 10
+    flat = bindings - nested
+    Inner = create_model(
+        "Inner", **{f"n{i}": (Optional[str], None) for i in range(nested)}
+    )
+    fields: Dict[str, Any] = {"inner": (Inner, Inner())}
+    for i in range(flat):
+        fields[f"f{i}"] = (Optional[_bench_kinds[i % 3][0]], None)
+    Model = create_model("Model", **fields)
+    models = [
+        Model(
+            inner=Inner(**{f"n{i}": f"{seed}-{i}" for i in range(nested)}),
+            **{
+                f"f{i}": _bench_value(_bench_kinds[i % 3][0], seed, i)
+                for i in range(flat)
+            },
+        )
+        for seed in range(rounds)
+    ]
+    page, binders = _bench_page(Model, flat, nested)
+    page.show()
+    plan = BindingPlan(binders)
+
+    def per_binder(model: BaseModel) -> Dict[str, Any]:
+        for binder in binders:
+            binder.load_config.emit(model)
+        app.processEvents()
+        content: Dict[str, Any] = {}
+        for binder in binders:
+            binder.update_config(content)
+        return content
+
+    def planned(model: BaseModel) -> Dict[str, Any]:
+        plan.load(model)
+        app.processEvents()
+        # a user edit of one field
+        binders[0].set_widget_value("edited")
+        content: Dict[str, Any] = {}
+        plan.update_config(content)
+        return content
+
+    # every value changed, and reopening the dialog on the same config
+    for case, loads in (("changed", models), ("reopened", [models[0]] * rounds)):
+        for name, run in (("per binder", per_binder), ("plan", planned)):
+            started = time.perf_counter()
+            for model in loads:
+                content = run(model)
+            elapsed = (time.perf_counter() - started) / rounds
+            print(
+                f"{case}, {name}: {bindings} bindings, {elapsed * 1000:.1f}ms per "
+                f"load and save, {len(content)} keys saved"
+            )
+    page.close()
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,125 @@
+import os
+import stat
+import sys
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Tuple
+from gpustack_helper.artifacts import file_sha256
+
+# hardlink, symlink or off
+DEDUP_MODE = os.getenv("GPUSTACK_DEDUP_MODE", "hardlink")
+# small files don't save enough to be worth the hashing
+DEDUP_MIN_SIZE = int(os.getenv("GPUSTACK_DEDUP_MIN_SIZE", 64 * 1024))
+default_workers = min(4, os.cpu_count() or 1)
+
+
+@dataclass
+class DedupReport:
+    scanned: int = 0
+    groups: int = 0
+    replaced: int = 0
+    saved: int = 0
+
+
+def _same_size_files(root: str, min_size: int) -> List[List[List[str]]]:
+    """
+    Group the regular files by size and mode, only files of a group can be
+    identical. Within a group the paths are grouped by inode, files already
+    linked to each other are hashed once.
+    """
+    groups: Dict[Tuple[int, int], Dict[Tuple[int, int], List[str]]] = defaultdict(
+        lambda: defaultdict(list)
+    )
+    for dirpath, _, names in os.walk(root):
+        for name in names:
+            path = os.path.join(dirpath, name)
+            st = os.lstat(path)
+            if not stat.S_ISREG(st.st_mode) or st.st_size < min_size:
+                continue
+            inodes = groups[(st.st_size, st.st_mode & 0o7777)]
+            inodes[(st.st_dev, st.st_ino)].append(path)
+    return [list(g.values()) for g in groups.values() if len(g) > 1]
+
+
+def _shortest(paths: List[str]) -> str:
+    return min(paths, key=lambda p: (len(p), p))
+
+
+def find_duplicates(
+    root: str, min_size: int = DEDUP_MIN_SIZE, workers: int = default_workers
+) -> Tuple[int, List[List[List[str]]]]:
+    """
+    Return the number of files hashed and the groups of identical files
+    under root. Each group lists the paths of every distinct inode, the
+    inode with the shortest path comes first.
+    """
+    candidates = [paths for g in _same_size_files(root, min_size) for paths in g]
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="dedup") as pool:
+        digests = pool.map(lambda paths: file_sha256(paths[0]), candidates)
+        by_digest: Dict[Tuple[int, str], List[List[str]]] = defaultdict(list)
+        for paths, digest in zip(candidates, digests):
+            by_digest[(os.path.getsize(paths[0]), digest)].append(paths)
+    duplicates = [
+        sorted(inodes, key=lambda paths: (len(_shortest(paths)), _shortest(paths)))
+        for inodes in by_digest.values()
+        if len(inodes) > 1
+    ]
+    return len(candidates), duplicates
+
+
+def _replace_with_link(source: str, duplicate: str, mode: str) -> None:
+    tmp = os.path.join(os.path.dirname(duplicate), f".{uuid.uuid4().hex}.dedup")
+    if mode == "symlink":
+        os.symlink(os.path.relpath(source, os.path.dirname(duplicate)), tmp)
+    else:
+        os.link(source, tmp)
+    try:
+        os.replace(tmp, duplicate)
+    finally:
+        if os.path.lexists(tmp):
+            os.remove(tmp)
+
+
+def dedup(
+    root: str,
+    mode: str = DEDUP_MODE,
+    min_size: int = DEDUP_MIN_SIZE,
+    report: Callable[[str], None] = print,
+) -> DedupReport:
+    """
+    Replace identical files of the collected app with hardlinks or relative
+    symlinks to a single copy, run after COLLECT/BUNDLE. Only the macOS
+    build uses it, pkgbuild keeps the hardlinks. The Windows packaging
+    copies every link as a full file, so nothing would be saved there.
+    """
+    result = DedupReport()
+    if mode == "off":
+        return result
+    if mode not in ("hardlink", "symlink"):
+        raise ValueError(f"Unknown dedup mode {mode}")
+    result.scanned, duplicates = find_duplicates(root, min_size)
+    for inodes in duplicates:
+        source = _shortest(inodes[0])
+        result.groups += 1
+        for paths in inodes[1:]:
+            try:
+                for duplicate in paths:
+                    _replace_with_link(source, duplicate, mode)
+                    result.replaced += 1
+            except OSError as e:
+                # e.g. symlinks without privilege on windows, keep the copy
+                report(f"Failed to dedup {duplicate}: {e}")
+                continue
+            result.saved += os.path.getsize(source)
+    report(
+        f"Deduplicated {result.replaced} files in {result.groups} groups "
+        f"({result.scanned} hashed) under {root} with {mode}s, "
+        f"saved {result.saved / 2**20:.1f} MiB"
+    )
+    return result
+
+
+if __name__ == "__main__":
+    dedup(sys.argv[1], *sys.argv[2:3])
@@ -0,0 +1,429 @@
+import io
+import json
+import logging
+import os
+import platform
+import plistlib
+import re
+import subprocess
+import sys
+import tarfile
+import time
+import zipfile
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Any, BinaryIO, Callable, Dict, List, Optional, Tuple
+import yaml
+from gpustack_helper.config import HelperConfig
+from gpustack_helper.defaults import log_file_path, nssm_binary_path
+from gpustack_helper.logs.analytics import LogAnalyzer
+from gpustack_helper.logs.rotate import rotated_files
+
+logger = logging.getLogger(__name__)
+
+default_max_log_bytes = 32 * 1024 * 1024
+default_max_total_bytes = 128 * 1024 * 1024
+_copy_buffer = 1024 * 1024
+_line_scan_size = 64 * 1024
+_probe_timeout = 10
+
+_sensitive_key = re.compile(
+    r"token|password|passwd|secret|api[_-]?key|credential", re.IGNORECASE
+)
+# key=value or key: value pairs in free text, e.g. AppEnvironmentExtra
+_sensitive_text = re.compile(
+    r"(?i)\b([\w.-]*(?:token|password|passwd|secret|api[_-]?key|credential)"
+    r"[\w.-]*)(\s*[=:]\s*)(\"?)[^\s\"\\]+"
+)
+redacted = "<redacted>"
+
+
+def redact(value: Any) -> Any:
+    """
+    Replace the value of every sensitive looking key, recursively.
+    """
+    if isinstance(value, dict):
+        return {
+            k: (
+                redacted
+                if isinstance(k, str)
+                and _sensitive_key.search(k)
+                and not isinstance(v, (dict, list))
+                and v is not None
+                else redact(v)
+            )
+            for k, v in value.items()
+        }
+    if isinstance(value, list):
+        return [redact(v) for v in value]
+    if isinstance(value, str):
+        return redact_text(value)
+    return value
+
+
+def redact_text(text: str) -> str:
+    return _sensitive_text.sub(rf"\1\2\3{redacted}", text)
+
+
+def _redacted_file(path: str) -> Optional[bytes]:
+    """
+    Load a yaml or plist config and dump it again with secrets redacted. If
+    it can't be parsed the text itself is redacted.
+    """
+    try:
+        with open(path, "rb") as f:
+            raw = f.read()
+    except FileNotFoundError:
+        return None
+    except OSError as e:
+        return f"failed to read {path}: {e}\n".encode()
+    try:
+        if path.endswith(".plist"):
+            return plistlib.dumps(redact(plistlib.loads(raw)))
+        data = redact(yaml.safe_load(raw))
+        return yaml.safe_dump(data, allow_unicode=True).encode("utf-8")
+    except Exception:
+        return redact_text(raw.decode("utf-8", errors="replace")).encode("utf-8")
+
+
+def config_files(cfg: HelperConfig) -> List[Tuple[str, str]]:
+    """
+    (archive name, path) of the user and the active copies of the configs.
+    """
+    gpustack_config = cfg.user_gpustack_config
+    candidates = [
+        ("config/user/" + os.path.basename(cfg.filepath), cfg.filepath),
+        (
+            "config/user/" + os.path.basename(gpustack_config.filepath),
+            gpustack_config.filepath,
+        ),
+        (
+            "config/active/" + os.path.basename(cfg.active_config_path),
+            cfg.active_config_path,
+        ),
+        (
+            "config/active/" + os.path.basename(gpustack_config.active_config_path),
+            gpustack_config.active_config_path,
+        ),
+        (
+            "config/user/" + os.path.basename(cfg.helper_settings.filepath),
+            cfg.helper_settings.filepath,
+        ),
+    ]
+    seen = set()
+    files = []
+    for name, path in candidates:
+        if path in seen:
+            continue
+        seen.add(path)
+        files.append((name, path))
+    return files
+
+
+def probe_commands() -> List[Tuple[str, List[str]]]:
+    if sys.platform == "darwin":
+        return [
+            ("launchctl-print.txt", ["launchctl", "print", "system/ai.gpustack"]),
+            (
+                "launchctl-print-logrotate.txt",
+                ["launchctl", "print", "system/ai.gpustack.logrotate"],
+            ),
+        ]
+    if sys.platform == "win32":
+        return [
+            ("nssm-status.txt", [nssm_binary_path, "status", "gpustack"]),
+            (
+                "registry.txt",
+                [
+                    "reg",
+                    "query",
+                    r"HKLM\SYSTEM\CurrentControlSet\Services\gpustack",
+                    "/s",
+                ],
+            ),
+        ]
+    return []
+
+
+def run_probe(args: List[str]) -> bytes:
+    try:
+        result = subprocess.run(
+            args, capture_output=True, timeout=_probe_timeout, check=False
+        )
+        output = (result.stdout + result.stderr).decode("utf-8", errors="replace")
+        output = f"$ {' '.join(args)}\nexit code: {result.returncode}\n\n{output}"
+    except (OSError, subprocess.TimeoutExpired) as e:
+        output = f"$ {' '.join(args)}\nfailed: {e}\n"
+    return redact_text(output).encode("utf-8")
+
+
+class _BoundedReader(io.RawIOBase):
+    """
+    Read exactly `size` bytes from the current position. A log truncated
+    by rotation while it's being exported is padded with newlines, the
+    archive entry size has to be known up front for tar.
+    """
+
+    def __init__(self, f: BinaryIO, size: int):
+        self._f = f
+        self._left = size
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        size = min(len(buffer), self._left)
+        if size <= 0:
+            return 0
+        data = self._f.read(size) or b"\n" * size
+        buffer[: len(data)] = data
+        self._left -= len(data)
+        return len(data)
+
+
+class _Archive(ABC):
+    @abstractmethod
+    def add_bytes(self, name: str, data: bytes) -> None:
+        pass
+
+    @abstractmethod
+    def add_stream(self, name: str, f: BinaryIO, size: int) -> None:
+        """
+        Add exactly size bytes read from f.
+        """
+
+    @abstractmethod
+    def close(self) -> None:
+        pass
+
+
+class _ZipArchive(_Archive):
+    def __init__(self, path: str):
+        self._zip = zipfile.ZipFile(
+            path, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=6
+        )
+
+    def add_bytes(self, name: str, data: bytes) -> None:
+        self._zip.writestr(name, data)
+
+    def add_stream(self, name: str, f: BinaryIO, size: int) -> None:
+        reader = _BoundedReader(f, size)
+        with self._zip.open(name, "w", force_zip64=True) as dst:
+            while True:
+                data = reader.read(_copy_buffer)
+                if not data:
+                    break
+                dst.write(data)
+
+    def close(self) -> None:
+        self._zip.close()
+
+
+class _TarArchive(_Archive):
+    """
+    A streamed tar, compressed with zstd or gzip on the fly.
+    """
+
+    def __init__(self, path: str, compression: str):
+        self._file = open(path, "wb")
+        self._compressor = None
+        if compression == "zstd":
+            import zstandard
+
+            self._compressor = zstandard.ZstdCompressor(
+                level=3, threads=-1
+            ).stream_writer(self._file, closefd=False)
+            self._tar = tarfile.open(fileobj=self._compressor, mode="w|")
+        else:
+            self._tar = tarfile.open(fileobj=self._file, mode="w|gz")
+
+    def _info(self, name: str, size: int) -> tarfile.TarInfo:
+        info = tarfile.TarInfo(name)
+        info.size = size
+        info.mtime = int(time.time())
+        info.mode = 0o644
+        return info
+
+    def add_bytes(self, name: str, data: bytes) -> None:
+        self._tar.addfile(self._info(name, len(data)), io.BytesIO(data))
+
+    def add_stream(self, name: str, f: BinaryIO, size: int) -> None:
+        self._tar.addfile(
+            self._info(name, size),
+            io.BufferedReader(_BoundedReader(f, size), _copy_buffer),
+        )
+
+    def close(self) -> None:
+        self._tar.close()
+        if self._compressor is not None:
+            self._compressor.close()
+        self._file.close()
+
+
+def _open_archive(path: str) -> Tuple[_Archive, str]:
+    """
+    The format follows the suffix of path, tar.zst falls back to tar.gz if
+    the zstandard package is missing. Return the archive and its real path.
+    """
+    if path.endswith(".zip"):
+        return _ZipArchive(path), path
+    if path.endswith(".tar.zst"):
+        try:
+            import zstandard  # noqa: F401
+
+            return _TarArchive(path, "zstd"), path
+        except ImportError:
+            logger.error("zstandard is not installed, falling back to tar.gz.")
+            path = path[: -len(".zst")] + ".gz"
+    if path.endswith((".tar.gz", ".tgz")):
+        return _TarArchive(path, "gzip"), path
+    raise ValueError(f"Unsupported diagnostics bundle format: {path}")
+
+
+def log_files(cfg: HelperConfig) -> List[str]:
+    paths = []
+    for path in (cfg.StandardOutPath, cfg.StandardErrorPath, log_file_path):
+        if path is not None and path not in paths:
+            paths.append(path)
+    return paths
+
+
+def _add_log_tail(archive: _Archive, name: str, path: str, budget: int) -> int:
+    """
+    Add at most `budget` bytes from the end of the log, starting at a line
+    boundary. Return the number of bytes added.
+    """
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        start = max(size - budget, 0)
+        # skip the partial first line, without reading it in one go
+        f.seek(max(start - 1, 0))
+        while 0 < start < size:
+            data = f.read(_line_scan_size)
+            if not data:
+                break
+            end = data.find(b"\n")
+            if end >= 0:
+                start = f.tell() - len(data) + end + 1
+                break
+            start = f.tell()
+        f.seek(start)
+        archive.add_stream(name, f, size - start)
+    return size - start
+
+
+def timing_history() -> Dict[str, Any]:
+    """
+    The rolling error counters and model load times kept by the log
+    analytics, nothing is recomputed from the logs.
+    """
+    analyzer = LogAnalyzer(log_file_path)
+    aggregates = analyzer.aggregates
+    return {
+        "errors_last_5m": aggregates.errors_in(5),
+        "errors_last_60m": aggregates.errors_in(60),
+        "errors_per_minute": dict(zip(aggregates.minutes, aggregates.errors)),
+        "model_loads": aggregates.loads,
+        "model_load_seconds": {
+            f"p{p}": aggregates.load_percentile(p) for p in (50, 90, 99)
+        },
+        "analyzed_log_offset": analyzer.offset,
+    }
+
+
+def default_bundle_name(suffix: str = ".zip") -> str:
+    return f"gpustack-diagnostics-{datetime.now().strftime('%Y%m%d-%H%M%S')}{suffix}"
+
+
+def _summary() -> Dict[str, Any]:
+    summary: Dict[str, Any] = {
+        "created": datetime.now().isoformat(),
+        "platform": platform.platform(),
+        "python": sys.version,
+        "executable": sys.executable,
+        "frozen": getattr(sys, "frozen", False),
+        "logs": {},
+    }
+    try:
+        import gpustack
+
+        summary["gpustack"] = gpustack.__version__
+    except Exception:
+        summary["gpustack"] = None
+    return summary
+
+
+def _add_logs(
+    archive: _Archive,
+    cfg: HelperConfig,
+    max_log_bytes: int,
+    max_total_bytes: int,
+    step: Callable[[str], None],
+) -> Dict[str, Any]:
+    logs: Dict[str, Any] = {}
+    remaining = max_total_bytes
+    for log_path in log_files(cfg):
+        entry: Dict[str, Any] = {"rotated": rotated_files(log_path)}
+        logs[log_path] = entry
+        if not os.path.exists(log_path) or remaining <= 0:
+            continue
+        step(f"adding the tail of {log_path}")
+        try:
+            added = _add_log_tail(
+                archive,
+                f"logs/{os.path.basename(log_path)}",
+                log_path,
+                min(max_log_bytes, remaining),
+            )
+        except OSError as e:
+            entry["error"] = str(e)
+            continue
+        entry["size"] = os.path.getsize(log_path)
+        entry["included"] = added
+        remaining -= added
+    return logs
+
+
+def export_bundle(
+    cfg: HelperConfig,
+    path: str,
+    max_log_bytes: int = default_max_log_bytes,
+    max_total_bytes: int = default_max_total_bytes,
+    progress: Optional[Callable[[str], None]] = None,
+) -> str:
+    """
+    Stream the configs, the tails of the logs, the service probes and the
+    timing history into a zip or tar.zst bundle. Memory use is bounded by
+    the copy buffer no matter how large the logs are. Return the path of
+    the written bundle.
+    """
+
+    def step(message: str) -> None:
+        logger.debug(message)
+        if progress is not None:
+            progress(message)
+
+    archive, path = _open_archive(path)
+    summary = _summary()
+    try:
+        for name, file_path in config_files(cfg):
+            step(f"adding {file_path}")
+            data = _redacted_file(file_path)
+            if data is not None:
+                archive.add_bytes(name, data)
+        for name, args in probe_commands():
+            step(f"running {' '.join(args)}")
+            archive.add_bytes(f"probes/{name}", run_probe(args))
+        try:
+            history = timing_history()
+        except Exception as e:
+            history = {"error": str(e)}
+        archive.add_bytes("timings.json", json.dumps(history, indent=2).encode())
+        summary["logs"] = _add_logs(archive, cfg, max_log_bytes, max_total_bytes, step)
+        archive.add_bytes(
+            "summary.json", json.dumps(summary, indent=2, default=str).encode()
+        )
+    finally:
+        archive.close()
+    step(f"diagnostics bundle written to {path}")
+    return path
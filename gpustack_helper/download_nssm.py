@@ -1,23 +1,73 @@
 import os
-import requests
 import zipfile
 import shutil
-from io import BytesIO
+from pathlib import Path
+from typing import Optional
+from gpustack_helper.artifacts import ArtifactCache, file_sha256
+from gpustack_helper.downloads import DownloadScheduler, default_chunk_size
 
 NSSM_VERSION = "nssm-2.24-101-g897c7ad"
+# sha256 of the release zip of NSSM_VERSION, empty until it is pinned
+NSSM_ZIP_SHA256 = ""
 OFFICIAL_NSSM_DOWNLOAD_URL = f"https://nssm.cc/ci/{NSSM_VERSION}.zip"
 NSSM_DOWNLOAD_URL = os.getenv("NSSM_DOWNLOAD_URL", OFFICIAL_NSSM_DOWNLOAD_URL)
+# overrides NSSM_ZIP_SHA256, e.g. for a mirror serving another build
+NSSM_SHA256 = os.getenv("NSSM_SHA256", NSSM_ZIP_SHA256)
+# win64 or win32, the directories of the release zip
+NSSM_ARCH = os.getenv("NSSM_ARCH", "win64")
 
 
-def download_nssm(target_dir: str) -> None:
-    """Download and extract NSSM to the specified target directory."""
-    shutil.rmtree(os.path.join(target_dir, NSSM_VERSION), ignore_errors=True)
+def fetch_nssm_archive(cache: ArtifactCache) -> Path:
+    """
+    Return the verified release zip from the cache, downloading it first if
+    needed. The download is streamed to a partial file which is resumed
+    with range requests on retry, a digest mismatch fails the build. Without
+    a pinned digest the one of the first download is recorded in the cache
+    and enforced on later builds.
+    """
+    ref_name = f"nssm-{NSSM_VERSION}"
+    ref = cache.get_ref(ref_name) or {}
+    expected = NSSM_SHA256.strip().lower() or ref.get("sha256")
+    if expected is not None and cache.has(expected):
+        return cache.object_path(expected)
+
+    partial = cache.root / "partial" / f"{NSSM_VERSION}.zip"
+    os.makedirs(partial.parent, exist_ok=True)
+    with DownloadScheduler(workers=1) as scheduler:
+        scheduler.download(NSSM_DOWNLOAD_URL, partial, sha256=expected, resume=True)
+    try:
+        if expected is None:
+            expected = file_sha256(partial)
+            print(
+                f"WARNING: {NSSM_VERSION}.zip isn't pinned, recorded sha256 "
+                f"{expected}, set NSSM_ZIP_SHA256 to it"
+            )
+        cache.put(expected, partial)
+    finally:
+        os.remove(partial)
+    cache.set_ref(ref_name, sha256=expected)
+    return cache.object_path(expected)
 
-    response = requests.get(NSSM_DOWNLOAD_URL)
-    if response.status_code != 200:
-        raise Exception(f"Failed to download NSSM from {NSSM_DOWNLOAD_URL}")
 
-    with zipfile.ZipFile(BytesIO(response.content)) as z:
-        z.extractall(target_dir)
+def download_nssm(
+    target_dir: str, arch: str = NSSM_ARCH, cache: Optional[ArtifactCache] = None
+) -> str:
+    """
+    Extract the nssm.exe of arch to target_dir/NSSM_VERSION/arch/nssm.exe,
+    the other files of the release are left in the archive.
+    """
+    archive = fetch_nssm_archive(cache or ArtifactCache())
+    shutil.rmtree(os.path.join(target_dir, NSSM_VERSION), ignore_errors=True)
+    target = os.path.join(target_dir, NSSM_VERSION, arch, "nssm.exe")
+    with zipfile.ZipFile(archive) as z:
+        member = next(
+            (n for n in z.namelist() if n.endswith(f"/{arch}/nssm.exe")), None
+        )
+        if member is None:
+            raise Exception(f"nssm.exe for {arch} not found in {NSSM_DOWNLOAD_URL}")
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with z.open(member) as src, open(target, "wb") as dst:
+            shutil.copyfileobj(src, dst, default_chunk_size)
 
-    print(f"NSSM has been downloaded and extracted to {target_dir}")
+    print(f"NSSM has been downloaded and extracted to {target}")
+    return target
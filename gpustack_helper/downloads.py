@@ -0,0 +1,450 @@
+import functools
+import hashlib
+import os
+import random
+import re
+import shutil
+import threading
+import time
+import zipfile
+from concurrent.futures import FIRST_EXCEPTION, Future, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Dict, Iterator, Optional, TypeVar
+import requests
+from requests.adapters import HTTPAdapter
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+default_workers = int(os.getenv("GPUSTACK_DOWNLOAD_WORKERS", "4"))
+default_retries = 3
+default_chunk_size = 1024 * 1024
+# retried status codes, everything else in 4xx is final
+_retry_status = (408, 429, 500, 502, 503, 504)
+
+
+class DownloadError(RuntimeError):
+    pass
+
+
+class ChecksumMismatch(DownloadError):
+    pass
+
+
+class _StalePartial(DownloadError):
+    """
+    The range of a resumed download can't be satisfied, the partial file
+    doesn't fit the remote one.
+    """
+
+
+class _Progress:
+    """
+    Aggregate progress of all the downloads, reported at most once per
+    `interval` seconds from whichever worker made progress.
+    """
+
+    def __init__(self, report: Callable[[str], None], interval: float):
+        self._report = report
+        self._interval = interval
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        self._last_report = 0.0
+        self.total_files = 0
+        self.done_files = 0
+        self.expected_bytes = 0
+        self.received_bytes = 0
+
+    def add_file(self) -> None:
+        with self._lock:
+            self.total_files += 1
+
+    def add_expected(self, size: int) -> None:
+        with self._lock:
+            self.expected_bytes += size
+
+    def add_bytes(self, size: int) -> None:
+        with self._lock:
+            self.received_bytes += size
+            now = time.monotonic()
+            if now - self._last_report < self._interval:
+                return
+            self._last_report = now
+        self._emit()
+
+    def file_done(self) -> None:
+        with self._lock:
+            self.done_files += 1
+        self._emit()
+
+    def _emit(self) -> None:
+        elapsed = max(time.monotonic() - self._started, 1e-6)
+        self._report(
+            f"downloaded {self.done_files}/{self.total_files} files, "
+            f"{self.received_bytes / 2**20:.1f}/{self.expected_bytes / 2**20:.1f} MiB, "
+            f"{self.received_bytes / 2**20 / elapsed:.1f} MiB/s"
+        )
+
+
+class DownloadScheduler:
+    """
+    Run downloads on a bounded pool of workers. Connections are pooled per
+    host and shared by the workers, failed transfers are retried with
+    exponential backoff and full jitter.
+    """
+
+    workers: int
+    retries: int
+    backoff: float
+    timeout: float
+    chunk_size: int
+    session: requests.Session
+    progress: _Progress
+
+    def __init__(
+        self,
+        workers: int = default_workers,
+        retries: int = default_retries,
+        backoff: float = 1.0,
+        timeout: float = 30,
+        chunk_size: int = default_chunk_size,
+        report: Callable[[str], None] = print,
+        report_interval: float = 2.0,
+    ):
+        self.workers = max(workers, 1)
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.progress = _Progress(report, report_interval)
+
+    def __enter__(self) -> "DownloadScheduler":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.session.close()
+
+    def _sleep_before_retry(self, attempt: int) -> None:
+        time.sleep(random.uniform(0, self.backoff * 2**attempt))
+
+    def _resume_offset(self, target: Path, digest) -> int:
+        """
+        Size of the partial download left by a failed attempt, the digest is
+        fed with its content so the verification still covers every byte.
+        """
+        if not os.path.isfile(target):
+            return 0
+        offset = 0
+        with open(target, "rb") as f:
+            for block in iter(lambda: f.read(self.chunk_size), b""):
+                if digest is not None:
+                    digest.update(block)
+                offset += len(block)
+        return offset
+
+    def _fetch(
+        self,
+        url: str,
+        target: Path,
+        sha256: Optional[str],
+        first_attempt: bool,
+        resume: bool,
+    ) -> int:
+        digest = hashlib.sha256() if sha256 is not None else None
+        offset = 0
+        headers = {}
+        if resume and not first_attempt:
+            offset = self._resume_offset(target, digest)
+            if offset > 0:
+                headers["Range"] = f"bytes={offset}-"
+        with self.session.get(
+            url, stream=True, timeout=self.timeout, headers=headers
+        ) as r:
+            if offset > 0 and r.status_code == 416:
+                # start over on the next attempt
+                if os.path.exists(target):
+                    os.remove(target)
+                raise _StalePartial(f"Partial download of {url} doesn't fit")
+            r.raise_for_status()
+            if offset > 0 and r.status_code != 206:
+                # the server ignored the range
+                offset = 0
+                digest = hashlib.sha256() if sha256 is not None else None
+            if first_attempt:
+                self.progress.add_expected(int(r.headers.get("Content-Length", 0)))
+            received = offset
+            with open(
+                target, "ab" if offset > 0 else "wb", buffering=self.chunk_size
+            ) as f:
+                for chunk in r.iter_content(chunk_size=self.chunk_size):
+                    f.write(chunk)
+                    # hashed while the bytes are still in memory, the file
+                    # is never read back for verification
+                    if digest is not None:
+                        digest.update(chunk)
+                    received += len(chunk)
+                    self.progress.add_bytes(len(chunk))
+        if digest is not None and digest.hexdigest() != sha256.lower():
+            # a corrupted partial file must not be resumed
+            os.remove(target)
+            raise ChecksumMismatch(
+                f"Checksum mismatch for {url}: expected {sha256}, "
+                f"got {digest.hexdigest()}"
+            )
+        return received
+
+    def download(
+        self,
+        url: str,
+        target: Path,
+        sha256: Optional[str] = None,
+        resume: bool = False,
+    ) -> int:
+        """
+        Download url to target, return the size. If sha256 is given the
+        content is verified in the same pass, a mismatch is retried as a
+        corrupted transfer. With resume, a retry continues the partial file
+        with a range request.
+        """
+        self.progress.add_file()
+        for attempt in range(self.retries + 1):
+            try:
+                received = self._fetch(url, target, sha256, attempt == 0, resume)
+                self.progress.file_done()
+                return received
+            except requests.HTTPError as e:
+                status = e.response.status_code if e.response is not None else None
+                if status not in _retry_status or attempt == self.retries:
+                    raise DownloadError(f"Failed to download {url}: {e}") from e
+            except (ChecksumMismatch, _StalePartial):
+                if attempt == self.retries:
+                    raise
+            except (requests.RequestException, OSError) as e:
+                if attempt == self.retries:
+                    raise DownloadError(f"Failed to download {url}: {e}") from e
+            self._sleep_before_retry(attempt)
+        raise DownloadError(f"Failed to download {url}")
+
+    def remote_size(self, url: str) -> Optional[int]:
+        try:
+            r = self.session.head(url, allow_redirects=True, timeout=self.timeout)
+            r.raise_for_status()
+            return int(r.headers["Content-Length"])
+        except (requests.RequestException, KeyError, ValueError):
+            return None
+
+    def map(self, func: Callable[[T], R], items: Dict[str, T]) -> Dict[str, R]:
+        """
+        Run func for every item on the worker pool. The first failure cancels
+        the pending items and is raised once the running ones finished.
+        """
+        with ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="download"
+        ) as executor:
+            futures: Dict[Future, str] = {
+                executor.submit(func, item): key for key, item in items.items()
+            }
+            done, pending = wait(futures, return_when=FIRST_EXCEPTION)
+            for future in pending:
+                future.cancel()
+            wait(pending)
+        results: Dict[str, R] = {}
+        for future, key in futures.items():
+            if future.cancelled():
+                continue
+            error = future.exception()
+            if error is not None:
+                raise DownloadError(f"Failed to fetch {key}: {error}") from error
+            results[key] = future.result()
+        return results
+
+
+def extract_zip(path: Path, target_dir: Path, buffer: int = default_chunk_size) -> None:
+    """
+    Extract a zip with large copy buffers, keeping the unix permissions of
+    the members. Members escaping target_dir are rejected.
+    """
+    root = os.path.realpath(target_dir)
+    with zipfile.ZipFile(path) as archive:
+        for info in archive.infolist():
+            target = os.path.realpath(os.path.join(root, info.filename))
+            if target != root and not target.startswith(root + os.sep):
+                raise DownloadError(f"Unsafe path in {path}: {info.filename}")
+            if info.is_dir():
+                os.makedirs(target, exist_ok=True)
+                continue
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with archive.open(info) as src, open(target, "wb") as dst:
+                shutil.copyfileobj(src, dst, buffer)
+            mode = (info.external_attr >> 16) & 0o777
+            if mode:
+                os.chmod(target, mode)
+
+
+class _RangeRequestHandler(SimpleHTTPRequestHandler):
+    """
+    SimpleHTTPRequestHandler with single range requests, like the release
+    servers it stands in for.
+    """
+
+    delay: float = 0.0
+    _range_left: Optional[int] = None
+
+    def log_message(self, *_):
+        pass
+
+    def do_GET(self):
+        # simulated round trip latency of a remote server
+        if self.delay > 0:
+            time.sleep(self.delay)
+        super().do_GET()
+
+    def send_head(self):
+        self._range_left = None
+        match = re.fullmatch(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+        path = self.translate_path(self.path)
+        if match is None or not os.path.isfile(path):
+            return super().send_head()
+        size = os.path.getsize(path)
+        start = int(match[1])
+        end = min(int(match[2]) if match[2] else size - 1, size - 1)
+        if start >= size or start > end:
+            self.send_error(416)
+            return None
+        f = open(path, "rb")
+        f.seek(start)
+        self._range_left = end - start + 1
+        self.send_response(206)
+        self.send_header("Content-Type", self.guess_type(path))
+        self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self.send_header("Content-Length", str(self._range_left))
+        self.end_headers()
+        return f
+
+    def copyfile(self, source, outputfile):
+        if self._range_left is None:
+            return super().copyfile(source, outputfile)
+        while self._range_left > 0:
+            data = source.read(min(self._range_left, default_chunk_size))
+            if not data:
+                break
+            outputfile.write(data)
+            self._range_left -= len(data)
+
+
+@contextmanager
+def serve_directory(
+    path: str, delay: float = 0.0, handler=_RangeRequestHandler
+) -> Iterator[str]:
+    """
+    Serve path over HTTP on a random local port, stands in for the release
+    server when benchmarking. Yield the base URL.
+    """
+    server = ThreadingHTTPServer(
+        ("127.0.0.1", 0),
+        functools.partial(
+            type("Handler", (handler,), {"delay": delay}), directory=path
+        ),
+    )
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def benchmark(files: int = 12, size_mb: int = 32, delay: float = 0.5) -> None:
+    """
+    Download synthetic files from a local server, serially and in parallel.
+    The server delays each response to stand in for the release host.
+    """
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "source")
+        os.makedirs(source)
+        for i in range(files):
+            with open(os.path.join(source, f"file-{i}.bin"), "wb") as f:
+                f.write(os.urandom(size_mb * 2**20))
+        with serve_directory(source, delay=delay) as base_url:
+            for workers in (1, default_workers):
+                target = Path(tmp) / f"target-{workers}"
+                target.mkdir()
+                begin = time.perf_counter()
+                with DownloadScheduler(workers=workers, report=lambda _: None) as s:
+                    s.map(
+                        lambda name: s.download(f"{base_url}/{name}", target / name),
+                        {name: name for name in os.listdir(source)},
+                    )
+                elapsed = time.perf_counter() - begin
+                print(
+                    f"{workers} worker(s): {files} x {size_mb} MiB "
+                    f"in {elapsed:.2f}s, {files * size_mb / elapsed:.1f} MiB/s"
+                )
+
+
+def benchmark_pipeline(size_mb: int = 500) -> None:
+    """
+    Fetch a synthetic archive from a local server the way the tools used to
+    be fetched, download then verify then extract, and with the single pass
+    pipeline which hashes while downloading.
+    """
+    import tempfile
+
+    def legacy(url: str, target: Path, sha256: str) -> None:
+        with requests.get(url, stream=True, timeout=30) as r:
+            r.raise_for_status()
+            with open(target, "wb") as f:
+                for chunk in r.iter_content(chunk_size=8192):
+                    f.write(chunk)
+        digest = hashlib.sha256()
+        with open(target, "rb") as f:
+            for block in iter(lambda: f.read(4096), b""):
+                digest.update(block)
+        if digest.hexdigest() != sha256:
+            raise ChecksumMismatch(url)
+        with zipfile.ZipFile(target) as archive:
+            archive.extractall(target.parent)
+
+    def pipeline(url: str, target: Path, sha256: str) -> None:
+        with DownloadScheduler(workers=1, report=lambda _: None) as scheduler:
+            scheduler.download(url, target, sha256=sha256)
+        extract_zip(target, target.parent)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "source")
+        os.makedirs(source)
+        archive_path = os.path.join(source, "archive.zip")
+        with zipfile.ZipFile(archive_path, "w") as archive:
+            with archive.open("payload", "w", force_zip64=True) as f:
+                for _ in range(size_mb):
+                    f.write(os.urandom(2**20))
+        digest = hashlib.sha256()
+        with open(archive_path, "rb") as f:
+            for block in iter(lambda: f.read(default_chunk_size), b""):
+                digest.update(block)
+        sha256 = digest.hexdigest()
+        with serve_directory(source) as base_url:
+            for name, run in (("legacy", legacy), ("pipeline", pipeline)):
+                target_dir = Path(tmp) / name
+                target_dir.mkdir()
+                begin = time.perf_counter()
+                run(f"{base_url}/archive.zip", target_dir / "archive.zip", sha256)
+                elapsed = time.perf_counter() - begin
+                print(f"{name:>8}: {size_mb} MiB in {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    benchmark()
+    benchmark_pipeline()
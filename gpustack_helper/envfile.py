@@ -0,0 +1,26 @@
+import re
+from typing import List, Tuple
+
+_env_line = re.compile(r"^\s*(?:export\s+)?([A-Za-z_][A-Za-z0-9_.]*)\s*[=\t]\s*(.*)$")
+
+
+def parse_env(text: str) -> List[Tuple[str, str]]:
+    """
+    Parse the lines of a .env file, `export NAME=value` or NAME<tab>value as
+    copied from a spreadsheet. Comments and anything else are skipped.
+    """
+    pairs = []
+    for line in text.splitlines():
+        if line.lstrip().startswith("#"):
+            continue
+        match = _env_line.match(line)
+        if match is None:
+            continue
+        name, value = match[1], match[2].strip()
+        if len(value) >= 2 and value[0] == value[-1] and value[0] in "'\"":
+            value = value[1:-1]
+        else:
+            # a trailing comment of an unquoted value
+            value = re.sub(r"\s+#.*$", "", value)
+        pairs.append((name, value))
+    return pairs
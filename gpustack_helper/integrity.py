@@ -0,0 +1,223 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from importlib.resources import files
+from typing import Dict, List, Optional, Tuple
+from platformdirs import user_cache_dir
+from gpustack_helper.artifacts import file_sha256
+
+logger = logging.getLogger(__name__)
+
+manifest_name = "manifest.json"
+manifest_version = 1
+default_workers = min(4, os.cpu_count() or 1)
+
+
+def third_party_bin_path() -> str:
+    """
+    The tools installed by ToolsManager, bundled as gpustack/third_party.
+    """
+    return str(files("gpustack").joinpath("third_party", "bin"))
+
+
+def _tracked_files(bin_path: str) -> List[str]:
+    """
+    Relative paths of the binaries, the json bookkeeping files next to them
+    (versions.json, the manifest itself) may change and are left out.
+    """
+    tracked = []
+    for root, _, names in os.walk(bin_path):
+        for name in names:
+            if name.endswith(".json"):
+                continue
+            rel = os.path.relpath(os.path.join(root, name), bin_path)
+            tracked.append(rel.replace(os.sep, "/"))
+    return sorted(tracked)
+
+
+def _hash_all(
+    bin_path: str, paths: List[str], workers: int = default_workers
+) -> Dict[str, str]:
+    """
+    Hash the files in parallel, hashlib releases the GIL on large updates.
+    """
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="hash") as pool:
+        digests = pool.map(lambda rel: file_sha256(os.path.join(bin_path, rel)), paths)
+        return dict(zip(paths, digests))
+
+
+def build_manifest(bin_path: str) -> Dict:
+    paths = _tracked_files(bin_path)
+    digests = _hash_all(bin_path, paths)
+    return {
+        "version": manifest_version,
+        "files": {
+            rel: {
+                "size": os.path.getsize(os.path.join(bin_path, rel)),
+                "sha256": digests[rel],
+            }
+            for rel in paths
+        },
+    }
+
+
+def write_manifest(bin_path: str) -> str:
+    """
+    Record path, size and sha256 of every bundled binary, run at packaging.
+    """
+    path = os.path.join(bin_path, manifest_name)
+    manifest = build_manifest(bin_path)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return path
+
+
+@dataclass
+class IntegrityReport:
+    checked: int = 0
+    hashed: int = 0
+    manifest_missing: bool = False
+    missing: List[str] = field(default_factory=list)
+    mismatched: List[str] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not self.missing and not self.mismatched
+
+
+def _stat_key(st: os.stat_result) -> Tuple[int, int, int, int]:
+    return (st.st_size, st.st_mtime_ns, st.st_ctime_ns, st.st_ino)
+
+
+def stat_cache_path(bin_path: str) -> str:
+    digest = hashlib.sha1(os.path.abspath(bin_path).encode()).hexdigest()[:12]
+    cache_dir = user_cache_dir("GPUStack", appauthor=False)
+    return os.path.join(cache_dir, f"integrity.{digest}.json")
+
+
+def _load_stat_cache(path: str) -> Dict[str, list]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_stat_cache(path: str, cache: Dict[str, list]) -> None:
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(cache, f)
+        os.replace(tmp, path)
+    except OSError as e:
+        logger.debug(f"Failed to save the integrity cache {path}: {e}")
+
+
+def load_manifest(bin_path: str) -> Optional[Dict[str, Dict]]:
+    try:
+        with open(os.path.join(bin_path, manifest_name), "r", encoding="utf-8") as f:
+            return json.load(f)["files"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def verify(bin_path: str, cache_path: Optional[str] = None) -> IntegrityReport:
+    """
+    Compare the binaries with the manifest. Digests are cached by stat, so
+    only files changed since the last verification are hashed again.
+    """
+    report = IntegrityReport()
+    expected = load_manifest(bin_path)
+    if expected is None:
+        report.manifest_missing = True
+        return report
+    cache_path = cache_path or stat_cache_path(bin_path)
+    cache = _load_stat_cache(cache_path)
+    updated: Dict[str, list] = {}
+    to_hash: List[str] = []
+    for rel, entry in expected.items():
+        report.checked += 1
+        try:
+            st = os.stat(os.path.join(bin_path, rel))
+        except FileNotFoundError:
+            report.missing.append(rel)
+            continue
+        key = list(_stat_key(st))
+        if st.st_size != entry["size"]:
+            report.mismatched.append(rel)
+            continue
+        cached = cache.get(rel)
+        if cached is not None and cached[:-1] == key:
+            updated[rel] = cached
+        else:
+            to_hash.append(rel)
+            updated[rel] = key + [None]
+    for rel, digest in _hash_all(bin_path, to_hash).items():
+        updated[rel][-1] = digest
+    report.hashed = len(to_hash)
+    for rel, cached in updated.items():
+        if cached[-1] != expected[rel]["sha256"]:
+            report.mismatched.append(rel)
+    _save_stat_cache(cache_path, updated)
+    return report
+
+
+class IntegrityVerifier:
+    """
+    Verify the bundled binaries in a background thread, started at helper
+    startup and again before the service is started.
+    """
+
+    bin_path: Optional[str]
+    report: Optional[IntegrityReport] = None
+    _thread: Optional[threading.Thread] = None
+    _lock: threading.Lock
+    _done: threading.Event
+
+    def __init__(self, bin_path: Optional[str] = None):
+        self.bin_path = bin_path
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._done.clear()
+            self._thread = threading.Thread(
+                target=self._run, name="integrity", daemon=True
+            )
+            self._thread.start()
+
+    def _run(self) -> None:
+        try:
+            bin_path = self.bin_path or third_party_bin_path()
+            self.report = verify(bin_path)
+            if self.report.manifest_missing:
+                logger.info(f"No integrity manifest in {bin_path}")
+            elif not self.report.ok:
+                logger.error(
+                    f"Bundled binaries damaged, missing: {self.report.missing}, "
+                    f"mismatched: {self.report.mismatched}"
+                )
+        except Exception as e:
+            logger.error(f"Failed to verify the bundled binaries: {e}")
+        finally:
+            self._done.set()
+
+    def wait(self, timeout: Optional[float] = None) -> Optional[IntegrityReport]:
+        """
+        Return the report of the current verification, None if it didn't
+        finish within timeout.
+        """
+        if not self._done.wait(timeout):
+            return None
+        return self.report
+
+
+verifier = IntegrityVerifier()
@@ -0,0 +1,281 @@
+import bisect
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+from platformdirs import user_cache_dir
+from gpustack_helper.logs.index import parse_level, parse_timestamp, _read_lines
+
+logger = logging.getLogger(__name__)
+
+window_minutes = 60
+# load durations are counted in log spaced buckets from 1s to ~9h
+_bucket_bounds: Tuple[float, ...] = tuple(2 ** (i / 2) for i in range(32))
+_max_read_per_poll = 64 * 1024 * 1024
+_prefix_size = 4096
+
+# e.g. 2025-06-10T10:00:00+08:00 - gpustack.worker.serve_manager - INFO - ...
+_component_re = re.compile(rb"^\S+ - (?P<component>[\w.]+) - ")
+_instance_start_res = (
+    re.compile(rb"[Ss]tarting model instance:? (?P<name>[\w.\-:/]+)"),
+    re.compile(
+        rb"[Ss]tarting (?:llama-box|vllm|vox-box|ascend-mindie)[^\n]*?"
+        rb"model instance:? (?P<name>[\w.\-:/]+)"
+    ),
+)
+_instance_ready_res = (
+    re.compile(rb"[Mm]odel instance:? (?P<name>[\w.\-:/]+) (?:is )?(?:running|ready)"),
+    re.compile(rb"[Ff]inished starting model instance:? (?P<name>[\w.\-:/]+)"),
+)
+
+
+@dataclass
+class LogEvent:
+    timestamp: float
+    level: Optional[str]
+    component: Optional[str]
+    kind: Optional[str] = None
+    instance: Optional[str] = None
+
+
+def parse_event(line: bytes, now: float) -> LogEvent:
+    timestamp = parse_timestamp(line)
+    match = _component_re.match(line)
+    event = LogEvent(
+        timestamp=now if timestamp is None else timestamp,
+        level=parse_level(line),
+        component=match.group("component").decode() if match else None,
+    )
+    for kind, patterns in (
+        ("instance_start", _instance_start_res),
+        ("instance_ready", _instance_ready_res),
+    ):
+        for pattern in patterns:
+            found = pattern.search(line)
+            if found is not None:
+                event.kind = kind
+                event.instance = found.group("name").decode(errors="replace")
+                return event
+    return event
+
+
+@dataclass
+class Aggregates:
+    """
+    Fixed-size rolling aggregates, the size doesn't grow with the log.
+    """
+
+    # error and warning counters of the last `window_minutes` minutes, indexed
+    # by minute modulo the window
+    minutes: List[int] = field(default_factory=lambda: [0] * window_minutes)
+    errors: List[int] = field(default_factory=lambda: [0] * window_minutes)
+    warnings: List[int] = field(default_factory=lambda: [0] * window_minutes)
+    load_buckets: List[int] = field(
+        default_factory=lambda: [0] * (len(_bucket_bounds) + 1)
+    )
+    loads: int = 0
+    # instances which started loading and are not ready yet, bounded
+    pending: Dict[str, float] = field(default_factory=dict)
+    total_errors: int = 0
+    total_lines: int = 0
+
+    def _slot(self, timestamp: float) -> int:
+        minute = int(timestamp // 60)
+        slot = minute % window_minutes
+        if self.minutes[slot] != minute:
+            self.minutes[slot] = minute
+            self.errors[slot] = 0
+            self.warnings[slot] = 0
+        return slot
+
+    def add(self, event: LogEvent) -> None:
+        self.total_lines += 1
+        if event.level in ("ERROR", "CRITICAL"):
+            self.errors[self._slot(event.timestamp)] += 1
+            self.total_errors += 1
+        elif event.level == "WARNING":
+            self.warnings[self._slot(event.timestamp)] += 1
+        if event.kind == "instance_start" and event.instance:
+            if len(self.pending) >= 256:
+                self.pending.pop(next(iter(self.pending)))
+            self.pending[event.instance] = event.timestamp
+        elif event.kind == "instance_ready" and event.instance in self.pending:
+            duration = event.timestamp - self.pending.pop(event.instance)
+            if duration >= 0:
+                self.load_buckets[bisect.bisect_left(_bucket_bounds, duration)] += 1
+                self.loads += 1
+
+    def errors_in(self, minutes: int, now: Optional[float] = None) -> int:
+        current = int((time.time() if now is None else now) // 60)
+        return sum(
+            count
+            for minute, count in zip(self.minutes, self.errors)
+            if current - minutes < minute <= current
+        )
+
+    def load_percentile(self, percentile: float) -> Optional[float]:
+        """
+        Upper bound of the bucket holding the percentile, in seconds.
+        """
+        if self.loads == 0:
+            return None
+        rank = math.ceil(self.loads * percentile / 100)
+        seen = 0
+        for i, count in enumerate(self.load_buckets):
+            seen += count
+            if seen >= rank:
+                return _bucket_bounds[min(i, len(_bucket_bounds) - 1)]
+        return _bucket_bounds[-1]
+
+
+@dataclass
+class _State:
+    identity: Tuple[int, int] = (0, 0)
+    offset: int = 0
+    prefix: str = ""
+    aggregates: Aggregates = field(default_factory=Aggregates)
+
+
+def state_path_for(log_path: str) -> str:
+    digest = hashlib.sha1(os.path.abspath(log_path).encode()).hexdigest()[:12]
+    cache_dir = user_cache_dir("GPUStack", appauthor=False)
+    return os.path.join(cache_dir, f"{os.path.basename(log_path)}.{digest}.stats")
+
+
+class LogAnalyzer:
+    """
+    Tail the log from a persisted byte offset and fold every new line into
+    the rolling aggregates. Bytes which were analyzed once are never read
+    again, a rotated or truncated log is followed from its start.
+    """
+
+    log_path: str
+    path: str
+    _state: _State
+    _lock: threading.Lock
+    _thread: Optional[threading.Thread] = None
+
+    def __init__(self, log_path: str, path: Optional[str] = None):
+        self.log_path = log_path
+        self.path = path if path is not None else state_path_for(log_path)
+        self._lock = threading.Lock()
+        self._state = self._load()
+
+    @property
+    def aggregates(self) -> Aggregates:
+        return self._state.aggregates
+
+    @property
+    def offset(self) -> int:
+        return self._state.offset
+
+    def _load(self) -> _State:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            aggregates = Aggregates(**data.pop("aggregates"))
+            return _State(
+                identity=tuple(data["identity"]),
+                offset=data["offset"],
+                prefix=data["prefix"],
+                aggregates=aggregates,
+            )
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"Discarding log analytics state {self.path}: {e}")
+        return _State()
+
+    def _save(self) -> None:
+        state = self._state
+        data = {
+            "identity": list(state.identity),
+            "offset": state.offset,
+            "prefix": state.prefix,
+            "aggregates": state.aggregates.__dict__,
+        }
+        tmp = f"{self.path}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            logger.debug(f"Failed to save log analytics state {self.path}: {e}")
+
+    @staticmethod
+    def _prefix(f, size: int) -> str:
+        f.seek(0)
+        return hashlib.sha256(f.read(min(size, _prefix_size))).hexdigest()
+
+    def poll(self) -> int:
+        """
+        Analyze the bytes appended since the last poll, return how many.
+        """
+        with self._lock:
+            try:
+                f = open(self.log_path, "rb")
+            except FileNotFoundError:
+                return 0
+            with f:
+                st = os.fstat(f.fileno())
+                state = self._state
+                identity = (st.st_dev, st.st_ino)
+                if (
+                    identity != state.identity
+                    or st.st_size < state.offset
+                    or self._prefix(f, state.offset) != state.prefix
+                ):
+                    # a new generation, the aggregates carry over
+                    state.identity, state.offset = identity, 0
+                start = state.offset
+                f.seek(start)
+                limit = min(st.st_size - start, _max_read_per_poll)
+                data = _read_lines(f, limit)
+                if not data and limit == _max_read_per_poll:
+                    # a line longer than a whole poll would never complete,
+                    # count what was read as a line and move on
+                    data = f.read(limit)
+                if not data:
+                    return 0
+                now = time.time()
+                for line in data.splitlines():
+                    state.aggregates.add(parse_event(line, now))
+                state.offset = start + len(data)
+                state.prefix = self._prefix(f, state.offset)
+            self._save()
+            return len(data)
+
+    def behind(self) -> bool:
+        """
+        Whether the log has bytes the last poll didn't get to.
+        """
+        try:
+            size = os.path.getsize(self.log_path)
+        except OSError:
+            return False
+        with self._lock:
+            return self._state.offset < size
+
+    def poll_in_background(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(
+            target=self._poll_guarded, name="log-analytics", daemon=True
+        )
+        self._thread.start()
+
+    def _poll_guarded(self) -> None:
+        try:
+            # a poll stops at the last complete line, so it reads less than
+            # the limit even with more to catch up on
+            while self.poll() > 0 and self.behind():
+                continue
+        except Exception as e:
+            logger.error(f"Log analytics failed: {e}")
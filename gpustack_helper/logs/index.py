@@ -0,0 +1,510 @@
+import bisect
+import hashlib
+import logging
+import math
+import os
+import re
+import struct
+import threading
+import time
+from array import array
+from dataclasses import dataclass
+from datetime import datetime
+from typing import BinaryIO, Callable, Iterator, List, Optional, Pattern, Tuple
+from platformdirs import user_cache_dir
+
+logger = logging.getLogger(__name__)
+
+# one checkpoint per block of the log, the index stays tiny (24 bytes per
+# MiB of log) and a lookup scans at most one block
+block_size = 1024 * 1024
+_read_size = 8 * 1024 * 1024
+_prefix_size = 4096
+_magic = b"GSLIDX01"
+# magic, dev, ino, indexed bytes, line count, prefix sha256
+_header = struct.Struct("<8sQQQQ32s")
+
+# e.g. 2025-06-10T10:00:00.123456+08:00 - gpustack.server.server - INFO - ...
+_timestamp_re = re.compile(
+    rb"^(\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(?:[.,]\d+)?(?:Z|[+-]\d{2}:?\d{2})?)"
+)
+_level_re = re.compile(rb"\b(DEBUG|INFO|WARNING|ERROR|CRITICAL)\b")
+_line_re = re.compile(rb"^", re.MULTILINE)
+levels = ("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL")
+
+
+def parse_timestamp(line: bytes) -> Optional[float]:
+    """
+    Parse the leading timestamp of a log line into epoch seconds.
+    """
+    match = _timestamp_re.match(line)
+    if match is None:
+        return None
+    text = match.group(1).decode().replace(",", ".").replace("Z", "+00:00")
+    # fromisoformat of python 3.10 only accepts 3 or 6 fraction digits
+    text = re.sub(
+        r"\.(\d+)", lambda m: "." + (m.group(1) + "000000")[:6], text, count=1
+    )
+    try:
+        return datetime.fromisoformat(text).timestamp()
+    except ValueError:
+        return None
+
+
+def parse_level(line: bytes) -> Optional[str]:
+    match = _level_re.search(line, 0, 160)
+    return match.group(1).decode() if match else None
+
+
+def _read_lines(f: BinaryIO, limit: Optional[int] = None) -> bytes:
+    """
+    Read a chunk of complete lines from the current position, at most
+    `limit` bytes, and leave the file positioned right after them.
+    """
+    start = f.tell()
+    data = b""
+    while True:
+        size = _read_size if limit is None else min(_read_size, limit - len(data))
+        more = f.read(size) if size > 0 else b""
+        data += more
+        end = data.rfind(b"\n")
+        # a single line may be longer than the read size
+        if end >= 0 or len(more) < size or size <= 0:
+            break
+    data = data[: end + 1]
+    f.seek(start + len(data))
+    return data
+
+
+def index_path_for(log_path: str) -> str:
+    """
+    The index is stored next to the log if possible, the service log usually
+    belongs to root so fall back to the user cache dir.
+    """
+    candidate = f"{log_path}.idx"
+    directory = os.path.dirname(os.path.abspath(log_path))
+    if os.access(candidate, os.W_OK) or (
+        not os.path.exists(candidate) and os.access(directory, os.W_OK)
+    ):
+        return candidate
+    digest = hashlib.sha1(os.path.abspath(log_path).encode()).hexdigest()[:12]
+    cache_dir = user_cache_dir("GPUStack", appauthor=False)
+    return os.path.join(cache_dir, f"{os.path.basename(log_path)}.{digest}.idx")
+
+
+@dataclass
+class Checkpoint:
+    offset: int
+    line: int
+    timestamp: float
+
+
+class LineIndex:
+    """
+    A sparse, persistent line-offset index of an append-only log. Each
+    checkpoint maps the first line starting after a block boundary to its
+    line number and timestamp. Updating only reads the bytes appended since
+    the last update. Truncation, rotation and rewrites invalidate it.
+    """
+
+    log_path: str
+    path: str
+    indexed_bytes: int = 0
+    line_count: int = 0
+    _identity: Tuple[int, int] = (0, 0)
+    _prefix: bytes = b""
+    _offsets: array
+    _lines: array
+    _timestamps: array
+    _lock: threading.Lock
+
+    def __init__(self, log_path: str, path: Optional[str] = None):
+        self.log_path = log_path
+        self.path = path if path is not None else index_path_for(log_path)
+        self._lock = threading.Lock()
+        self._clear()
+        self._load()
+
+    def _clear(self) -> None:
+        self.indexed_bytes = 0
+        self.line_count = 0
+        self._identity = (0, 0)
+        self._prefix = b""
+        self._offsets = array("Q")
+        self._lines = array("Q")
+        self._timestamps = array("d")
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def checkpoint(self, i: int) -> Checkpoint:
+        return Checkpoint(self._offsets[i], self._lines[i], self._timestamps[i])
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, "rb") as f:
+                header = f.read(_header.size)
+                magic, dev, ino, indexed, lines, prefix = _header.unpack(header)
+                if magic != _magic:
+                    return
+                body = f.read()
+        except (FileNotFoundError, struct.error):
+            return
+        except OSError as e:
+            logger.debug(f"Failed to load log index {self.path}: {e}")
+            return
+        count = len(body) // 24
+        offsets, line_numbers, timestamps = array("Q"), array("Q"), array("d")
+        offsets.frombytes(body[: count * 8])
+        line_numbers.frombytes(body[count * 8 : count * 16])
+        timestamps.frombytes(body[count * 16 : count * 24])
+        self._identity = (dev, ino)
+        self.indexed_bytes = indexed
+        self.line_count = lines
+        self._prefix = prefix
+        self._offsets, self._lines, self._timestamps = (
+            offsets,
+            line_numbers,
+            timestamps,
+        )
+
+    def _save(self) -> None:
+        header = _header.pack(
+            _magic,
+            self._identity[0],
+            self._identity[1],
+            self.indexed_bytes,
+            self.line_count,
+            self._prefix.ljust(32, b"\0"),
+        )
+        tmp = f"{self.path}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(tmp, "wb") as f:
+                f.write(header)
+                f.write(self._offsets.tobytes())
+                f.write(self._lines.tobytes())
+                f.write(self._timestamps.tobytes())
+            os.replace(tmp, self.path)
+        except OSError as e:
+            logger.debug(f"Failed to save log index {self.path}: {e}")
+
+    def _is_valid(self, f, st: os.stat_result) -> bool:
+        if self.indexed_bytes == 0:
+            return True
+        if (st.st_dev, st.st_ino) != self._identity or st.st_size < self.indexed_bytes:
+            return False
+        return self._prefix_digest(f, self.indexed_bytes) == self._prefix
+
+    @staticmethod
+    def _prefix_digest(f, indexed_bytes: int) -> bytes:
+        # only the indexed part is immutable, it is what identifies the file
+        f.seek(0)
+        return hashlib.sha256(f.read(min(_prefix_size, indexed_bytes))).digest()
+
+    def update(self, cancel: Optional[threading.Event] = None) -> int:
+        """
+        Extend the index with the bytes appended since the last update and
+        return the number of bytes read.
+        """
+        with self._lock, open(self.log_path, "rb") as f:
+            st = os.fstat(f.fileno())
+            if not self._is_valid(f, st):
+                logger.info(f"Log {self.log_path} was rotated, rebuilding index")
+                self._clear()
+            if self.indexed_bytes == 0:
+                self._identity = (st.st_dev, st.st_ino)
+            start = self.indexed_bytes
+            position = start
+            f.seek(position)
+            while position < st.st_size:
+                if cancel is not None and cancel.is_set():
+                    break
+                data = _read_lines(f, st.st_size - position)
+                if not data:
+                    break
+                self._index_chunk(position, data)
+                position += len(data)
+            self.indexed_bytes = position
+            if start < _prefix_size:
+                self._prefix = self._prefix_digest(f, position)
+            if position != start:
+                self._save()
+            return position - start
+
+    def _index_chunk(self, position: int, data: bytes) -> None:
+        # chunks always start at the beginning of a line and end with one
+        chunk_end = position + len(data)
+        boundary = -(-position // block_size) * block_size
+        counted, line = 0, self.line_count
+        while boundary < chunk_end:
+            relative = boundary - position
+            line_start = 0 if relative == 0 else data.find(b"\n", relative - 1) + 1
+            if relative != 0 and (line_start == 0 or line_start >= len(data)):
+                # the next line starts in the next chunk
+                break
+            line += data.count(b"\n", counted, line_start)
+            counted = line_start
+            timestamp = parse_timestamp(data[line_start : data.find(b"\n", line_start)])
+            self._offsets.append(position + line_start)
+            self._lines.append(line)
+            self._timestamps.append(math.nan if timestamp is None else timestamp)
+            # a single line may span several blocks
+            boundary = ((position + line_start) // block_size + 1) * block_size
+        self.line_count += data.count(b"\n")
+
+    def offset_for_line(self, line: int) -> int:
+        """
+        Return the byte offset of the given (0 based) line number.
+        """
+        i = bisect.bisect_right(self._lines, line) - 1
+        offset, current = (0, 0) if i < 0 else (self._offsets[i], self._lines[i])
+        with open(self.log_path, "rb") as f:
+            f.seek(offset)
+            while current < line:
+                data = f.read(block_size)
+                if not data:
+                    break
+                remaining = line - current
+                pos = -1
+                for _ in range(min(remaining, data.count(b"\n"))):
+                    pos = data.find(b"\n", pos + 1)
+                    current += 1
+                if current < line:
+                    offset += len(data)
+                else:
+                    offset += pos + 1
+        return offset
+
+    def offset_for_time(self, timestamp: float) -> Tuple[int, int]:
+        """
+        Return (offset, line) of the first indexed block which may contain
+        lines logged at or after the timestamp. The log is assumed to be
+        roughly chronological, blocks without a timestamp are skipped.
+        """
+        best = (0, 0)
+        lo, hi = 0, len(self._timestamps)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            probe = mid
+            while probe < hi and math.isnan(self._timestamps[probe]):
+                probe += 1
+            if probe == hi:
+                hi = mid
+                continue
+            if self._timestamps[probe] < timestamp:
+                best = (self._offsets[probe], self._lines[probe])
+                lo = probe + 1
+            else:
+                hi = mid
+        return best
+
+
+@dataclass
+class SearchMatch:
+    line: int
+    offset: int
+    text: str
+
+
+class LogSearch(threading.Thread):
+    """
+    Search the log for lines matching a regex and/or level in a background
+    thread. Matches are streamed to `on_matches` in batches and the search
+    can be cancelled at any time. A time range is resolved through the
+    index so only the relevant part of the log is read.
+    """
+
+    def __init__(
+        self,
+        index: LineIndex,
+        pattern: Optional[str],
+        on_matches: Callable[[List[SearchMatch]], None],
+        level: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        max_matches: int = 10000,
+        on_finished: Optional[Callable[[int, bool], None]] = None,
+    ):
+        super().__init__(name="log-search", daemon=True)
+        self.index = index
+        self.regex: Optional[Pattern[bytes]] = (
+            re.compile(pattern.encode("utf-8"), re.MULTILINE) if pattern else None
+        )
+        self.level = level.encode() if level else None
+        self.since = since
+        self.until = until
+        self.max_matches = max_matches
+        self.on_matches = on_matches
+        self.on_finished = on_finished
+        self.cancelled = threading.Event()
+
+    def cancel(self) -> None:
+        self.cancelled.set()
+
+    def _matches(self, line: bytes) -> bool:
+        if self.level is not None:
+            match = _level_re.search(line, 0, 160)
+            if match is None or match.group(1) != self.level:
+                return False
+        return self.regex is None or self.regex.search(line) is not None
+
+    def _position(self, line: bytes) -> int:
+        """
+        Return -1 if the line is before the time range, 1 if after and 0 if
+        within or it doesn't carry a timestamp.
+        """
+        if self.since is None and self.until is None:
+            return 0
+        timestamp = parse_timestamp(line)
+        if timestamp is None:
+            return 0
+        if self.until is not None and timestamp > self.until:
+            return 1
+        if self.since is not None and timestamp < self.since:
+            return -1
+        return 0
+
+    def _candidates(self, data: bytes) -> Iterator[int]:
+        """
+        Yield the start of every line in data which may match. The whole
+        chunk is scanned by the regex engine instead of line by line.
+        """
+        finder = self.regex if self.regex is not None else _level_re
+        if self.regex is None and self.level is None:
+            finder = _line_re
+        last = -1
+        for match in finder.finditer(data):
+            start = data.rfind(b"\n", 0, match.start()) + 1
+            if start != last and start < len(data):
+                last = start
+                yield start
+
+    def run(self) -> None:
+        found = 0
+        try:
+            self.index.update(self.cancelled)
+            offset, line_no = (0, 0)
+            if self.since is not None:
+                offset, line_no = self.index.offset_for_time(self.since)
+            found = self._scan(offset, line_no)
+        except Exception as e:
+            logger.error(f"Log search failed: {e}")
+        finally:
+            if self.on_finished is not None:
+                self.on_finished(found, self.cancelled.is_set())
+
+    def _scan(self, offset: int, line_no: int) -> int:
+        found = 0
+        batch: List[SearchMatch] = []
+        last_flush = time.monotonic()
+        done = False
+        with open(self.index.log_path, "rb") as f:
+            f.seek(offset)
+            while not done and not self.cancelled.is_set():
+                data = _read_lines(f)
+                if not data:
+                    break
+                counted = 0
+                for start in self._candidates(data):
+                    line = data[start : data.find(b"\n", start)]
+                    position = self._position(line)
+                    if position > 0:
+                        done = True
+                        break
+                    if position < 0 or not self._matches(line):
+                        continue
+                    line_no += data.count(b"\n", counted, start)
+                    counted = start
+                    batch.append(
+                        SearchMatch(
+                            line_no,
+                            offset + start,
+                            line.rstrip(b"\r").decode("utf-8", errors="replace"),
+                        )
+                    )
+                    found += 1
+                    if found >= self.max_matches:
+                        done = True
+                        break
+                line_no += data.count(b"\n", counted)
+                offset += len(data)
+                if batch and time.monotonic() - last_flush > 0.2:
+                    self.on_matches(batch)
+                    batch, last_flush = [], time.monotonic()
+        if batch:
+            self.on_matches(batch)
+        return found
+
+
+def benchmark(size_gb: float = 2.0) -> None:
+    """
+    Build the index of a synthetic log, extend it after an append, and run a
+    regex search over the whole file.
+    """
+    import sys
+    import tempfile
+
+    if len(sys.argv) > 1:
+        size_gb = float(sys.argv[1])
+    lines = []
+    base = datetime(2025, 1, 1).timestamp()
+    block_lines = 20000
+    with tempfile.TemporaryDirectory() as tmp:
+        log_path = os.path.join(tmp, "gpustack.log")
+        with open(log_path, "wb") as f:
+            written, n = 0, 0
+            target = int(size_gb * 2**30)
+            while written < target:
+                lines.clear()
+                for i in range(block_lines):
+                    ts = datetime.fromtimestamp(base + n + i).isoformat()
+                    level = "ERROR" if (n + i) % 10007 == 0 else "INFO"
+                    lines.append(
+                        f"{ts} - gpustack.worker - {level} - synthetic line {n + i}\n"
+                    )
+                chunk = "".join(lines).encode()
+                f.write(chunk)
+                written += len(chunk)
+                n += block_lines
+        print(f"log: {written / 2**30:.2f} GiB, {n} lines")
+
+        index = LineIndex(log_path, os.path.join(tmp, "gpustack.log.idx"))
+        begin = time.perf_counter()
+        index.update()
+        elapsed = time.perf_counter() - begin
+        print(
+            f"full index: {elapsed:.2f}s ({written / 2**20 / elapsed:.0f} MiB/s), "
+            f"{len(index)} checkpoints, {os.path.getsize(index.path)} bytes"
+        )
+
+        with open(log_path, "ab") as f:
+            f.write(b"2030-01-01T00:00:00 - gpustack.worker - INFO - appended\n")
+        begin = time.perf_counter()
+        read = LineIndex(log_path, index.path).update()
+        print(f"incremental update: {read} bytes in {time.perf_counter() - begin:.4f}s")
+
+        begin = time.perf_counter()
+        offset = index.offset_for_line(n // 2)
+        print(
+            f"seek line {n // 2}: offset {offset} in "
+            f"{(time.perf_counter() - begin) * 1000:.2f}ms"
+        )
+        begin = time.perf_counter()
+        offset, line = index.offset_for_time(base + n * 0.9)
+        print(f"seek time: line {line} in {(time.perf_counter() - begin) * 1000:.2f}ms")
+
+        matches: List[SearchMatch] = []
+        search = LogSearch(index, r"line \d+7$", matches.extend, level="ERROR")
+        begin = time.perf_counter()
+        search.start()
+        search.join()
+        elapsed = time.perf_counter() - begin
+        print(
+            f"search: {len(matches)} matches in {elapsed:.2f}s "
+            f"({written / 2**20 / elapsed:.0f} MiB/s)"
+        )
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,196 @@
+import glob
+import gzip
+import logging
+import os
+import shutil
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+_copy_buffer = 1024 * 1024
+compressions = ("none", "gzip", "zstd")
+compressed_suffixes = (".gz", ".zst")
+
+
+@dataclass
+class RotationPolicy:
+    # 0 disables the threshold
+    max_bytes: int = 256 * 1024 * 1024
+    max_seconds: int = 0
+    keep: int = 5
+    compression: str = "gzip"
+
+    @classmethod
+    def from_settings(cls, settings) -> "RotationPolicy":
+        return cls(
+            max_bytes=settings.log_rotate_bytes,
+            max_seconds=settings.log_rotate_seconds,
+            keep=settings.log_keep,
+            compression=settings.log_compression,
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0 or self.max_seconds > 0
+
+
+def rotated_pattern(path: str) -> str:
+    """
+    Rotated generations follow the naming of nssm, e.g. gpustack.log is
+    rotated to gpustack-20250101T000000.000.log
+    """
+    stem, ext = os.path.splitext(path)
+    return f"{stem}-*{ext}*"
+
+
+def rotated_name(path: str, now: Optional[float] = None) -> str:
+    now = time.time() if now is None else now
+    stem, ext = os.path.splitext(path)
+    stamp = datetime.fromtimestamp(now).strftime("%Y%m%dT%H%M%S")
+    return f"{stem}-{stamp}.{int(now * 1000) % 1000:03d}{ext}"
+
+
+def _stamp_path(path: str) -> str:
+    # records when the current generation was started
+    return f"{path}.rotated"
+
+
+def should_rotate(path: str, policy: RotationPolicy, now: Optional[float] = None):
+    if not policy.enabled or not os.path.exists(path):
+        return False
+    size = os.path.getsize(path)
+    if size == 0:
+        return False
+    if policy.max_bytes > 0 and size >= policy.max_bytes:
+        return True
+    if policy.max_seconds > 0:
+        now = time.time() if now is None else now
+        stamp = _stamp_path(path)
+        started = os.path.getmtime(stamp) if os.path.exists(stamp) else None
+        if started is None:
+            # first time we see it, start counting from now
+            with open(stamp, "w"):
+                pass
+            return False
+        return now - started >= policy.max_seconds
+    return False
+
+
+def copytruncate(path: str, target: str) -> int:
+    """
+    Copy the log to target and truncate it in place. The writer keeps its
+    file descriptor (opened with O_APPEND by launchd), so it continues at the
+    start of the emptied file without being restarted. Bytes appended while
+    copying are picked up before truncating to keep the lost window minimal.
+    """
+    copied = 0
+    with open(path, "rb") as src, open(target, "wb") as dst:
+        while True:
+            data = src.read(_copy_buffer)
+            if not data:
+                break
+            dst.write(data)
+            copied += len(data)
+        with open(path, "r+b") as truncate:
+            # catch up with what was written during the copy
+            rest = src.read()
+            dst.write(rest)
+            copied += len(rest)
+            truncate.truncate(0)
+    return copied
+
+
+def compress(path: str, compression: str) -> str:
+    """
+    Compress a rotated file with bounded memory and remove the original.
+    zstd is optional, gzip is used if the zstandard package is missing.
+    """
+    if compression == "none" or path.endswith(compressed_suffixes):
+        return path
+    if compression == "zstd":
+        try:
+            import zstandard
+
+            target = f"{path}.zst"
+            with open(path, "rb") as src, open(f"{target}.tmp", "wb") as dst:
+                zstandard.ZstdCompressor(level=3, threads=-1).copy_stream(src, dst)
+        except ImportError:
+            logger.error("zstandard is not installed, falling back to gzip.")
+            compression = "gzip"
+    if compression == "gzip":
+        target = f"{path}.gz"
+        with (
+            open(path, "rb") as src,
+            gzip.open(f"{target}.tmp", "wb", compresslevel=6) as dst,
+        ):
+            shutil.copyfileobj(src, dst, _copy_buffer)
+    os.replace(f"{target}.tmp", target)
+    shutil.copystat(path, target)
+    os.remove(path)
+    return target
+
+
+def rotated_files(path: str) -> List[str]:
+    files = [f for f in glob.glob(rotated_pattern(path)) if not f.endswith(".tmp")]
+    return sorted(files, key=os.path.getmtime)
+
+
+def compress_and_prune(path: str, policy: RotationPolicy) -> None:
+    """
+    Compress every rotated generation, including those rotated by nssm, and
+    keep only the newest `policy.keep` of them.
+    """
+    files = rotated_files(path)
+    for f in files:
+        if f.endswith(compressed_suffixes):
+            continue
+        try:
+            compress(f, policy.compression)
+        except Exception as e:
+            logger.error(f"Failed to compress {f}: {e}")
+    files = rotated_files(path)
+    for f in files[: max(len(files) - policy.keep, 0)]:
+        try:
+            os.remove(f)
+        except OSError as e:
+            logger.error(f"Failed to remove {f}: {e}")
+
+
+def rotate(path: str, policy: RotationPolicy, force: bool = False) -> Optional[str]:
+    """
+    Rotate the log if it exceeds the policy, then compress and prune the
+    rotated generations. Return the rotated file, if any.
+    """
+    target = None
+    if force or should_rotate(path, policy):
+        target = rotated_name(path)
+        size = copytruncate(path, target)
+        with open(_stamp_path(path), "w"):
+            pass
+        logger.info(f"Rotated {size} bytes of {path} to {target}")
+    compress_and_prune(path, policy)
+    return target
+
+
+class BackgroundCompressor:
+    """
+    Compress and prune rotated generations in a background thread, used
+    where the service itself rotates the log (nssm).
+    """
+
+    _thread: Optional[threading.Thread] = None
+
+    def trigger(self, path: str, policy: RotationPolicy) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(
+            target=compress_and_prune,
+            args=(path, policy),
+            name="log-compress",
+            daemon=True,
+        )
+        self._thread.start()
@@ -0,0 +1,146 @@
+import mmap
+import os
+import time
+from typing import List, Optional, Tuple
+
+# upper bound of bytes consumed by a single poll, so a burst of appends
+# can't stall the caller
+_max_poll_bytes = 4 * 1024 * 1024
+
+
+def decode_line(line: bytes) -> str:
+    return line.rstrip(b"\r").decode("utf-8", errors="replace")
+
+
+def read_last_lines(path: str, count: int) -> Tuple[List[str], int]:
+    """
+    Return the last `count` complete lines of the file and the offset right
+    after them. The file is memory mapped and scanned backwards from the end,
+    so the cost depends on `count` and not on the size of the file.
+    """
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0 or count <= 0:
+            return [], size
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            # ignore a trailing partial line, it is picked up by the follower
+            end = mm.rfind(b"\n", 0, size)
+            if end < 0:
+                return [], 0
+            end += 1
+            start = end - 1
+            found = 0
+            while found < count:
+                pos = mm.rfind(b"\n", 0, start)
+                if pos < 0:
+                    start = 0
+                    break
+                found += 1
+                start = pos
+            if found == count:
+                start += 1
+            lines = mm[start:end].split(b"\n")[:-1]
+    return [decode_line(line) for line in lines], end
+
+
+class LogFollower:
+    """
+    Follow the appends of a log file incrementally. Only new bytes are read
+    on each poll. Truncation or replacement of the file (rotation) restarts
+    following from the tail of the new file.
+    """
+
+    path: str
+    tail_lines: int
+    _offset: int = 0
+    _identity: Optional[Tuple[int, int]] = None
+
+    def __init__(self, path: str, tail_lines: int = 1000):
+        self.path = path
+        self.tail_lines = tail_lines
+
+    @staticmethod
+    def _file_identity(st: os.stat_result) -> Tuple[int, int]:
+        return (st.st_dev, st.st_ino)
+
+    def reset(self) -> List[str]:
+        """
+        (Re)start following and return the last lines of the file.
+        """
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            self._identity = None
+            self._offset = 0
+            return []
+        lines, self._offset = read_last_lines(self.path, self.tail_lines)
+        self._identity = self._file_identity(st)
+        return lines
+
+    def poll(self) -> Tuple[List[str], bool]:
+        """
+        Return the lines appended since last poll and whether the file was
+        rotated or truncated, in which case the lines are the tail of the
+        new file and the previous content should be discarded.
+        """
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return [], False
+        if (
+            self._identity is None
+            or self._file_identity(st) != self._identity
+            or st.st_size < self._offset
+        ):
+            return self.reset(), True
+        if st.st_size == self._offset:
+            return [], False
+        with open(self.path, "rb") as f:
+            f.seek(self._offset)
+            data = f.read(min(st.st_size - self._offset, _max_poll_bytes))
+        end = data.rfind(b"\n")
+        if end < 0:
+            if len(data) < _max_poll_bytes:
+                # no complete line yet
+                return [], False
+            # a line longer than a whole poll would never complete, emit it
+            # in pieces instead of reading the same bytes forever
+            self._offset += len(data)
+            return [decode_line(data)], False
+        self._offset += end + 1
+        return [decode_line(line) for line in data[:end].split(b"\n")], False
+
+
+def benchmark(size_gb: float = 5.0, tail_lines: int = 1000) -> None:
+    """
+    Time read_last_lines on a small and on a large synthetic log. The large
+    log is sparse except for its tail, so it is cheap to create.
+    """
+    import tempfile
+
+    line = (
+        b"2025-01-01T00:00:00.000000+00:00 - gpustack.worker - INFO - "
+        b"synthetic log line for benchmarking\n"
+    )
+    tail = line * (tail_lines * 2)
+    with tempfile.TemporaryDirectory() as tmp:
+        small = os.path.join(tmp, "small.log")
+        with open(small, "wb") as f:
+            f.write(line * 64)
+        large = os.path.join(tmp, "large.log")
+        with open(large, "wb") as f:
+            f.truncate(int(size_gb * 2**30) - len(tail))
+            f.seek(0, os.SEEK_END)
+            f.write(tail)
+        for path in (small, large):
+            begin = time.perf_counter()
+            lines, _ = read_last_lines(path, tail_lines)
+            elapsed = time.perf_counter() - begin
+            print(
+                f"{os.path.getsize(path) / 2**20:>10.1f} MiB: "
+                f"{len(lines)} lines in {elapsed * 1000:.2f} ms"
+            )
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,281 @@
+import re
+import sys
+import time
+from collections import deque
+from typing import Any, Deque, List, Optional
+from PySide6.QtCore import (
+    Qt,
+    QAbstractListModel,
+    QModelIndex,
+    QTimer,
+    Signal,
+    Slot,
+)
+from PySide6.QtGui import QFont, QFontDatabase, QIcon
+from PySide6.QtWidgets import (
+    QCheckBox,
+    QComboBox,
+    QDialog,
+    QHBoxLayout,
+    QLabel,
+    QLineEdit,
+    QListView,
+    QPushButton,
+    QSplitter,
+    QVBoxLayout,
+)
+from gpustack_helper.common import show_warning
+from gpustack_helper.logs.index import LineIndex, LogSearch, SearchMatch, levels
+from gpustack_helper.logs.tail import LogFollower
+
+default_max_lines = 100_000
+default_tail_lines = 2000
+poll_interval_ms = 500
+
+
+class LogLineModel(QAbstractListModel):
+    """
+    Keeps at most `max_lines` lines in a ring buffer. The view only asks for
+    the visible rows, so rendering cost does not depend on the buffer size.
+    """
+
+    _lines: Deque[str]
+
+    def __init__(self, max_lines: int = default_max_lines, parent=None):
+        super().__init__(parent)
+        self._lines = deque(maxlen=max_lines)
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        if parent.isValid():
+            return 0
+        return len(self._lines)
+
+    def data(
+        self,
+        index: QModelIndex,
+        role: int = Qt.ItemDataRole.DisplayRole,
+    ) -> Any:
+        if not index.isValid() or role != Qt.ItemDataRole.DisplayRole:
+            return None
+        return self._lines[index.row()]
+
+    def reset_lines(self, lines: List[str]) -> None:
+        self.beginResetModel()
+        self._lines.clear()
+        self._lines.extend(lines[-self._lines.maxlen :])
+        self.endResetModel()
+
+    def append_lines(self, lines: List[str]) -> None:
+        if not lines:
+            return
+        maxlen = self._lines.maxlen
+        lines = lines[-maxlen:]
+        overflow = len(self._lines) + len(lines) - maxlen
+        if overflow > 0:
+            self.beginRemoveRows(QModelIndex(), 0, overflow - 1)
+            for _ in range(overflow):
+                self._lines.popleft()
+            self.endRemoveRows()
+        first = len(self._lines)
+        self.beginInsertRows(QModelIndex(), first, first + len(lines) - 1)
+        self._lines.extend(lines)
+        self.endInsertRows()
+
+
+time_ranges = (
+    ("全部时间", None),
+    ("最近1小时", 3600),
+    ("最近24小时", 86400),
+    ("最近7天", 7 * 86400),
+)
+
+
+def _create_list_view(model: LogLineModel) -> QListView:
+    view = QListView()
+    view.setModel(model)
+    # every row has the same height, the view skips measuring each of them
+    view.setUniformItemSizes(True)
+    view.setLayoutMode(QListView.LayoutMode.Batched)
+    view.setBatchSize(500)
+    view.setSelectionMode(QListView.SelectionMode.ExtendedSelection)
+    font: QFont = QFontDatabase.systemFont(QFontDatabase.SystemFont.FixedFont)
+    view.setFont(font)
+    return view
+
+
+class LogViewer(QDialog):
+    # the search emitting them is passed along, results of a cancelled
+    # search which arrive late are dropped
+    matches_found = Signal(object, list)
+    search_finished = Signal(object, int, bool)
+
+    follower: LogFollower
+    model: LogLineModel
+    view: QListView
+    follow: QCheckBox
+    summary: QLabel
+    timer: QTimer
+
+    index: LineIndex
+    search: Optional[LogSearch] = None
+    search_model: LogLineModel
+    search_input: QLineEdit
+    search_level: QComboBox
+    search_range: QComboBox
+    search_button: QPushButton
+    search_summary: QLabel
+
+    def __init__(self, path: str, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle(f"日志 - {path}")
+        if sys.platform != "darwin":
+            self.setWindowIcon(QIcon.fromTheme(QIcon.ThemeIcon.DocumentOpen))
+        self.resize(960, 600)
+        self.follower = LogFollower(path, tail_lines=default_tail_lines)
+        self.model = LogLineModel(parent=self)
+
+        self.view = _create_list_view(self.model)
+
+        self.follow = QCheckBox("跟随")
+        self.follow.setChecked(True)
+        self.follow.toggled.connect(self.on_follow_toggled)
+        reload = QPushButton("重新加载")
+        reload.clicked.connect(self.reload)
+        self.summary = QLabel()
+
+        toolbar = QHBoxLayout()
+        toolbar.addWidget(self.follow)
+        toolbar.addWidget(reload)
+        toolbar.addStretch()
+        toolbar.addWidget(self.summary)
+
+        self.index = LineIndex(path)
+        self.search_model = LogLineModel(parent=self)
+        search_view = _create_list_view(self.search_model)
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("正则表达式")
+        self.search_input.returnPressed.connect(self.on_search_clicked)
+        self.search_level = QComboBox()
+        self.search_level.addItem("全部级别", None)
+        for level in levels:
+            self.search_level.addItem(level, level)
+        self.search_range = QComboBox()
+        for title, seconds in time_ranges:
+            self.search_range.addItem(title, seconds)
+        self.search_button = QPushButton("搜索")
+        self.search_button.clicked.connect(self.on_search_clicked)
+        self.search_summary = QLabel()
+        self.matches_found.connect(self.on_matches_found)
+        self.search_finished.connect(self.on_search_finished)
+
+        search_bar = QHBoxLayout()
+        search_bar.addWidget(self.search_input)
+        search_bar.addWidget(self.search_level)
+        search_bar.addWidget(self.search_range)
+        search_bar.addWidget(self.search_button)
+        search_bar.addWidget(self.search_summary)
+
+        splitter = QSplitter(Qt.Orientation.Vertical)
+        splitter.addWidget(self.view)
+        splitter.addWidget(search_view)
+        splitter.setStretchFactor(0, 3)
+        splitter.setStretchFactor(1, 1)
+
+        layout = QVBoxLayout(self)
+        layout.addLayout(toolbar)
+        layout.addLayout(search_bar)
+        layout.addWidget(splitter)
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.poll)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.reload()
+        if self.follow.isChecked():
+            self.timer.start(poll_interval_ms)
+
+    def hideEvent(self, event):
+        self.timer.stop()
+        self.cancel_search()
+        super().hideEvent(event)
+
+    @Slot()
+    def reload(self):
+        self.model.reset_lines(self.follower.reset())
+        self.update_summary()
+        self.view.scrollToBottom()
+
+    @Slot()
+    def poll(self):
+        lines, rotated = self.follower.poll()
+        if rotated:
+            self.model.reset_lines(lines)
+        elif lines:
+            self.model.append_lines(lines)
+        else:
+            return
+        self.update_summary()
+        if self.follow.isChecked():
+            self.view.scrollToBottom()
+
+    @Slot(bool)
+    def on_follow_toggled(self, checked: bool):
+        if checked:
+            self.poll()
+            self.timer.start(poll_interval_ms)
+        else:
+            self.timer.stop()
+
+    def update_summary(self):
+        self.summary.setText(f"{self.model.rowCount()} 行")
+
+    def cancel_search(self):
+        if self.search is not None:
+            self.search.cancel()
+            self.search = None
+
+    @Slot()
+    def on_search_clicked(self):
+        if self.search is not None:
+            self.cancel_search()
+            return
+        pattern = self.search_input.text()
+        try:
+            re.compile(pattern)
+        except re.error as e:
+            show_warning(self, "无效的正则表达式", str(e))
+            return
+        seconds = self.search_range.currentData()
+        self.search_model.reset_lines([])
+        search = LogSearch(
+            self.index,
+            pattern or None,
+            lambda matches: self.matches_found.emit(search, matches),
+            level=self.search_level.currentData(),
+            since=None if seconds is None else time.time() - seconds,
+            on_finished=lambda found, cancelled: self.search_finished.emit(
+                search, found, cancelled
+            ),
+        )
+        self.search = search
+        self.search_button.setText("取消")
+        self.search_summary.setText("搜索中...")
+        search.start()
+
+    @Slot(object, list)
+    def on_matches_found(self, search: LogSearch, matches: List[SearchMatch]):
+        if search is not self.search:
+            return
+        self.search_model.append_lines([f"{m.line + 1}: {m.text}" for m in matches])
+        self.search_summary.setText(f"搜索中... {self.search_model.rowCount()}")
+
+    @Slot(object, int, bool)
+    def on_search_finished(self, search: LogSearch, found: int, cancelled: bool):
+        if search is not self.search and self.search is not None:
+            return
+        self.search = None
+        self.search_button.setText("搜索")
+        self.search_summary.setText(
+            f"{'已取消, ' if cancelled else ''}共 {found} 条匹配"
+        )
@@ -3,12 +3,22 @@ import signal
 import argparse
 import logging
 import os
+import subprocess
 from gpustack.utils.process import add_signal_handlers
-from PySide6.QtWidgets import QApplication, QSystemTrayIcon, QMenu, QWidget
+from PySide6.QtWidgets import (
+    QApplication,
+    QFileDialog,
+    QInputDialog,
+    QMessageBox,
+    QSystemTrayIcon,
+    QMenu,
+    QWidget,
+)
 from PySide6.QtGui import QAction, QDesktopServices, QIcon
-from PySide6.QtCore import Slot, QUrl, QTimer
-from typing import Dict, Any, List
+from PySide6.QtCore import QObject, Signal, Slot, QUrl, QTimer
+from typing import Dict, Any, List, Optional
 import multiprocessing
+import threading
 from gpustack_helper.databinder import DataBinder
 from gpustack_helper.defaults import (
     log_file_path,
@@ -20,7 +30,19 @@ from gpustack_helper.quickconfig.dialog import QuickConfig
 from gpustack_helper.status import Status
 from gpustack_helper.common import create_menu_action, show_warning
 from gpustack_helper.icon import get_icon
+from gpustack_helper.diagnostics import default_bundle_name, export_bundle
+from gpustack_helper.integrity import third_party_bin_path, verifier, verify
+from gpustack_helper.updates import Updater, apply_staged_update, installed_app_dir
+from gpustack_helper.logs.analytics import LogAnalyzer
+from gpustack_helper.logs.rotate import RotationPolicy, BackgroundCompressor, rotate
+from gpustack_helper.logs.viewer import LogViewer
+from gpustack_helper.proxy import ProxyManager
+from gpustack_helper.mirror import MirrorManager
+from gpustack_helper.qos import Level, QoSManager, apply_recorded_level
+from gpustack_helper.migration import migrate_data
+from gpustack_helper.snapshots import Snapshot, SnapshotReport, SnapshotStore
 from gpustack_helper.services.abstract_service import AbstractService as service
+from gpustack_helper.services.factory import get_service_class
 
 logger = logging.getLogger(__name__)
 
@@ -42,6 +64,19 @@ def open_log_dir() -> None:
     open_with_app(log_file_path)
 
 
+_log_viewer: Optional[LogViewer] = None
+
+
+@Slot()
+def show_log_viewer() -> None:
+    global _log_viewer
+    if _log_viewer is None:
+        _log_viewer = LogViewer(log_file_path)
+    _log_viewer.show()
+    _log_viewer.raise_()
+    _log_viewer.activateWindow()
+
+
 @Slot()
 def open_browser(parent: QWidget, cfg: HelperConfig) -> None:
     config = cfg.user_gpustack_config.load_active_config()
@@ -166,8 +201,495 @@ class Configuration:
         return not os.path.exists(self.cfg.filepath)
 
 
+class FrontProxyControl:
+    cfg: HelperConfig
+    status: Status
+    manager: ProxyManager
+    enable_proxy: QAction
+    proxy_stats: QAction
+    _state: Optional[service.State] = None
+
+    def __init__(self, cfg: HelperConfig, status: Status, parent: QMenu):
+        self.cfg = cfg
+        self.status = status
+        self.manager = ProxyManager()
+        parent.aboutToShow.connect(self.on_menu_shown)
+
+        self.enable_proxy = create_menu_action("前置代理", parent)
+        self.enable_proxy.setCheckable(True)
+        self.enable_proxy.toggled.connect(self.on_toggled)
+        self.proxy_stats = create_menu_action("代理: 未启用", parent)
+        self.proxy_stats.setDisabled(True)
+        # the status is polled, only a transition can free the port or move
+        # gpustack to the internal one
+        status.status_signal.connect(self.on_status_changed)
+        self.reconcile()
+
+    @Slot()
+    def on_menu_shown(self):
+        self.enable_proxy.blockSignals(True)
+        self.enable_proxy.setChecked(self.cfg.helper_settings.proxy_enabled)
+        self.enable_proxy.blockSignals(False)
+        self.update_stats()
+
+    @Slot(bool)
+    def on_toggled(self, checked: bool):
+        self.cfg.helper_settings.update_with_lock(proxy_enabled=checked)
+        # the host and port of gpustack are in its arguments, launchd only
+        # picks them up from the saved definition
+        self.cfg.update_with_lock(ProgramArguments=self.cfg.program_args_defaults())
+        # gpustack has to move between the user facing and the internal port
+        if self.status.status in (service.State.STARTED, service.State.TO_SYNC):
+            self.status.status = service.State.RESTARTING
+        self.reconcile()
+
+    @Slot(service.State)
+    def on_status_changed(self, state: service.State):
+        if state == self._state:
+            return
+        self._state = state
+        self.reconcile()
+
+    @Slot()
+    def reconcile(self):
+        self.manager.reconcile(self.cfg)
+        self.update_stats()
+
+    def update_stats(self):
+        stats = self.manager.stats()
+        if stats is None:
+            self.proxy_stats.setText("代理: 未启用")
+            return
+        self.proxy_stats.setText(
+            f"代理: 排队 {stats.queued} / 连接 {stats.active} / "
+            f"平均延迟 {stats.added_latency_avg * 1000:.1f}ms"
+        )
+
+
+class ToolsMirrorControl:
+    cfg: HelperConfig
+    manager: MirrorManager
+    enable_mirror: QAction
+    mirror_stats: QAction
+
+    def __init__(self, cfg: HelperConfig, parent: QMenu):
+        self.cfg = cfg
+        self.manager = MirrorManager()
+        parent.aboutToShow.connect(self.on_menu_shown)
+
+        self.enable_mirror = create_menu_action("局域网工具镜像", parent)
+        self.enable_mirror.setCheckable(True)
+        self.enable_mirror.toggled.connect(self.on_toggled)
+        self.mirror_stats = create_menu_action("镜像: 未启用", parent)
+        self.mirror_stats.setDisabled(True)
+        self.reconcile()
+
+    @Slot()
+    def on_menu_shown(self):
+        self.enable_mirror.blockSignals(True)
+        self.enable_mirror.setChecked(self.cfg.helper_settings.mirror_enabled)
+        self.enable_mirror.blockSignals(False)
+        self.update_stats()
+
+    @Slot(bool)
+    def on_toggled(self, checked: bool):
+        self.cfg.helper_settings.update_with_lock(mirror_enabled=checked)
+        self.reconcile()
+
+    @Slot()
+    def reconcile(self):
+        self.manager.reconcile(self.cfg)
+        self.update_stats()
+
+    def update_stats(self):
+        stats = self.manager.stats()
+        if stats is None:
+            self.mirror_stats.setText("镜像: 未启用")
+            return
+        self.mirror_stats.setText(
+            f"镜像: 端口 {self.manager.mirror.port} / 请求 {stats.requests} / "
+            f"已发送 {stats.bytes_sent / 2**20:.1f} MiB"
+        )
+
+
+class ForegroundQoSControl:
+    cfg: HelperConfig
+    manager: QoSManager
+    enable_qos: QAction
+    qos_state: QAction
+
+    def __init__(self, cfg: HelperConfig, parent: QMenu):
+        self.cfg = cfg
+        self.manager = QoSManager(cfg)
+        parent.aboutToShow.connect(self.on_menu_shown)
+
+        self.enable_qos = create_menu_action("使用电脑时降低服务优先级", parent)
+        self.enable_qos.setCheckable(True)
+        self.enable_qos.toggled.connect(self.on_toggled)
+        self.qos_state = create_menu_action("优先级: 未启用", parent)
+        self.qos_state.setDisabled(True)
+        if not self.manager.available:
+            # the service priority can't be changed from this process
+            self.enable_qos.setDisabled(True)
+            self.qos_state.setText("优先级: 不可用")
+            return
+        self.reconcile()
+
+    @Slot()
+    def on_menu_shown(self):
+        if not self.manager.available:
+            return
+        self.enable_qos.blockSignals(True)
+        self.enable_qos.setChecked(self.cfg.helper_settings.qos_enabled)
+        self.enable_qos.blockSignals(False)
+        self.update_stats()
+
+    @Slot(bool)
+    def on_toggled(self, checked: bool):
+        self.cfg.helper_settings.update_with_lock(qos_enabled=checked)
+        self.reconcile()
+
+    @Slot()
+    def reconcile(self):
+        self.manager.reconcile()
+        self.update_stats()
+
+    def update_stats(self):
+        level = self.manager.level
+        if level is None:
+            self.qos_state.setText("优先级: 未启用")
+            return
+        self.qos_state.setText(
+            "优先级: 已降低" if level == Level.BACKGROUND else "优先级: 正常"
+        )
+
+
+def _format_seconds(seconds: Optional[float]) -> str:
+    if seconds is None:
+        return "-"
+    if seconds < 60:
+        return f"{seconds:.0f}秒"
+    return f"{seconds / 60:.1f}分钟"
+
+
+class LogAnalytics:
+    analyzer: LogAnalyzer
+    menu: QMenu
+    recent_errors: QAction
+    hourly_errors: QAction
+    load_times: QAction
+
+    def __init__(self, parent: QMenu):
+        self.analyzer = LogAnalyzer(log_file_path)
+        self.menu = parent.addMenu("日志统计")
+        self.menu.aboutToShow.connect(self.update_stats)
+        self.recent_errors = create_menu_action("", self.menu)
+        self.hourly_errors = create_menu_action("", self.menu)
+        self.load_times = create_menu_action("", self.menu)
+        for action in self.menu.actions():
+            action.setDisabled(True)
+        self.update_stats()
+
+    @Slot()
+    def poll(self):
+        self.analyzer.poll_in_background()
+
+    @Slot()
+    def update_stats(self):
+        aggregates = self.analyzer.aggregates
+        recent = aggregates.errors_in(5)
+        self.recent_errors.setText(f"最近5分钟错误: {recent} ({recent / 5:.1f}/分钟)")
+        self.hourly_errors.setText(f"最近1小时错误: {aggregates.errors_in(60)}")
+        percentiles = " / ".join(
+            _format_seconds(aggregates.load_percentile(p)) for p in (50, 90, 99)
+        )
+        self.load_times.setText(
+            f"模型加载耗时 P50/P90/P99: {percentiles} ({aggregates.loads}次)"
+        )
+
+
+class DiagnosticsExport(QObject):
+    # path of the bundle, or the error message
+    finished = Signal(bool, str)
+
+    cfg: HelperConfig
+    action: QAction
+    _thread: Optional[threading.Thread] = None
+
+    def __init__(self, cfg: HelperConfig, parent: QMenu):
+        super().__init__(parent)
+        self.cfg = cfg
+        self.action = create_menu_action("导出诊断包", parent)
+        self.action.triggered.connect(self.on_triggered)
+        self.finished.connect(self.on_finished)
+
+    @Slot()
+    def on_triggered(self):
+        path, _ = QFileDialog.getSaveFileName(
+            None,
+            "导出诊断包",
+            os.path.join(os.path.expanduser("~"), default_bundle_name()),
+            "Zip (*.zip);;tar.zst (*.tar.zst)",
+        )
+        if not path:
+            return
+        self.action.setDisabled(True)
+        self._thread = threading.Thread(
+            target=self.export, args=(path,), name="diagnostics", daemon=True
+        )
+        self._thread.start()
+
+    def export(self, path: str):
+        try:
+            self.finished.emit(True, export_bundle(self.cfg, path))
+        except Exception as e:
+            logger.error(f"Failed to export diagnostics bundle: {e}")
+            self.finished.emit(False, str(e))
+
+    @Slot(bool, str)
+    def on_finished(self, ok: bool, message: str):
+        self.action.setEnabled(True)
+        if not ok:
+            show_warning(None, "导出诊断包失败", message)
+            return
+        QMessageBox.information(None, "导出诊断包", f"诊断包已保存到:\n{message}")
+
+
+class SnapshotControl(QObject):
+    # whether it succeeded, the message to show
+    finished = Signal(bool, str)
+
+    cfg: HelperConfig
+    status: Status
+    menu: QMenu
+    create_snapshot: QAction
+    restore_menu: QMenu
+    open_dir: QAction
+    _thread: Optional[threading.Thread] = None
+
+    def __init__(self, cfg: HelperConfig, status: Status, parent: QMenu):
+        super().__init__(parent)
+        self.cfg = cfg
+        self.status = status
+        self.menu = parent.addMenu("快照")
+        self.create_snapshot = create_menu_action("创建快照", self.menu)
+        self.create_snapshot.triggered.connect(self.on_create)
+        self.restore_menu = self.menu.addMenu("恢复快照")
+        self.restore_menu.aboutToShow.connect(self.update_restore_menu)
+        self.open_dir = create_menu_action("快照目录", self.menu)
+        self.open_dir.triggered.connect(self.open_snapshot_dir)
+        self.finished.connect(self.on_finished)
+
+    @property
+    def store(self) -> SnapshotStore:
+        return SnapshotStore.from_config(self.cfg)
+
+    @Slot()
+    def update_restore_menu(self):
+        self.restore_menu.clear()
+        snapshots = self.store.list()
+        stopped = self.status.status == service.State.STOPPED
+        if not stopped:
+            create_menu_action("请先停止服务", self.restore_menu).setDisabled(True)
+        if not snapshots:
+            create_menu_action("没有快照", self.restore_menu).setDisabled(True)
+        for snapshot in snapshots:
+            title = snapshot.title()
+            if snapshot.reason == "before-restore":
+                title = f"{title} (恢复前自动保存)"
+            action = create_menu_action(title, self.restore_menu)
+            action.setEnabled(stopped)
+            action.triggered.connect(lambda _=False, s=snapshot: self.on_restore(s))
+
+    @Slot()
+    def open_snapshot_dir(self):
+        root = self.store.root
+        if not os.path.isdir(root):
+            show_warning(None, "快照目录", "还没有创建过快照")
+            return
+        open_and_select_file(root)
+
+    @Slot()
+    def on_create(self):
+        label, ok = QInputDialog.getText(None, "创建快照", "快照说明(可选):")
+        if not ok:
+            return
+        self.run(
+            ["--create-snapshot", label],
+            lambda store: store.create(label),
+            "GPUStack 需要创建数据目录快照",
+            "快照已创建",
+        )
+
+    def on_restore(self, snapshot: Snapshot):
+        answer = QMessageBox.question(
+            None,
+            "恢复快照",
+            f"将数据目录和配置恢复到快照 {snapshot.title()}?\n"
+            "当前的数据会自动保存为一个新的快照。",
+        )
+        if answer != QMessageBox.StandardButton.Yes:
+            return
+        self.run(
+            ["--restore-snapshot", snapshot.id],
+            lambda store: store.restore(snapshot.id),
+            "GPUStack 需要恢复数据目录快照",
+            f"已恢复到快照 {snapshot.title()}",
+        )
+
+    def run(self, args: List[str], func, prompt: str, message: str):
+        self.menu.setDisabled(True)
+        self._thread = threading.Thread(
+            target=self.execute,
+            args=(args, func, prompt, message),
+            name="snapshot",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def execute(self, args: List[str], func, prompt: str, message: str):
+        try:
+            if sys.platform == "darwin":
+                # the data dir is owned by root, the helper runs the
+                # operation again as root
+                from gpustack_helper.services.darwin import get_helper_script
+
+                result = subprocess.run(
+                    ["osascript", "-e", get_helper_script(self.cfg, args, prompt)],
+                    capture_output=True,
+                    text=True,
+                    check=False,
+                )
+                if result.returncode != 0:
+                    raise RuntimeError(result.stderr.strip() or result.stdout.strip())
+            else:
+                func(self.store)
+            self.finished.emit(True, message)
+        except Exception as e:
+            logger.error(f"Snapshot operation {args[0]} failed: {e}")
+            self.finished.emit(False, str(e))
+
+    @Slot(bool, str)
+    def on_finished(self, ok: bool, message: str):
+        self.menu.setEnabled(True)
+        if not ok:
+            show_warning(None, "快照操作失败", message)
+            return
+        QMessageBox.information(None, "快照", message)
+
+
+class AppUpdate(QObject):
+    # the staged version or an empty string if up to date, or the error
+    finished = Signal(bool, str)
+
+    cfg: HelperConfig
+    action: QAction
+    _thread: Optional[threading.Thread] = None
+
+    def __init__(self, cfg: HelperConfig, parent: QMenu):
+        super().__init__(parent)
+        self.cfg = cfg
+        self.action = create_menu_action("检查更新", parent)
+        self.action.triggered.connect(self.on_triggered)
+        self.finished.connect(self.on_finished)
+
+    @Slot()
+    def on_triggered(self):
+        base_url = self.cfg.helper_settings.update_base_url
+        app_dir = installed_app_dir()
+        if not base_url or app_dir is None:
+            show_warning(None, "检查更新", "未配置更新服务器地址, 或当前不是安装版本")
+            return
+        self.action.setDisabled(True)
+        self._thread = threading.Thread(
+            target=self.update, args=(base_url, app_dir), name="update", daemon=True
+        )
+        self._thread.start()
+
+    def update(self, base_url: str, app_dir: str):
+        try:
+            plan = Updater(base_url, app_dir, report=logger.info).update()
+            self.finished.emit(True, plan.version if plan is not None else "")
+        except Exception as e:
+            logger.error(f"Failed to update from {base_url}: {e}")
+            self.finished.emit(False, str(e))
+
+    @Slot(bool, str)
+    def on_finished(self, ok: bool, message: str):
+        self.action.setEnabled(True)
+        if not ok:
+            show_warning(None, "检查更新失败", message)
+            return
+        if not message:
+            QMessageBox.information(None, "检查更新", "已是最新版本或更新已就绪")
+            return
+        QMessageBox.information(
+            None,
+            "检查更新",
+            f"版本 {message} 已下载, 将在下次启动服务时应用, 应用后请重新打开 GPUStack Helper",
+        )
+
+
+def rotate_logs(cfg: HelperConfig) -> None:
+    """
+    Rotate the service logs once, run periodically by the privileged
+    ai.gpustack.logrotate job on macOS.
+    """
+    policy = RotationPolicy.from_settings(cfg.helper_settings)
+    for path in {cfg.StandardOutPath, cfg.StandardErrorPath}:
+        if path is None:
+            continue
+        try:
+            rotate(path, policy)
+        except Exception as e:
+            logger.error(f"Failed to rotate {path}: {e}")
+
+
+def verify_binaries() -> bool:
+    bin_path = third_party_bin_path()
+    report = verify(bin_path)
+    if report.manifest_missing:
+        print(f"No integrity manifest in {bin_path}")
+        return False
+    for rel in report.missing:
+        print(f"missing: {rel}")
+    for rel in report.mismatched:
+        print(f"mismatched: {rel}")
+    print(f"checked {report.checked} files, hashed {report.hashed}")
+    return report.ok
+
+
+def snapshot_command(cfg: HelperConfig, args: argparse.Namespace) -> Optional[int]:
+    """
+    Run the snapshot operation given on the command line and return the exit
+    code, None if there is none.
+    """
+    store = SnapshotStore.from_config(cfg)
+    if args.list_snapshots:
+        for snapshot in store.list():
+            print(f"{snapshot.id}\t{snapshot.reason}\t{snapshot.title()}")
+        return 0
+    if args.create_snapshot is not None:
+        snapshot = store.create(args.create_snapshot)
+        print(f"{snapshot.id}: {SnapshotReport(**snapshot.report).summary()}")
+        return 0
+    if args.restore_snapshot is not None:
+        if get_service_class().get_current_state(cfg) != service.State.STOPPED:
+            print("The service has to be stopped to restore a snapshot")
+            return 1
+        before = store.restore(args.restore_snapshot)
+        print(f"Restored {args.restore_snapshot}")
+        if before is not None:
+            print(f"The replaced data is kept as snapshot {before.id}")
+        return 0
+    if args.delete_snapshot is not None:
+        store.delete(args.delete_snapshot)
+        return 0
+    return None
+
+
 def parse_args(args: argparse.Namespace) -> HelperConfig:
-    config_path = getattr(args, "config_path", None)
+    config_path = getattr(args, "config", None)
     data_dir = getattr(args, "data_dir", None)
     binary_path = getattr(args, "binary_path", None)
     debug = getattr(args, "debug", False)
@@ -177,6 +699,8 @@ def parse_args(args: argparse.Namespace) -> HelperConfig:
 
 def init_application(cfg: HelperConfig) -> QApplication:
     app = QApplication(sys.argv)
+    # hashes only what changed since the last run, see integrity.verify
+    verifier.start()
     normal_icon = get_icon(False)
     disabled_icon = get_icon(True)
     app.setQuitOnLastWindowClosed(False)
@@ -190,6 +714,7 @@ def init_application(cfg: HelperConfig) -> QApplication:
         lambda x: set_tray_icon(tray_icon, normal_icon, disabled_icon, x)
     )
     app.aboutToQuit.connect(status.wait_for_process_finish)
+    app.aboutToQuit.connect(status.preflight.shutdown)
 
     open_gpustack = create_menu_action("控制台", menu)
     open_gpustack.triggered.connect(lambda: open_browser(menu, cfg))
@@ -198,11 +723,33 @@ def init_application(cfg: HelperConfig) -> QApplication:
     menu.addSeparator()
 
     configure = Configuration(cfg, status, menu)
+    front_proxy = FrontProxyControl(cfg, status, menu)
+    configure.quick_config_dialog.saved.connect(front_proxy.reconcile)
+    app.aboutToQuit.connect(front_proxy.manager.stop)
+    tools_mirror = ToolsMirrorControl(cfg, menu)
+    app.aboutToQuit.connect(tools_mirror.manager.stop)
+    foreground_qos = ForegroundQoSControl(cfg, menu)
+    # don't leave the service throttled behind
+    app.aboutToQuit.connect(lambda: foreground_qos.manager.stop(wait=True))
+    menu.addSeparator()
 
     # 打开日志
     log_action = create_menu_action("显示日志", menu)
-    log_action.triggered.connect(open_log_dir)
+    log_action.triggered.connect(show_log_viewer)
     log_action.setDisabled(True)
+    log_actions = [log_action]
+    if sys.platform in ("darwin", "win32"):
+        external_log_action = create_menu_action("用外部程序打开日志", menu)
+        external_log_action.triggered.connect(open_log_dir)
+        external_log_action.setDisabled(True)
+        log_actions.append(external_log_action)
+    log_analytics = LogAnalytics(menu)
+    SnapshotControl(cfg, status, menu)
+    DiagnosticsExport(cfg, menu)
+    if sys.platform == "darwin":
+        # on Windows the running executables lock the app folder, it can't
+        # be swapped while the helper is open
+        AppUpdate(cfg, menu)
     menu.addSeparator()
     # 添加“关于”菜单项
     about_action = QAction("关于", menu)
@@ -221,12 +768,24 @@ def init_application(cfg: HelperConfig) -> QApplication:
     @Slot()
     def interval_check():
         status.update_menu_status()
-        if os.path.exists(log_file_path):
-            log_action.setEnabled(True)
-        else:
-            log_action.setDisabled(True)
+        log_exists = os.path.exists(log_file_path)
+        for action in log_actions:
+            action.setEnabled(log_exists)
+        if log_exists:
+            log_analytics.poll()
 
     timer.timeout.connect(interval_check)
+
+    if sys.platform == "win32":
+        # nssm rotates the log, compress and prune what it leaves behind
+        compressor = BackgroundCompressor()
+        log_timer: QTimer = QTimer(menu)
+        log_timer.timeout.connect(
+            lambda: compressor.trigger(
+                log_file_path, RotationPolicy.from_settings(cfg.helper_settings)
+            )
+        )
+        log_timer.start(60 * 1000)
     timer.start(2000)
 
     tray_icon.show()
@@ -261,12 +820,99 @@ def main():
     parser.add_argument(
         "--binary-path", default=None, type=str, help="The GPUStack Binary Path"
     )
+    parser.add_argument(
+        "--rotate-logs",
+        default=False,
+        action="store_true",
+        help="Rotate the service logs according to the helper settings and exit",
+    )
+    parser.add_argument(
+        "--apply-qos",
+        default=False,
+        action="store_true",
+        help="Apply the recorded service priority level and exit",
+    )
+    parser.add_argument(
+        "--apply-update",
+        default=False,
+        action="store_true",
+        help="Verify and swap in the staged update of the app and exit, macOS only",
+    )
+    parser.add_argument(
+        "--migrate-data",
+        default=False,
+        action="store_true",
+        help="Move the data dir of a legacy installation to the active data dir and exit",
+    )
+    parser.add_argument(
+        "--list-snapshots",
+        default=False,
+        action="store_true",
+        help="List the snapshots of the data dir and the configs and exit",
+    )
+    parser.add_argument(
+        "--create-snapshot",
+        default=None,
+        nargs="?",
+        const="",
+        type=str,
+        metavar="LABEL",
+        help="Snapshot the data dir and the configs and exit",
+    )
+    parser.add_argument(
+        "--restore-snapshot",
+        default=None,
+        type=str,
+        metavar="ID",
+        help="Restore the data dir and the configs from a snapshot and exit, "
+        "the service has to be stopped",
+    )
+    parser.add_argument(
+        "--delete-snapshot",
+        default=None,
+        type=str,
+        metavar="ID",
+        help="Delete a snapshot and exit",
+    )
+    parser.add_argument(
+        "--export-diagnostics",
+        default=None,
+        type=str,
+        metavar="PATH",
+        help="Write a diagnostics bundle (.zip or .tar.zst) to PATH and exit",
+    )
+    parser.add_argument(
+        "--verify-binaries",
+        default=False,
+        action="store_true",
+        help="Verify the bundled third party binaries against the manifest and exit",
+    )
     args, _ = parser.parse_known_args()
     if args.debug:
         logging.basicConfig(level=logging.DEBUG)
     else:
         logging.basicConfig(level=logging.INFO)
     cfg = parse_args(args)
+    if args.rotate_logs:
+        rotate_logs(cfg)
+        return
+    if args.apply_update:
+        print(apply_staged_update() or "No update staged")
+        return
+    if args.migrate_data:
+        print(migrate_data(cfg).summary())
+        return
+    code = snapshot_command(cfg, args)
+    if code is not None:
+        sys.exit(code)
+    if args.apply_qos:
+        apply_recorded_level(cfg)
+        return
+    if args.verify_binaries:
+        sys.exit(0 if verify_binaries() else 1)
+    if args.export_diagnostics:
+        export_bundle(cfg, args.export_diagnostics, progress=print)
+        return
     app = init_application(cfg)
     sys.exit(app.exec())
 
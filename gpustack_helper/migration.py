@@ -0,0 +1,398 @@
+import json
+import logging
+import os
+import shutil
+import sys
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+
+from gpustack_helper.defaults import legacy_data_dir, get_lagecy_env_file
+from gpustack_helper.envfile import parse_env
+
+logger = logging.getLogger(__name__)
+
+checkpoint_name = ".migration.json"
+partial_suffix = ".migrating"
+# marks the legacy env file as imported, next to the helper config
+env_imported_marker = ".legacy-env-imported"
+# left in the active data dir when files of the legacy data dir conflicted,
+# the migration isn't retried on every start until it is removed
+conflicts_marker = ".migration-conflicts.json"
+default_chunk_size = 8 * 1024 * 1024
+# copied bytes between two checkpoints of a partial file
+checkpoint_interval = 64 * 1024 * 1024
+
+
+@dataclass
+class MigrationReport:
+    files: int = 0
+    renamed: int = 0
+    linked: int = 0
+    copied: int = 0
+    skipped: int = 0
+    conflicts: int = 0
+    bytes: int = 0
+    copied_bytes: int = 0
+    resumed_bytes: int = 0
+    seconds: float = 0.0
+
+    @property
+    def throughput(self) -> float:
+        """
+        Migrated bytes per second, links and renames included.
+        """
+        return self.bytes / self.seconds if self.seconds > 0 else 0.0
+
+    def summary(self) -> str:
+        return (
+            f"{self.files} files, {self.bytes / 2**20:.1f} MiB in "
+            f"{self.seconds:.1f}s ({self.throughput / 2**20:.1f} MiB/s): "
+            f"{self.renamed} renamed, {self.linked} linked, {self.copied} copied "
+            f"({self.copied_bytes / 2**20:.1f} MiB, "
+            f"{self.resumed_bytes / 2**20:.1f} MiB resumed), {self.skipped} skipped, "
+            f"{self.conflicts} conflicts"
+        )
+
+
+class Checkpoint:
+    """
+    Progress of an interrupted migration: the file being copied and how much
+    of it is on disk. Finished files are recognized by their size and mtime,
+    so only the partial file has to be recorded.
+    """
+
+    path: str
+    partial: Optional[Dict[str, Any]] = None
+
+    def __init__(self, path: str):
+        self.path = path
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                self.partial = json.load(f).get("partial")
+        except (OSError, ValueError):
+            self.partial = None
+
+    def resumable(self, rel: str, st: os.stat_result) -> int:
+        """
+        The offset to resume rel at, 0 if the source changed since.
+        """
+        partial = self.partial
+        if (
+            partial is None
+            or partial.get("rel") != rel
+            or partial.get("size") != st.st_size
+            or partial.get("mtime_ns") != st.st_mtime_ns
+        ):
+            return 0
+        return int(partial.get("offset", 0))
+
+    def save(self, rel: str, st: os.stat_result, offset: int) -> None:
+        self.partial = {
+            "rel": rel,
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "offset": offset,
+        }
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": 1, "partial": self.partial}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+    def remove(self) -> None:
+        self.partial = None
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def _same_device(src: str, dst: str) -> bool:
+    parent = dst
+    while not os.path.exists(parent):
+        parent = os.path.dirname(parent)
+    return os.stat(src).st_dev == os.stat(parent).st_dev
+
+
+def _empty_or_missing(path: str) -> bool:
+    return not os.path.exists(path) or (
+        os.path.isdir(path) and not any(os.scandir(path))
+    )
+
+
+def _chown_like(st: os.stat_result, path: str) -> None:
+    if hasattr(os, "chown") and os.geteuid() == 0:
+        os.chown(path, st.st_uid, st.st_gid, follow_symlinks=False)
+
+
+class _Migration:
+    src: str
+    dst: str
+    link: bool
+    chunk_size: int
+    checkpoint: Checkpoint
+    report: MigrationReport
+    progress: Optional[Callable[[MigrationReport], None]]
+
+    def __init__(self, src, dst, link, chunk_size, report, progress):
+        self.src = src
+        self.dst = dst
+        self.link = link
+        self.chunk_size = chunk_size
+        self.report = report
+        self.progress = progress
+        self.checkpoint = Checkpoint(os.path.join(dst, checkpoint_name))
+
+    def run(self) -> None:
+        for root, dirs, files in os.walk(self.src):
+            rel_root = os.path.relpath(root, self.src)
+            target_root = os.path.normpath(os.path.join(self.dst, rel_root))
+            os.makedirs(target_root, exist_ok=True)
+            shutil.copymode(root, target_root)
+            # symlinked dirs are listed as dirs but not descended into
+            for name in [d for d in dirs if os.path.islink(os.path.join(root, d))]:
+                dirs.remove(name)
+                files.append(name)
+            for name in files:
+                rel = os.path.normpath(os.path.join(rel_root, name))
+                self.file(
+                    rel, os.path.join(root, name), os.path.join(target_root, name)
+                )
+                if self.progress is not None:
+                    self.progress(self.report)
+        self.checkpoint.remove()
+
+    def file(self, rel: str, src: str, dst: str) -> None:
+        st = os.lstat(src)
+        report = self.report
+        report.files += 1
+        if os.path.islink(src):
+            if not os.path.lexists(dst):
+                os.symlink(os.readlink(src), dst)
+                _chown_like(st, dst)
+            return
+        report.bytes += st.st_size
+        if os.path.exists(dst):
+            current = os.stat(dst)
+            if not os.path.samefile(src, dst) and (
+                current.st_size != st.st_size or current.st_mtime_ns != st.st_mtime_ns
+            ):
+                logger.warning(f"{dst} exists already, kept instead of {src}")
+                report.conflicts += 1
+            else:
+                report.skipped += 1
+            return
+        if self.link:
+            try:
+                os.link(src, dst)
+                report.linked += 1
+                return
+            except OSError as e:
+                # e.g. a filesystem without hardlinks mounted below the dir
+                logger.debug(f"Failed to link {src}, copying it: {e}")
+        self.copy(rel, src, dst, st)
+        report.copied += 1
+
+    def copy(self, rel: str, src: str, dst: str, st: os.stat_result) -> None:
+        tmp = dst + partial_suffix
+        offset = 0
+        if os.path.exists(tmp):
+            offset = min(self.checkpoint.resumable(rel, st), os.path.getsize(tmp))
+        self.report.resumed_bytes += offset
+        unsaved = 0
+        with open(src, "rb") as fsrc, open(tmp, "r+b" if offset else "wb") as fdst:
+            fdst.truncate(offset)
+            fsrc.seek(offset)
+            fdst.seek(offset)
+            while True:
+                chunk = fsrc.read(self.chunk_size)
+                if not chunk:
+                    break
+                fdst.write(chunk)
+                offset += len(chunk)
+                unsaved += len(chunk)
+                self.report.copied_bytes += len(chunk)
+                if unsaved >= checkpoint_interval:
+                    # the data has to be on disk before the checkpoint says so
+                    fdst.flush()
+                    os.fsync(fdst.fileno())
+                    self.checkpoint.save(rel, st, offset)
+                    unsaved = 0
+                    if self.progress is not None:
+                        self.progress(self.report)
+            fdst.flush()
+            os.fsync(fdst.fileno())
+        shutil.copystat(src, tmp)
+        _chown_like(st, tmp)
+        os.replace(tmp, dst)
+
+
+def migrate_tree(
+    src: str,
+    dst: str,
+    remove_source: bool = True,
+    link: bool = True,
+    chunk_size: int = default_chunk_size,
+    progress: Optional[Callable[[MigrationReport], None]] = None,
+) -> MigrationReport:
+    """
+    Move the tree at src to dst. On the same filesystem the tree is renamed
+    if dst is empty, or its files hardlinked otherwise. Across filesystems
+    the files are copied in chunks, an interrupted migration resumes from
+    the checkpoint in dst. Existing files in dst are kept. link=False
+    forces the copy.
+    """
+    report = MigrationReport()
+    started = time.perf_counter()
+    if not os.path.isdir(src):
+        return report
+    same_device = _same_device(src, dst)
+    if same_device and link and remove_source and _empty_or_missing(dst):
+        for root, _, files in os.walk(src):
+            report.files += len(files)
+            report.bytes += sum(os.lstat(os.path.join(root, f)).st_size for f in files)
+        os.makedirs(os.path.dirname(os.path.abspath(dst)), exist_ok=True)
+        if os.path.exists(dst):
+            os.rmdir(dst)
+        os.rename(src, dst)
+        report.renamed = report.files
+    else:
+        os.makedirs(dst, exist_ok=True)
+        _Migration(src, dst, same_device and link, chunk_size, report, progress).run()
+        if remove_source and report.conflicts == 0:
+            shutil.rmtree(src)
+        elif remove_source:
+            logger.warning(f"{src} is kept, {report.conflicts} files differ in {dst}")
+    report.seconds = time.perf_counter() - started
+    logger.info(f"Migrated {src} to {dst}: {report.summary()}")
+    return report
+
+
+def needs_data_migration(cfg) -> bool:
+    src = os.path.abspath(legacy_data_dir)
+    if not os.path.isdir(src) or src == os.path.abspath(cfg.active_data_dir):
+        return False
+    if os.path.exists(os.path.join(cfg.active_data_dir, conflicts_marker)):
+        return False
+    try:
+        return any(os.scandir(src))
+    except PermissionError:
+        # owned by root, checked again by the privileged migration
+        return True
+
+
+def migrate_data(
+    cfg, progress: Optional[Callable[[MigrationReport], None]] = None
+) -> MigrationReport:
+    """
+    Move the data dir of the legacy installation into the active data dir.
+    Needs the privileges of the service, the service must be stopped.
+    """
+    if not needs_data_migration(cfg):
+        return MigrationReport()
+    report = migrate_tree(legacy_data_dir, cfg.active_data_dir, progress=progress)
+    if report.conflicts:
+        marker = os.path.join(cfg.active_data_dir, conflicts_marker)
+        with open(marker, "w", encoding="utf-8") as f:
+            json.dump({"source": legacy_data_dir, "conflicts": report.conflicts}, f)
+        logger.warning(
+            f"{report.conflicts} files of {legacy_data_dir} conflicted, remove "
+            f"{marker} to migrate it again"
+        )
+    return report
+
+
+def import_legacy_env(cfg) -> int:
+    """
+    Add the variables of the legacy env file to EnvironmentVariables, the
+    ones set already win. Imported once, later removals in the dialog stay.
+    Returns the number of variables added.
+    """
+    try:
+        path = get_lagecy_env_file()
+    except (NotImplementedError, KeyError):
+        return 0
+    marker = os.path.join(os.path.dirname(cfg.filepath), env_imported_marker)
+    if not os.path.isfile(path) or os.path.exists(marker):
+        return 0
+    with open(path, "r", encoding="utf-8") as f:
+        pairs = parse_env(f.read())
+    current = dict(cfg.EnvironmentVariables)
+    added = {name: value for name, value in pairs if name not in current}
+    if added:
+        cfg.update_with_lock(EnvironmentVariables={**current, **added})
+        logger.info(f"Imported {', '.join(added)} from {path}")
+    os.makedirs(os.path.dirname(marker), exist_ok=True)
+    with open(marker, "w", encoding="utf-8") as f:
+        f.write(f"{path}\n")
+    return len(added)
+
+
+def benchmark(size_mb: int = 512, files: int = 64) -> None:
+    """
+    Migrate a synthetic tree by hardlinks and by the chunked copy, then
+    resume a copy interrupted halfway.
+    """
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmp:
+
+        def make_tree(path: str) -> None:
+            for i in range(files):
+                sub = os.path.join(path, "cache", f"model-{i % 8}")
+                os.makedirs(sub, exist_ok=True)
+                with open(os.path.join(sub, f"blob-{i}"), "wb") as f:
+                    f.write(os.urandom(size_mb * 1024 * 1024 // files))
+            with open(os.path.join(path, "database.db"), "wb") as f:
+                f.write(os.urandom(1024 * 1024))
+
+        for name, link in (("link", True), ("copy", False)):
+            src = os.path.join(tmp, f"{name}-legacy")
+            dst = os.path.join(tmp, f"{name}-data")
+            make_tree(src)
+            os.makedirs(dst)
+            # not empty, so the tree isn't just renamed
+            open(os.path.join(dst, "config.yaml"), "w").close()
+            print(f"{name}: {migrate_tree(src, dst, link=link).summary()}")
+
+        # a single large file, interrupted halfway and resumed
+        src = os.path.join(tmp, "resume-legacy")
+        dst = os.path.join(tmp, "resume-data")
+        os.makedirs(src)
+        with open(os.path.join(src, "model.gguf"), "wb") as f:
+            for _ in range(size_mb):
+                f.write(os.urandom(1024 * 1024))
+
+        class Interrupt(Exception):
+            pass
+
+        def interrupt(report: MigrationReport) -> None:
+            if report.copied_bytes >= size_mb * 1024 * 1024 // 2:
+                raise Interrupt()
+
+        try:
+            migrate_tree(src, dst, link=False, progress=interrupt)
+        except Interrupt:
+            pass
+        print(f"resumed: {migrate_tree(src, dst, link=False).summary()}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Migrate a legacy data dir")
+    parser.add_argument("src", nargs="?")
+    parser.add_argument("dst", nargs="?")
+    parser.add_argument("--keep-source", action="store_true")
+    parser.add_argument("--copy", action="store_true", help="never hardlink")
+    parser.add_argument("--benchmark", action="store_true")
+    args = parser.parse_args()
+    if args.benchmark or not args.src:
+        benchmark()
+    else:
+        report = migrate_tree(
+            args.src, args.dst, remove_source=not args.keep_source, link=not args.copy
+        )
+        print(report.summary())
+    sys.exit(0)
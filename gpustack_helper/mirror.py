@@ -0,0 +1,424 @@
+import email.utils
+import functools
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+import uuid
+import zipfile
+from dataclasses import dataclass
+from http import HTTPStatus
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from importlib.resources import files
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+from gpustack_helper.artifacts import (
+    ArtifactCache,
+    file_sha256,
+    installed_release_name,
+)
+
+logger = logging.getLogger(__name__)
+
+_buffer_size = 1024 * 1024
+
+
+@dataclass
+class MirrorStats:
+    requests: int = 0
+    not_modified: int = 0
+    partial: int = 0
+    bytes_sent: int = 0
+
+
+class _ETags:
+    """
+    Strong ETags are the sha256 of the files, hashed once and kept until
+    the stat of the file changes.
+    """
+
+    _tags: Dict[str, Tuple[Tuple[int, int, int], str]]
+    _lock: threading.Lock
+
+    def __init__(self):
+        self._tags = {}
+        self._lock = threading.Lock()
+
+    def get(self, path: str, st: os.stat_result) -> str:
+        key = (st.st_size, st.st_mtime_ns, st.st_ino)
+        with self._lock:
+            cached = self._tags.get(path)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        tag = f'"{file_sha256(path)}"'
+        with self._lock:
+            self._tags[path] = (key, tag)
+        return tag
+
+
+class _MirrorRequestHandler(SimpleHTTPRequestHandler):
+    """
+    Serve the release files read only, with ETags, conditional requests and
+    single range requests, enough for ToolsManager and DownloadScheduler to
+    resume downloads against it.
+    """
+
+    mirror: "ArtifactMirror"
+    _range: Optional[Tuple[int, int]] = None
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} {format % args}")
+
+    def list_directory(self, path):
+        self.send_error(HTTPStatus.NOT_FOUND)
+        return None
+
+    def _matches(self, header: str, etag: str) -> bool:
+        values = [v.strip() for v in self.headers.get(header, "").split(",")]
+        return etag in values or "*" in values
+
+    def _requested_range(self, size: int, etag: str, mtime: float):
+        """
+        Return (start, end) of a satisfiable single range, None for the whole
+        file, or False if the range can't be satisfied.
+        """
+        match = re.fullmatch(r"bytes=(\d*)-(\d*)", self.headers.get("Range", ""))
+        if match is None or (not match[1] and not match[2]):
+            return None
+        if_range = self.headers.get("If-Range")
+        if if_range and if_range != etag:
+            try:
+                if email.utils.parsedate_to_datetime(if_range).timestamp() < int(mtime):
+                    return None
+            except (TypeError, ValueError):
+                return None
+        if not match[1]:
+            # suffix range, the last n bytes
+            start, end = max(size - int(match[2]), 0), size - 1
+        else:
+            start = int(match[1])
+            end = min(int(match[2]) if match[2] else size - 1, size - 1)
+        if start >= size or start > end:
+            return False
+        return start, end
+
+    def send_head(self):
+        self._range = None
+        path = self.translate_path(self.path)
+        name = os.path.basename(path)
+        if not os.path.isfile(path) or name.startswith("."):
+            # directories, partial files of publish() and anything missing
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return None
+        f = open(path, "rb")
+        try:
+            st = os.fstat(f.fileno())
+            etag = self.mirror.etags.get(path, st)
+            if self._matches("If-None-Match", etag):
+                self.mirror.count(not_modified=1)
+                self.send_response(HTTPStatus.NOT_MODIFIED)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                f.close()
+                return None
+            requested = self._requested_range(st.st_size, etag, st.st_mtime)
+            if requested is False:
+                self.send_response(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+                self.send_header("Content-Range", f"bytes */{st.st_size}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                f.close()
+                return None
+            if requested is None:
+                self.send_response(HTTPStatus.OK)
+                length = st.st_size
+            else:
+                start, end = requested
+                f.seek(start)
+                self._range = requested
+                length = end - start + 1
+                self.mirror.count(partial=1)
+                self.send_response(HTTPStatus.PARTIAL_CONTENT)
+                self.send_header("Content-Range", f"bytes {start}-{end}/{st.st_size}")
+            self.send_header("Content-Type", self.guess_type(path))
+            self.send_header("Content-Length", str(length))
+            self.send_header("Accept-Ranges", "bytes")
+            self.send_header("ETag", etag)
+            self.send_header("Last-Modified", self.date_time_string(st.st_mtime))
+            self.end_headers()
+            return f
+        except Exception:
+            f.close()
+            raise
+
+    def do_GET(self):
+        self.mirror.count(requests=1)
+        super().do_GET()
+
+    def copyfile(self, source, outputfile):
+        left = None
+        if self._range is not None:
+            left = self._range[1] - self._range[0] + 1
+        while left is None or left > 0:
+            data = source.read(
+                _buffer_size if left is None else min(left, _buffer_size)
+            )
+            if not data:
+                break
+            outputfile.write(data)
+            self.mirror.count(bytes_sent=len(data))
+            if left is not None:
+                left -= len(data)
+
+
+class ArtifactMirror:
+    """
+    Serve the mirror of the artifact cache, which has the layout of the
+    release server, over HTTP. Other nodes point PREFERRED_BASE_URL (or
+    GPUStack's tools download base url) at it.
+    """
+
+    root: str
+    listen: Tuple[str, int]
+    etags: _ETags
+    stats: MirrorStats
+
+    _server: Optional[ThreadingHTTPServer] = None
+    _thread: Optional[threading.Thread] = None
+    _stats_lock: threading.Lock
+
+    def __init__(self, root: str, listen: Tuple[str, int]):
+        self.root = root
+        self.listen = listen
+        self.etags = _ETags()
+        self.stats = MirrorStats()
+        self._stats_lock = threading.Lock()
+
+    def count(self, **deltas: int) -> None:
+        with self._stats_lock:
+            for name, delta in deltas.items():
+                setattr(self.stats, name, getattr(self.stats, name) + delta)
+
+    def snapshot(self) -> MirrorStats:
+        with self._stats_lock:
+            return MirrorStats(**vars(self.stats))
+
+    @property
+    def port(self) -> int:
+        if self._server is None:
+            return self.listen[1]
+        return self._server.server_address[1]
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        os.makedirs(self.root, exist_ok=True)
+        handler = type("Handler", (_MirrorRequestHandler,), {"mirror": self})
+        self._server = ThreadingHTTPServer(
+            self.listen, functools.partial(handler, directory=self.root)
+        )
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="mirror", daemon=True
+        )
+        self._thread.start()
+        logger.info(f"Serving {self.root} on {self.listen[0]}:{self.port}")
+
+    def stop(self) -> None:
+        if self._server is not None:
+            if self.is_running():
+                self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        self._thread = None
+
+
+def bundled_llama_box_dir() -> Optional[Path]:
+    try:
+        return Path(str(files("gpustack.third_party"))) / "bin" / "llama-box"
+    except ModuleNotFoundError:
+        return None
+
+
+def _pack(binary: Path, path: Path) -> None:
+    # release archives hold the binary alone, see tools.download_and_extract
+    name = "llama-box.exe" if binary.suffix == ".exe" else "llama-box"
+    os.makedirs(path.parent, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        with zipfile.ZipFile(tmp, "w", zipfile.ZIP_DEFLATED) as archive:
+            archive.write(binary, name)
+        os.replace(tmp, path)
+    finally:
+        if os.path.lexists(tmp):
+            os.remove(tmp)
+
+
+def fill_from_bundle(cache: ArtifactCache, bin_dir: Path) -> int:
+    """
+    The app only bundles the extracted llama-box binaries, the mirror of a
+    fresh cache is empty. Pack every bundled variant missing from the mirror
+    back into a release archive, publish a sha256sum.txt of what the mirror
+    has and return how many were packed. Packed archives differ from the
+    released ones, the checksums are those of the files served.
+    """
+    try:
+        with open(bin_dir / installed_release_name, "r", encoding="utf-8") as f:
+            release = json.load(f)
+    except (OSError, ValueError):
+        return 0
+    url_dir = f"{release['repo']}/releases/download/{release['version']}"
+    checksums: Dict[str, str] = {}
+    packed = 0
+    for target, archive in release["archives"].items():
+        binary = bin_dir / target
+        path = cache.mirror_root / url_dir / archive
+        if not path.is_file():
+            if not binary.is_file():
+                continue
+            _pack(binary, path)
+            packed += 1
+        checksums[archive] = file_sha256(path)
+    if checksums:
+        cache.publish_checksums(url_dir, checksums)
+    return packed
+
+
+class MirrorManager:
+    """
+    Keep the mirror in line with the helper settings, like ProxyManager.
+    The mirror is filled from the bundled tools the first time it starts.
+    """
+
+    cache: ArtifactCache
+    root: str
+    bin_dir: Optional[Path]
+    mirror: Optional[ArtifactMirror] = None
+    _filler: Optional[threading.Thread] = None
+
+    def __init__(
+        self, cache: Optional[ArtifactCache] = None, bin_dir: Optional[Path] = None
+    ):
+        self.cache = cache or ArtifactCache()
+        self.root = str(self.cache.mirror_root)
+        self.bin_dir = bin_dir or bundled_llama_box_dir()
+
+    def _fill(self) -> None:
+        try:
+            packed = fill_from_bundle(self.cache, self.bin_dir)
+            logger.info(f"Packed {packed} bundled llama-box variant(s) for the mirror")
+        except Exception as e:
+            logger.error(f"Failed to fill the mirror from the bundle: {e}")
+
+    def reconcile(self, cfg) -> None:
+        settings = cfg.helper_settings
+        if not settings.mirror_enabled:
+            self.stop()
+            return
+        listen = ("0.0.0.0", settings.mirror_port)
+        if self.mirror is not None and self.mirror.listen != listen:
+            self.stop()
+        if self.mirror is None:
+            self.mirror = ArtifactMirror(self.root, listen)
+        if not self.mirror.is_running():
+            try:
+                self.mirror.start()
+            except OSError as e:
+                self.mirror.stop()
+                self.mirror = None
+                logger.error(f"Failed to start the artifact mirror: {e}")
+                return
+        if self._filler is None and self.bin_dir is not None:
+            # packing hundreds of MiB, files not packed yet are a 404 meanwhile
+            self._filler = threading.Thread(
+                target=self._fill, name="mirror-fill", daemon=True
+            )
+            self._filler.start()
+
+    def stop(self) -> None:
+        if self.mirror is not None:
+            self.mirror.stop()
+            self.mirror = None
+
+    def stats(self) -> Optional[MirrorStats]:
+        if self.mirror is None or not self.mirror.is_running():
+            return None
+        return self.mirror.snapshot()
+
+
+def benchmark(size_mb: int = 256, clients: int = 4) -> None:
+    """
+    Download a synthetic archive from the mirror by several clients at once,
+    then again with its ETag, which is answered without a body.
+    """
+    import tempfile
+    import time
+    import urllib.error
+    import urllib.request
+
+    with tempfile.TemporaryDirectory() as tmp:
+        archive = os.path.join(tmp, "llama-box.zip")
+        with open(archive, "wb") as f:
+            for _ in range(size_mb):
+                f.write(os.urandom(1024 * 1024))
+        mirror = ArtifactMirror(tmp, ("127.0.0.1", 0))
+        mirror.start()
+        url = f"http://127.0.0.1:{mirror.port}/llama-box.zip"
+        try:
+
+            def fetch(headers: Dict[str, str]) -> int:
+                request = urllib.request.Request(url, headers=headers)
+                try:
+                    with urllib.request.urlopen(request) as response:
+                        with open(os.devnull, "wb") as null:
+                            shutil.copyfileobj(response, null, _buffer_size)
+                        return response.status
+                except urllib.error.HTTPError as e:
+                    return e.code
+
+            started = time.perf_counter()
+            threads = [
+                threading.Thread(target=fetch, args=({},)) for _ in range(clients)
+            ]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            elapsed = time.perf_counter() - started
+            etag = mirror.etags.get(archive, os.stat(archive))
+            started = time.perf_counter()
+            status = fetch({"If-None-Match": etag})
+            revalidate = time.perf_counter() - started
+        finally:
+            mirror.stop()
+        print(
+            f"{clients} clients x {size_mb} MiB: {elapsed:.2f}s "
+            f"({clients * size_mb / elapsed:.1f} MiB/s)"
+        )
+        print(f"revalidation: {status} in {revalidate * 1000:.1f}ms")
+        print(mirror.snapshot())
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve the tools mirror")
+    parser.add_argument("--port", type=int, default=10161)
+    parser.add_argument("--root", default=None)
+    parser.add_argument("--benchmark", action="store_true")
+    args = parser.parse_args()
+    if args.benchmark:
+        benchmark()
+    else:
+        logging.basicConfig(level=logging.INFO)
+        mirror = ArtifactMirror(
+            args.root or str(ArtifactCache().mirror_root), ("0.0.0.0", args.port)
+        )
+        mirror.start()
+        try:
+            mirror._thread.join()
+        except KeyboardInterrupt:
+            mirror.stop()
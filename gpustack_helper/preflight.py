@@ -0,0 +1,288 @@
+import errno
+import hashlib
+import json
+import logging
+import os
+import shutil
+import socket
+import threading
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from gpustack.config import Config
+from gpustack_helper.config import HelperConfig, CleanConfig
+from gpustack_helper.integrity import verifier
+
+logger = logging.getLogger(__name__)
+
+default_check_timeout = 3.0
+
+
+class Severity(IntEnum):
+    OK = 0
+    WARNING = 1
+    ERROR = 2
+
+
+@dataclass
+class CheckResult:
+    name: str
+    severity: Severity
+    message: str = ""
+
+
+@dataclass
+class PreflightReport:
+    results: List[CheckResult] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return all(r.severity < Severity.ERROR for r in self.results)
+
+    @property
+    def errors(self) -> List[CheckResult]:
+        return [r for r in self.results if r.severity == Severity.ERROR]
+
+    @property
+    def warnings(self) -> List[CheckResult]:
+        return [r for r in self.results if r.severity == Severity.WARNING]
+
+
+@dataclass
+class _Context:
+    cfg: HelperConfig
+    config: CleanConfig
+    min_free_bytes: int
+
+
+@dataclass
+class _Check:
+    name: str
+    func: Callable[[_Context], CheckResult]
+    # results of cacheable checks only depend on the config, the others
+    # depend on the state of the machine and always run
+    cacheable: bool = False
+    on_restart: bool = True
+
+
+def _nearest_existing(path: str) -> str:
+    path = os.path.abspath(path)
+    while not os.path.exists(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    return path
+
+
+def _listen_addresses(ctx: _Context) -> List[Tuple[str, int]]:
+    settings = ctx.cfg.helper_settings
+    if settings.proxy_enabled:
+        return [("127.0.0.1", settings.proxy_internal_port)]
+    port = ctx.config.port if ctx.config.port else 80
+    host = ctx.config.host
+    if host is None or host in ("", "0.0.0.0", "::"):
+        # gpustack binds to every interface, any of them being taken fails it
+        addresses = [("0.0.0.0", port), ("127.0.0.1", port)]
+        if socket.has_ipv6:
+            addresses.append(("::", port))
+        return addresses
+    return [(host, port)]
+
+
+def check_port(ctx: _Context) -> CheckResult:
+    name = "port"
+    for host, port in _listen_addresses(ctx):
+        family = socket.AF_INET6 if ":" in host else socket.AF_INET
+        try:
+            with socket.socket(family, socket.SOCK_STREAM) as s:
+                s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+                s.bind((host, port))
+        except OSError as e:
+            # ipv6 may be unavailable on this host, only a taken port matters
+            if family == socket.AF_INET6 and e.errno != errno.EADDRINUSE:
+                continue
+            return CheckResult(
+                name,
+                Severity.ERROR,
+                f"端口 {host}:{port} 已被占用。请检查是否有其他服务在运行。",
+            )
+    return CheckResult(name, Severity.OK)
+
+
+def check_config(ctx: _Context) -> CheckResult:
+    name = "config"
+    try:
+        Config.model_validate(ctx.config.model_dump(exclude_defaults=True))
+    except Exception as e:
+        return CheckResult(name, Severity.ERROR, f"配置校验失败: {e}")
+    return CheckResult(name, Severity.OK)
+
+
+def check_binary(ctx: _Context) -> CheckResult:
+    name = "binary"
+    path = ctx.cfg.gpustack_binary_path
+    if not os.path.isfile(path):
+        return CheckResult(name, Severity.ERROR, f"找不到 GPUStack 程序: {path}")
+    if not os.access(path, os.X_OK):
+        return CheckResult(name, Severity.ERROR, f"GPUStack 程序不可执行: {path}")
+    return CheckResult(name, Severity.OK)
+
+
+def check_data_dir(ctx: _Context) -> CheckResult:
+    name = "data_dir"
+    existing = _nearest_existing(ctx.cfg.active_data_dir)
+    if not os.path.isdir(existing):
+        return CheckResult(name, Severity.ERROR, f"数据目录路径无效: {existing}")
+    if not os.access(existing, os.W_OK):
+        # the service runs privileged, it may still be able to write it
+        return CheckResult(
+            name, Severity.WARNING, f"当前用户无法写入数据目录: {existing}"
+        )
+    return CheckResult(name, Severity.OK)
+
+
+def check_disk(ctx: _Context) -> CheckResult:
+    name = "disk"
+    existing = _nearest_existing(ctx.cfg.active_data_dir)
+    free = shutil.disk_usage(existing).free
+    if free < ctx.min_free_bytes:
+        return CheckResult(
+            name,
+            Severity.ERROR,
+            f"数据目录所在磁盘剩余空间不足: {free / 2**30:.1f} GiB",
+        )
+    return CheckResult(name, Severity.OK)
+
+
+def check_server_url(ctx: _Context) -> CheckResult:
+    name = "server_url"
+    server_url = ctx.config.server_url
+    if not server_url:
+        return CheckResult(name, Severity.OK)
+    try:
+        urllib.request.urlopen(
+            f"{server_url.rstrip('/')}/healthz", timeout=default_check_timeout
+        ).close()
+    except urllib.error.HTTPError:
+        # any http response means the server is reachable
+        pass
+    except Exception as e:
+        return CheckResult(name, Severity.ERROR, f"无法连接 Server {server_url}: {e}")
+    return CheckResult(name, Severity.OK)
+
+
+def check_third_party(ctx: _Context) -> CheckResult:
+    name = "third_party"
+    # only files changed since the last verification are hashed again
+    verifier.start()
+    report = verifier.wait(default_check_timeout - 0.5)
+    if report is None:
+        return CheckResult(name, Severity.WARNING, "内置组件校验尚未完成")
+    if not report.ok:
+        damaged = report.missing + report.mismatched
+        return CheckResult(
+            name,
+            Severity.ERROR,
+            f"内置组件已损坏, 请重新安装: {', '.join(damaged[:5])}"
+            f"{' 等' if len(damaged) > 5 else ''}",
+        )
+    return CheckResult(name, Severity.OK)
+
+
+checks: Tuple[_Check, ...] = (
+    _Check("port", check_port, on_restart=False),
+    _Check("config", check_config, cacheable=True),
+    _Check("binary", check_binary, cacheable=True),
+    _Check("data_dir", check_data_dir),
+    _Check("disk", check_disk),
+    _Check("server_url", check_server_url),
+    _Check("third_party", check_third_party),
+)
+
+
+def config_hash(cfg: HelperConfig, config: CleanConfig) -> str:
+    data: Dict[str, Any] = {
+        "helper": cfg.model_dump(mode="json"),
+        "settings": cfg.helper_settings.model_dump(mode="json"),
+        "config": config.model_dump(mode="json", exclude_defaults=True),
+        "binary": cfg.gpustack_binary_path,
+        "data_dir": cfg.active_data_dir,
+    }
+    encoded = json.dumps(data, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class Preflight:
+    """
+    Run the checks concurrently in a thread pool before the service is
+    started. Passing results of config-only checks are cached by the hash of
+    the configs, so unchanged configs are not re-checked.
+    """
+
+    _executor: ThreadPoolExecutor
+    _cache: Dict[Tuple[str, str], CheckResult]
+    _lock: threading.Lock
+
+    def __init__(self, max_workers: int = len(checks)):
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="preflight"
+        )
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def run(
+        self,
+        cfg: HelperConfig,
+        restart: bool = False,
+        timeout: float = default_check_timeout,
+    ) -> PreflightReport:
+        config = cfg.user_gpustack_config
+        settings = cfg.helper_settings
+        ctx = _Context(cfg, config, settings.preflight_min_free_gb * 2**30)
+        digest = config_hash(cfg, config)
+
+        report = PreflightReport()
+        pending: Dict[Any, _Check] = {}
+        for check in checks:
+            if restart and not check.on_restart:
+                continue
+            with self._lock:
+                cached: Optional[CheckResult] = self._cache.get((check.name, digest))
+            if cached is not None:
+                report.results.append(cached)
+                continue
+            pending[self._executor.submit(self._guarded, check, ctx)] = check
+
+        done, not_done = wait(pending, timeout=timeout)
+        for future in done:
+            check = pending[future]
+            result = future.result()
+            report.results.append(result)
+            if check.cacheable and result.severity == Severity.OK:
+                with self._lock:
+                    self._cache[(check.name, digest)] = result
+        for future in not_done:
+            future.cancel()
+            report.results.append(
+                CheckResult(pending[future].name, Severity.WARNING, "检查超时")
+            )
+        for result in report.results:
+            if result.severity != Severity.OK:
+                logger.warning(f"Preflight {result.name}: {result.message}")
+        return report
+
+    @staticmethod
+    def _guarded(check: _Check, ctx: _Context) -> CheckResult:
+        try:
+            return check.func(ctx)
+        except Exception as e:
+            logger.debug(f"Preflight check {check.name} failed: {e}")
+            return CheckResult(check.name, Severity.WARNING, f"检查失败: {e}")
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,318 @@
+import asyncio
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_buffer_size = 64 * 1024
+_retry_interval = 0.2
+
+
+@dataclass
+class ProxyStats:
+    active: int = 0
+    queued: int = 0
+    total_connections: int = 0
+    total_queued: int = 0
+    rejected: int = 0
+    timed_out: int = 0
+    # seconds spent between accept and upstream connected, summed over all
+    # forwarded connections
+    added_latency_total: float = 0.0
+    added_latency_max: float = 0.0
+
+    @property
+    def added_latency_avg(self) -> float:
+        forwarded = self.total_connections - self.rejected - self.timed_out
+        if forwarded <= 0:
+            return 0.0
+        return self.added_latency_total / forwarded
+
+
+class FrontProxy:
+    """
+    A TCP reverse proxy which owns the user facing port and forwards every
+    connection to GPUStack on an internal port. While the upstream is not
+    accepting connections (e.g. the service is restarting) new connections
+    are held in a bounded queue until the upstream is back or the timeout
+    expires, instead of being refused.
+    """
+
+    listen: Tuple[str, int]
+    upstream: Tuple[str, int]
+    queue_size: int
+    queue_timeout: float
+    stats: ProxyStats
+
+    _loop: Optional[asyncio.AbstractEventLoop] = None
+    _server: Optional[asyncio.AbstractServer] = None
+    _stopping: Optional[asyncio.Event] = None
+    _thread: Optional[threading.Thread] = None
+    _stats_lock: threading.Lock
+
+    def __init__(
+        self,
+        listen: Tuple[str, int],
+        upstream: Tuple[str, int],
+        queue_size: int = 128,
+        queue_timeout: float = 30.0,
+    ):
+        self.listen = listen
+        self.upstream = upstream
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.stats = ProxyStats()
+        self._stats_lock = threading.Lock()
+
+    def snapshot(self) -> ProxyStats:
+        with self._stats_lock:
+            return ProxyStats(**self.stats.__dict__)
+
+    async def _connect_upstream(
+        self,
+    ) -> Optional[Tuple[asyncio.StreamReader, asyncio.StreamWriter]]:
+        try:
+            return await asyncio.open_connection(*self.upstream)
+        except OSError:
+            pass
+        # the upstream is down, wait in queue if there is room for us
+        with self._stats_lock:
+            if self.stats.queued >= self.queue_size:
+                self.stats.rejected += 1
+                return None
+            self.stats.queued += 1
+            self.stats.total_queued += 1
+        deadline = time.monotonic() + self.queue_timeout
+        try:
+            while time.monotonic() < deadline:
+                await asyncio.sleep(_retry_interval)
+                try:
+                    return await asyncio.open_connection(*self.upstream)
+                except OSError:
+                    continue
+            with self._stats_lock:
+                self.stats.timed_out += 1
+            return None
+        finally:
+            with self._stats_lock:
+                self.stats.queued -= 1
+
+    @staticmethod
+    async def _pipe(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                data = await reader.read(_buffer_size)
+                if not data:
+                    break
+                writer.write(data)
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            try:
+                writer.close()
+            except Exception:
+                pass
+
+    async def _handle(
+        self, client_reader: asyncio.StreamReader, client_writer: asyncio.StreamWriter
+    ):
+        accepted = time.monotonic()
+        with self._stats_lock:
+            self.stats.total_connections += 1
+        try:
+            upstream = await self._connect_upstream()
+        except asyncio.CancelledError:
+            upstream = None
+        if upstream is None:
+            client_writer.close()
+            return
+        latency = time.monotonic() - accepted
+        with self._stats_lock:
+            self.stats.active += 1
+            self.stats.added_latency_total += latency
+            self.stats.added_latency_max = max(self.stats.added_latency_max, latency)
+        upstream_reader, upstream_writer = upstream
+        try:
+            await asyncio.gather(
+                self._pipe(client_reader, upstream_writer),
+                self._pipe(upstream_reader, client_writer),
+                return_exceptions=True,
+            )
+        except asyncio.CancelledError:
+            upstream_writer.close()
+            client_writer.close()
+        finally:
+            with self._stats_lock:
+                self.stats.active -= 1
+
+    async def _serve(self, started: threading.Event):
+        host, port = self.listen
+        self._stopping = asyncio.Event()
+        self._server = await asyncio.start_server(
+            self._handle, host, port, reuse_address=True
+        )
+        logger.info(f"Front proxy listening on {host}:{port} -> {self.upstream}")
+        started.set()
+        async with self._server:
+            await self._stopping.wait()
+        # drop the queued and forwarding connections
+        current = asyncio.current_task()
+        tasks = [t for t in asyncio.all_tasks() if t is not current]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _run(self, started: threading.Event):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_until_complete(self._serve(started))
+        except Exception as e:
+            logger.error(f"Front proxy stopped with error: {e}")
+        finally:
+            started.set()
+            self._loop.close()
+
+    def start(self, timeout: float = 5.0) -> None:
+        """
+        Start serving in a background thread and wait for the listen socket.
+        """
+        if self.is_running():
+            return
+        started = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, args=(started,), name="front-proxy", daemon=True
+        )
+        self._thread.start()
+        started.wait(timeout)
+        if self._server is None or not self._server.is_serving():
+            raise RuntimeError(f"Front proxy failed to listen on {self.listen}")
+
+    def stop(self) -> None:
+        if self._loop is None or self._server is None:
+            return
+        if self._loop.is_running():
+            self._loop.call_soon_threadsafe(self._stopping.set)
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self._server = None
+        self._thread = None
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+
+class ProxyManager:
+    """
+    Keep the front proxy in line with the helper settings. reconcile() is
+    called when they or the service state change, a failed start (e.g. the
+    port is still held by a GPUStack which hasn't been restarted onto the
+    internal port yet) is retried on the next change.
+    """
+
+    proxy: Optional[FrontProxy] = None
+
+    def reconcile(self, cfg) -> None:
+        settings = cfg.helper_settings
+        if not settings.proxy_enabled:
+            self.stop()
+            return
+        config = cfg.user_gpustack_config
+        host = config.host if config.host else "0.0.0.0"
+        port = config.port if config.port else 80
+        listen = (host, port)
+        upstream = ("127.0.0.1", settings.proxy_internal_port)
+        if self.proxy is not None and (
+            self.proxy.listen != listen or self.proxy.upstream != upstream
+        ):
+            self.stop()
+        if self.proxy is None:
+            self.proxy = FrontProxy(
+                listen,
+                upstream,
+                queue_size=settings.proxy_queue_size,
+                queue_timeout=settings.proxy_queue_timeout,
+            )
+        if not self.proxy.is_running():
+            try:
+                self.proxy.start()
+            except Exception as e:
+                self.proxy.stop()
+                logger.warning(f"Front proxy not started: {e}")
+
+    def stop(self) -> None:
+        if self.proxy is not None:
+            self.proxy.stop()
+            self.proxy = None
+
+    def stats(self) -> Optional[ProxyStats]:
+        if self.proxy is None or not self.proxy.is_running():
+            return None
+        return self.proxy.snapshot()
+
+
+def benchmark(requests: int = 2000, payload: int = 1024) -> None:
+    """
+    Measure the per request overhead of the proxy against a local echo
+    upstream, comparing direct connections with proxied ones.
+    """
+    import socket
+
+    def free_port() -> int:
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+            s.bind(("127.0.0.1", 0))
+            return s.getsockname()[1]
+
+    async def echo(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        data = await reader.read(_buffer_size)
+        writer.write(data)
+        await writer.drain()
+        writer.close()
+
+    upstream_port = free_port()
+    loop = asyncio.new_event_loop()
+    ready = threading.Event()
+
+    async def serve_upstream():
+        server = await asyncio.start_server(echo, "127.0.0.1", upstream_port)
+        ready.set()
+        async with server:
+            await server.serve_forever()
+
+    threading.Thread(
+        target=lambda: loop.run_until_complete(serve_upstream()), daemon=True
+    ).start()
+    ready.wait()
+
+    proxy = FrontProxy(("127.0.0.1", free_port()), ("127.0.0.1", upstream_port))
+    proxy.start()
+    body = b"x" * payload
+
+    def run(port: int) -> float:
+        begin = time.perf_counter()
+        for _ in range(requests):
+            with socket.create_connection(("127.0.0.1", port)) as s:
+                s.sendall(body)
+                received = 0
+                while received < payload:
+                    chunk = s.recv(_buffer_size)
+                    if not chunk:
+                        break
+                    received += len(chunk)
+        return (time.perf_counter() - begin) / requests
+
+    direct = run(upstream_port)
+    proxied = run(proxy.listen[1])
+    proxy.stop()
+    print(f"requests: {requests}, payload: {payload} bytes")
+    print(f"direct : {direct * 1e6:.1f} us/request")
+    print(f"proxied: {proxied * 1e6:.1f} us/request")
+    print(f"overhead: {(proxied - direct) * 1e6:.1f} us/request")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,533 @@
+import ctypes
+import functools
+import logging
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from enum import Enum
+from typing import Callable, List, Optional, Tuple
+
+import psutil
+
+logger = logging.getLogger(__name__)
+
+qos_level_file_name = "qos-level"
+# nice of the service while the user is active, unless configured lower
+background_nice = 10
+_ioreg_idle = re.compile(r'"HIDIdleTime"\s*=\s*(\d+)')
+# SHQueryUserNotificationState: QUNS_BUSY, QUNS_RUNNING_D3D_FULL_SCREEN and
+# QUNS_PRESENTATION_MODE
+_windows_fullscreen_states = (2, 3, 4)
+# AdjustTokenPrivileges succeeded without enabling every privilege
+_error_not_all_assigned = 1300
+# the service pid is looked up again after this long, or when applying
+pid_refresh_seconds = 30.0
+
+
+class Level(str, Enum):
+    FULL = "full"
+    BACKGROUND = "background"
+
+
+@dataclass
+class Activity:
+    # None if the platform doesn't tell
+    idle_seconds: Optional[float] = None
+    fullscreen: bool = False
+
+
+class ActivitySource(ABC):
+    @abstractmethod
+    def sample(self) -> Activity:
+        """
+        The current activity of the desktop user.
+        """
+
+
+class FakeActivitySource(ActivitySource):
+    """
+    Reports whatever it is told, for driving QoSEngine without a desktop.
+    """
+
+    activity: Activity
+
+    def __init__(self, idle_seconds: Optional[float] = None, fullscreen=False):
+        self.activity = Activity(idle_seconds, fullscreen)
+
+    def sample(self) -> Activity:
+        return Activity(self.activity.idle_seconds, self.activity.fullscreen)
+
+
+class DarwinActivitySource(ActivitySource):
+    _quartz_missing_logged: bool = False
+
+    def _idle_seconds(self) -> Optional[float]:
+        try:
+            output = subprocess.run(
+                ["ioreg", "-c", "IOHIDSystem", "-d", "4"],
+                capture_output=True,
+                text=True,
+                timeout=5,
+            ).stdout
+        except (OSError, subprocess.TimeoutExpired) as e:
+            logger.debug(f"Failed to read the idle time: {e}")
+            return None
+        match = _ioreg_idle.search(output)
+        return int(match[1]) / 1e9 if match else None
+
+    def _fullscreen(self) -> bool:
+        try:
+            import Quartz
+        except ImportError:
+            if not self._quartz_missing_logged:
+                logger.error(
+                    "pyobjc Quartz is not installed, full screen apps are ignored."
+                )
+                self._quartz_missing_logged = True
+            return False
+        display = Quartz.CGDisplayBounds(Quartz.CGMainDisplayID())
+        windows = Quartz.CGWindowListCopyWindowInfo(
+            Quartz.kCGWindowListOptionOnScreenOnly
+            | Quartz.kCGWindowListExcludeDesktopElements,
+            Quartz.kCGNullWindowID,
+        )
+        for window in windows or []:
+            bounds = window.get("kCGWindowBounds", {})
+            if (
+                window.get("kCGWindowLayer") == 0
+                and bounds.get("Width") == display.size.width
+                and bounds.get("Height") == display.size.height
+            ):
+                return True
+        return False
+
+    def sample(self) -> Activity:
+        return Activity(self._idle_seconds(), self._fullscreen())
+
+
+class WindowsActivitySource(ActivitySource):
+    def sample(self) -> Activity:
+        from ctypes import wintypes
+
+        class LASTINPUTINFO(ctypes.Structure):
+            _fields_ = [("cbSize", wintypes.UINT), ("dwTime", wintypes.DWORD)]
+
+        info = LASTINPUTINFO(cbSize=ctypes.sizeof(LASTINPUTINFO))
+        idle = None
+        if ctypes.windll.user32.GetLastInputInfo(ctypes.byref(info)):
+            # both wrap around after 49.7 days
+            ticks = ctypes.windll.kernel32.GetTickCount() & 0xFFFFFFFF
+            idle = ((ticks - info.dwTime) & 0xFFFFFFFF) / 1000
+        state = ctypes.c_int(0)
+        fullscreen = (
+            ctypes.windll.shell32.SHQueryUserNotificationState(ctypes.byref(state)) == 0
+            and state.value in _windows_fullscreen_states
+        )
+        return Activity(idle, fullscreen)
+
+
+def default_activity_source() -> Optional[ActivitySource]:
+    if sys.platform == "darwin":
+        return DarwinActivitySource()
+    if sys.platform == "win32":
+        return WindowsActivitySource()
+    return None
+
+
+@dataclass
+class QoSPolicy:
+    # input within this many seconds means the user is at the machine
+    active_idle_seconds: float = 30.0
+    # and only idle for this long gives the service full priority back. The
+    # gap between the two is the hysteresis.
+    restore_idle_seconds: float = 300.0
+    # the user has to be active for this long before the service is throttled
+    engage_after: float = 10.0
+    # minimum time between two adjustments, whatever the activity does
+    min_interval: float = 30.0
+
+    @classmethod
+    def from_settings(cls, settings) -> "QoSPolicy":
+        return cls(
+            active_idle_seconds=settings.qos_idle_seconds,
+            restore_idle_seconds=max(
+                settings.qos_restore_seconds, settings.qos_idle_seconds
+            ),
+        )
+
+
+class QoSEngine:
+    """
+    Decide the priority of the service from the user activity. tick() is
+    meant to be called periodically, apply is only called on a change of
+    the level and every change is logged.
+    """
+
+    source: ActivitySource
+    policy: QoSPolicy
+    level: Level
+    last_activity: Optional[Activity] = None
+
+    _apply: Callable[[Level], None]
+    _clock: Callable[[], float]
+    _pending_since: Optional[float] = None
+    _changed_at: Optional[float] = None
+
+    def __init__(
+        self,
+        source: ActivitySource,
+        apply: Callable[[Level], None],
+        policy: Optional[QoSPolicy] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.source = source
+        self.policy = policy or QoSPolicy()
+        self.level = Level.FULL
+        self._apply = apply
+        self._clock = clock
+
+    def desired(self, activity: Activity) -> Level:
+        if activity.fullscreen:
+            return Level.BACKGROUND
+        if activity.idle_seconds is None:
+            return self.level
+        if self.level == Level.FULL:
+            active = activity.idle_seconds < self.policy.active_idle_seconds
+            return Level.BACKGROUND if active else Level.FULL
+        restore = activity.idle_seconds >= self.policy.restore_idle_seconds
+        return Level.FULL if restore else Level.BACKGROUND
+
+    def _due(self, wanted: Level, now: float) -> bool:
+        if self._changed_at is not None and (
+            now - self._changed_at < self.policy.min_interval
+        ):
+            return False
+        if wanted == Level.BACKGROUND:
+            return now - self._pending_since >= self.policy.engage_after
+        return True
+
+    def tick(self) -> Level:
+        now = self._clock()
+        activity = self.source.sample()
+        self.last_activity = activity
+        wanted = self.desired(activity)
+        if wanted == self.level:
+            self._pending_since = None
+            return self.level
+        if self._pending_since is None:
+            self._pending_since = now
+        if self._due(wanted, now):
+            self.set_level(wanted, activity)
+        return self.level
+
+    def set_level(self, level: Level, activity: Optional[Activity] = None) -> None:
+        now = self._clock()
+        logger.info(
+            f"Service priority {self.level.value} -> {level.value}"
+            + (
+                f" (idle {activity.idle_seconds}s, fullscreen {activity.fullscreen})"
+                if activity is not None
+                else ""
+            )
+        )
+        # retried after min_interval if it fails
+        self._changed_at = now
+        self._pending_since = None
+        try:
+            self._apply(level)
+        except Exception as e:
+            logger.error(f"Failed to set the service priority to {level.value}: {e}")
+            return
+        self.level = level
+
+
+def parse_cpu_list(value: Optional[str]) -> Optional[List[int]]:
+    """
+    Parse a cpu list like 0-3,6 as nssm takes for AppAffinity. None or
+    empty means all cpus.
+    """
+    if not value or value.strip().lower() == "all":
+        return None
+    cpus = set()
+    for part in value.split(","):
+        start, _, end = part.strip().partition("-")
+        cpus.update(range(int(start), int(end or start) + 1))
+    return sorted(cpus)
+
+
+def service_pid() -> Optional[int]:
+    if sys.platform == "darwin":
+        from gpustack_helper.services.darwin import parse_service_status, service_id
+
+        pid = parse_service_status().get(service_id, {}).get("pid")
+        return int(pid) if pid else None
+    if sys.platform == "win32":
+        from gpustack_helper.services.windows import service_name
+
+        try:
+            return psutil.win_service_get(service_name).pid()
+        except psutil.Error:
+            return None
+    return None
+
+
+@functools.lru_cache(maxsize=None)
+def can_adjust_service() -> bool:
+    """
+    On macOS the root ai.gpustack.qos job adjusts the service. On Windows
+    the service runs as LocalSystem, even the elevated helper can only
+    change its priority with SeDebugPrivilege enabled.
+    """
+    if sys.platform == "darwin":
+        return True
+    if sys.platform != "win32":
+        return False
+    try:
+        import win32api
+        import win32security
+
+        token = win32security.OpenProcessToken(
+            win32api.GetCurrentProcess(),
+            win32security.TOKEN_ADJUST_PRIVILEGES | win32security.TOKEN_QUERY,
+        )
+        luid = win32security.LookupPrivilegeValue(None, win32security.SE_DEBUG_NAME)
+        win32security.AdjustTokenPrivileges(
+            token, False, [(luid, win32security.SE_PRIVILEGE_ENABLED)]
+        )
+        if win32api.GetLastError() == _error_not_all_assigned:
+            logger.error("SeDebugPrivilege is not held, run the helper elevated.")
+            return False
+        return True
+    except Exception as e:
+        logger.error(f"Failed to enable SeDebugPrivilege: {e}")
+        return False
+
+
+def _process_tree(pid: int) -> List[psutil.Process]:
+    root = psutil.Process(pid)
+    return [root] + root.children(recursive=True)
+
+
+def _full_settings(cfg) -> Tuple[int, Optional[List[int]]]:
+    if sys.platform == "win32":
+        priority = getattr(psutil, cfg.AppPriority or "", psutil.NORMAL_PRIORITY_CLASS)
+        return priority, parse_cpu_list(cfg.AppAffinity)
+    return cfg.Nice or 0, None
+
+
+def _set_priority(proc: psutil.Process, level: Level, priority: int) -> None:
+    if sys.platform == "win32":
+        background = level == Level.BACKGROUND
+        proc.nice(psutil.BELOW_NORMAL_PRIORITY_CLASS if background else priority)
+        proc.ionice(psutil.IOPRIO_LOW if background else psutil.IOPRIO_NORMAL)
+        return
+    proc.nice(max(priority, background_nice) if level == Level.BACKGROUND else priority)
+    if sys.platform == "darwin":
+        # darwin background policy throttles both cpu and io
+        flag = "-b" if level == Level.BACKGROUND else "-B"
+        subprocess.run(["taskpolicy", flag, "-p", str(proc.pid)], check=True)
+    elif hasattr(proc, "ionice"):
+        proc.ionice(
+            psutil.IOPRIO_CLASS_IDLE
+            if level == Level.BACKGROUND
+            else psutil.IOPRIO_CLASS_NONE
+        )
+
+
+def apply_level(cfg, level: Level, pid: Optional[int] = None) -> int:
+    """
+    Set the cpu and io priority, and the affinity where supported, of the
+    service process tree. Needs the privileges of the service. Returns the
+    number of processes adjusted.
+    """
+    pid = pid or service_pid()
+    if pid is None:
+        logger.debug("GPUStack service is not running, priority left alone")
+        return 0
+    priority, affinity = _full_settings(cfg)
+    if level == Level.BACKGROUND:
+        affinity = parse_cpu_list(cfg.helper_settings.qos_affinity) or affinity
+    adjusted = 0
+    for proc in _process_tree(pid):
+        try:
+            _set_priority(proc, level, priority)
+            if hasattr(proc, "cpu_affinity"):
+                proc.cpu_affinity(affinity or [])
+            adjusted += 1
+        except psutil.NoSuchProcess:
+            continue
+    return adjusted
+
+
+def qos_level_path(cfg) -> str:
+    return os.path.join(os.path.dirname(cfg.filepath), qos_level_file_name)
+
+
+def write_level(cfg, level: Level, pid: Optional[int] = None) -> None:
+    """
+    On macOS the service runs as root, the helper only records the level and
+    the ai.gpustack.qos job, watching the file, applies it. The pid is
+    recorded too so a restarted service changes the file again.
+    """
+    path = qos_level_path(cfg)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(f"{level.value} {pid or ''}\n")
+    os.replace(tmp, path)
+
+
+def apply_recorded_level(cfg) -> None:
+    """
+    Entry of the privileged ai.gpustack.qos job.
+    """
+    try:
+        with open(qos_level_path(cfg), "r", encoding="utf-8") as f:
+            level = Level(f.read().split()[0])
+    except (OSError, ValueError, IndexError) as e:
+        logger.error(f"No valid qos level recorded: {e}")
+        return
+    adjusted = apply_level(cfg, level)
+    logger.info(f"Set {adjusted} service processes to {level.value}")
+
+
+class QoSManager:
+    """
+    Keep the foreground policy in line with the helper settings, like
+    ProxyManager. Sampling and applying run in a worker thread, the tray
+    only starts and stops it when the setting changes. The level is
+    reapplied when the service got restarted, as its new processes start at
+    full priority.
+    """
+
+    cfg: object
+    interval: float
+    engine: Optional[QoSEngine] = None
+    _source: Optional[ActivitySource]
+    _thread: Optional[threading.Thread] = None
+    _stopping: Optional[threading.Event] = None
+    _pid: Optional[int] = None
+    _pid_checked: Optional[float] = None
+    _applied_pid: Optional[int] = None
+
+    def __init__(
+        self, cfg, source: Optional[ActivitySource] = None, interval: float = 2.0
+    ):
+        self.cfg = cfg
+        self.interval = interval
+        self._source = source or default_activity_source()
+
+    @property
+    def available(self) -> bool:
+        return self._source is not None and can_adjust_service()
+
+    def _service_pid(self) -> Optional[int]:
+        now = time.monotonic()
+        if self._pid_checked is None or now - self._pid_checked >= pid_refresh_seconds:
+            self._pid = service_pid()
+            self._pid_checked = now
+        return self._pid
+
+    def _apply(self, level: Level) -> None:
+        self._pid_checked = None
+        self._applied_pid = self._service_pid()
+        if sys.platform == "darwin":
+            write_level(self.cfg, level, self._applied_pid)
+        else:
+            apply_level(self.cfg, level, self._applied_pid)
+
+    def _tick(self, engine: QoSEngine) -> None:
+        engine.tick()
+        if engine.level == Level.BACKGROUND:
+            pid = self._service_pid()
+            if pid is not None and pid != self._applied_pid:
+                engine.set_level(Level.BACKGROUND)
+
+    def _run(self, engine: QoSEngine, stopping: threading.Event) -> None:
+        while not stopping.wait(self.interval):
+            try:
+                self._tick(engine)
+            except Exception as e:
+                logger.error(f"Failed to sample the user activity: {e}")
+        if engine.level != Level.FULL:
+            engine.set_level(Level.FULL)
+
+    def reconcile(self) -> None:
+        """
+        Start or stop the worker after the setting changed.
+        """
+        settings = self.cfg.helper_settings
+        if not settings.qos_enabled or not self.available:
+            self.stop()
+            return
+        policy = QoSPolicy.from_settings(settings)
+        if self._thread is not None and self._thread.is_alive():
+            self.engine.policy = policy
+            return
+        self.engine = QoSEngine(self._source, self._apply, policy)
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run,
+            args=(self.engine, self._stopping),
+            name="qos",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def stop(self, wait: bool = False) -> None:
+        """
+        Stop the worker, it gives the service full priority back on its way
+        out. wait for it when quitting, so that happens before the exit.
+        """
+        if self._thread is None:
+            return
+        self._stopping.set()
+        if wait:
+            self._thread.join(timeout=self.interval + 10)
+        self._thread = None
+        self.engine = None
+
+    @property
+    def level(self) -> Optional[Level]:
+        engine = self.engine
+        return engine.level if engine is not None else None
+
+
+def simulate(
+    trace: List[Tuple[float, Activity]], policy: Optional[QoSPolicy] = None
+) -> List[Tuple[float, Level]]:
+    """
+    Run the policy over (time, activity) samples and return the changes of
+    the level, without touching any process.
+    """
+    now = [0.0]
+    source = FakeActivitySource()
+    changes: List[Tuple[float, Level]] = []
+    engine = QoSEngine(
+        source, lambda level: changes.append((now[0], level)), policy, lambda: now[0]
+    )
+    for at, activity in trace:
+        now[0] = at
+        source.activity = activity
+        engine.tick()
+    return changes
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    # typing with short pauses, a coffee break, a full screen video
+    trace = []
+    for t in range(0, 1800, 2):
+        if t < 600:
+            idle = t % 20
+        elif t < 1200:
+            idle = t - 600
+        else:
+            idle = t - 1200
+        trace.append((float(t), Activity(float(idle), 1400 <= t < 1500)))
+    for at, level in simulate(trace):
+        print(f"{at:6.0f}s {level.value}")
@@ -1,5 +1,6 @@
 from typing import List, Tuple, Union
 from PySide6.QtWidgets import (
+    QComboBox,
     QLabel,
     QLineEdit,
     QSizePolicy,
@@ -10,7 +11,7 @@ from PySide6.QtWidgets import (
     QFormLayout,
 )
 from PySide6.QtCore import Qt, SignalInstance
-from gpustack_helper.databinder import DataBinder
+from gpustack_helper.databinder import DataBinder, BindingPlan
 from gpustack_helper.config import HelperConfig, CleanConfig
 from abc import abstractmethod
 
@@ -55,6 +56,21 @@ def fixed_titled_port_input(title: str) -> Tuple[QLabel, QSpinBox]:
     return (label, input)
 
 
+def fixed_titled_choice(
+    title: str, choices: Tuple[Tuple[str, str], ...]
+) -> Tuple[QLabel, QComboBox]:
+    """
+    choices are (value, text) pairs, the value is what gets saved.
+    """
+    label = QLabel(title)
+    label.setSizePolicy(QSizePolicy.Policy.Preferred, QSizePolicy.Policy.Fixed)
+    input = QComboBox()
+    input.setSizePolicy(QSizePolicy.Policy.Fixed, QSizePolicy.Policy.Fixed)
+    for value, text in choices:
+        input.addItem(text, value)
+    return (label, input)
+
+
 def wrap_layout(layout: QLayout) -> QWidget:
     rtn = QWidget()
     rtn.setLayout(layout)
@@ -63,7 +79,9 @@ def wrap_layout(layout: QLayout) -> QWidget:
 
 def create_stand_box(
     title: str,
-    widgets: List[Union[QWidget, QLayout, Tuple[QLabel, Union[QLineEdit, QSpinBox]]]],
+    widgets: List[
+        Union[QWidget, QLayout, Tuple[QLabel, Union[QLineEdit, QSpinBox, QComboBox]]]
+    ],
 ) -> QGroupBox:
     group = QGroupBox(title)
     group.setSizePolicy(QSizePolicy.Policy.Preferred, QSizePolicy.Policy.Fixed)
@@ -80,7 +98,7 @@ def create_stand_box(
             isinstance(widget, tuple)
             and len(widget) == 2
             and isinstance(widget[0], QLabel)
-            and isinstance(widget[1], (QLineEdit, QSpinBox))
+            and isinstance(widget[1], (QLineEdit, QSpinBox, QComboBox))
         ):
             label, input = widget
             layout.addRow(label, input)
@@ -94,6 +112,8 @@ def create_stand_box(
 class DataBindWidget(QWidget):
     helper_binders: List[DataBinder] = None
     config_binders: List[DataBinder] = None
+    _helper_plan: BindingPlan = None
+    _config_plan: BindingPlan = None
 
     def __init__(self, onShowSignal: SignalInstance, onSaveSignal: SignalInstance):
         super().__init__()
@@ -103,11 +123,26 @@ class DataBindWidget(QWidget):
         onSaveSignal.connect(self.on_save)
         pass
 
+    @property
+    def helper_plan(self) -> BindingPlan:
+        # compiled on first use, the pages add their binders in __init__
+        if self._helper_plan is None or len(self._helper_plan) != len(
+            self.helper_binders
+        ):
+            self._helper_plan = BindingPlan(self.helper_binders)
+        return self._helper_plan
+
+    @property
+    def config_plan(self) -> BindingPlan:
+        if self._config_plan is None or len(self._config_plan) != len(
+            self.config_binders
+        ):
+            self._config_plan = BindingPlan(self.config_binders)
+        return self._config_plan
+
     def on_show(self, cfg: HelperConfig, config: CleanConfig) -> None:
-        for binder in self.config_binders:
-            binder.load_config.emit(config)
-        for binder in self.helper_binders:
-            binder.load_config.emit(cfg)
+        self.config_plan.load(config)
+        self.helper_plan.load(cfg)
 
     @abstractmethod
     def on_save(self, cfg: HelperConfig, config: CleanConfig) -> None:
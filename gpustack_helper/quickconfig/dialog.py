@@ -17,8 +17,15 @@ from gpustack_helper.config import HelperConfig, CleanConfig
 from gpustack_helper.quickconfig.common import wrap_layout, DataBindWidget
 from gpustack_helper.quickconfig.general import GeneralConfigPage
 from gpustack_helper.quickconfig.envvar import EnvironmentVariablePage
+from gpustack_helper.quickconfig.resource import ResourceConfigPage
 from gpustack_helper.status import Status
 from gpustack_helper.services.abstract_service import AbstractService as service
+from gpustack_helper.services.planner import (
+    Action,
+    active_snapshot,
+    user_snapshot,
+    plan_restart,
+)
 
 list_widget_style = """
     /* 整体列表样式 */
@@ -102,6 +109,8 @@ class QuickConfig(QDialog):
     cfg: HelperConfig = None
     signalOnShow = Signal(HelperConfig, CleanConfig, name="onShow")
     signalOnSave = Signal(HelperConfig, CleanConfig, name="onSave")
+    # after both files are written
+    saved = Signal()
     pages: Tuple[Tuple[str, DataBindWidget]] = None
     status: Status = None
 
@@ -117,6 +126,7 @@ class QuickConfig(QDialog):
         self.pages = (
             ("通用", GeneralConfigPage(cfg, self.signalOnShow, self.signalOnSave)),
             ("环境变量", EnvironmentVariablePage(self.signalOnShow, self.signalOnSave)),
+            ("资源", ResourceConfigPage(self.signalOnShow, self.signalOnSave)),
         )
         list_widget = create_list(self.stacked_widget, *self.pages)
         confirm = self.config_confirm()
@@ -175,12 +185,18 @@ class QuickConfig(QDialog):
         self.activateWindow()
 
     def save_and_start(self):
+        if self.status.status == service.State.STOPPED:
+            self.save()
+            # the checks run in the background, the start follows from there
+            self.status.start_or_stop_action()
+            return
+        before = active_snapshot(self.cfg)
         self.save()
-        self.status.status = (
-            service.State.STARTING
-            if self.status.status == service.State.STOPPED
-            else service.State.RESTARTING
-        )
+        plan = plan_restart(before, user_snapshot(self.cfg))
+        if plan.action == Action.RESTART:
+            self.status.restart_action()
+        elif plan.action == Action.SYNC:
+            self.status.status = service.State.SYNCING
 
     def save(self):
         # 处理ButtonGroup的状态，当选择不是 Server + Worker 时清空输入
@@ -188,14 +204,14 @@ class QuickConfig(QDialog):
 
         helper_data: Dict[str, any] = {}
         config_data: Dict[str, any] = {}
+        # only what the user changed, the rest of the files is left as it is
         for _, page in self.pages:
-            for binder in page.helper_binders:
-                binder.update_config(helper_data)
-            for binder in page.config_binders:
-                binder.update_config(config_data)
+            page.helper_plan.update_config(helper_data)
+            page.config_plan.update_config(config_data)
 
         self.cfg.update_with_lock(**helper_data)
         config = self.cfg.user_gpustack_config
         config.update_with_lock(**config_data)
+        self.saved.emit()
 
         super().accept()
@@ -1,61 +1,242 @@
+import os
 from PySide6.QtWidgets import (
     QVBoxLayout,
     QHBoxLayout,
-    QLineEdit,
-    QTableWidget,
-    QTableWidgetItem,
+    QTableView,
+    QAbstractItemView,
+    QApplication,
+    QFileDialog,
     QPushButton,
     QComboBox,
+    QStyledItemDelegate,
+    QWidget,
 )
-from PySide6.QtCore import Qt, SignalInstance
+from PySide6.QtGui import QKeySequence, QShortcut
+from PySide6.QtCore import (
+    Qt,
+    SignalInstance,
+    QAbstractTableModel,
+    QModelIndex,
+    QPersistentModelIndex,
+)
+from typing import Any, Dict, Iterable, List, Tuple, Union
 from gpustack_helper.config import HelperConfig
+from gpustack_helper.envfile import parse_env
 from gpustack_helper.quickconfig.common import (
     DataBindWidget,
 )
 
 table_style = """
-    QTableWidget {
+    QTableView {
         border: 1px solid #888888;
         font-size: 14px;
         gridline-color: #888888;
     }
 """
+name_suggestions = ["HF_TOKEN", "HF_ENDPOINT", "HTTP_PROXY", "HTTPS_PROXY", "NO_PROXY"]
 
+_Index = Union[QModelIndex, QPersistentModelIndex]
 
-class EnvironmentVariablePage(DataBindWidget):
-    envvar: QTableWidget = None
 
-    def add_row(self):
-        row_position = self.envvar.rowCount()
-        self.envvar.insertRow(row_position)
+def _ranges(rows: Iterable[int]) -> List[Tuple[int, int]]:
+    """
+    Group sorted row numbers into (first, last) runs.
+    """
+    ranges: List[Tuple[int, int]] = []
+    for row in rows:
+        if ranges and ranges[-1][1] == row - 1:
+            ranges[-1] = (ranges[-1][0], row)
+        else:
+            ranges.append((row, row))
+    return ranges
+
+
+class EnvironmentVariableModel(QAbstractTableModel):
+    """
+    Name and value rows of the service environment. load() applies the
+    difference to the current rows so views keep their state and only the
+    changed rows are repainted.
+    """
+
+    _rows: List[List[str]]
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows = []
+
+    def rowCount(self, parent: _Index = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent: _Index = QModelIndex()) -> int:
+        return 0 if parent.isValid() else 2
+
+    def headerData(self, section: int, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if (
+            orientation == Qt.Orientation.Horizontal
+            and role == Qt.ItemDataRole.DisplayRole
+        ):
+            return ("Name", "Value")[section]
+        return None
+
+    def data(self, index: _Index, role=Qt.ItemDataRole.DisplayRole) -> Any:
+        if not index.isValid() or role not in (
+            Qt.ItemDataRole.DisplayRole,
+            Qt.ItemDataRole.EditRole,
+        ):
+            return None
+        return self._rows[index.row()][index.column()]
+
+    def setData(self, index: _Index, value: Any, role=Qt.ItemDataRole.EditRole):
+        if not index.isValid() or role != Qt.ItemDataRole.EditRole:
+            return False
+        value = str(value).strip() if index.column() == 0 else str(value)
+        if self._rows[index.row()][index.column()] == value:
+            return False
+        self._rows[index.row()][index.column()] = value
+        self.dataChanged.emit(index, index, [role])
+        return True
+
+    def flags(self, index: _Index) -> Qt.ItemFlag:
+        if not index.isValid():
+            return Qt.ItemFlag.NoItemFlags
+        return (
+            Qt.ItemFlag.ItemIsEnabled
+            | Qt.ItemFlag.ItemIsSelectable
+            | Qt.ItemFlag.ItemIsEditable
+        )
+
+    def insertRows(self, row: int, count: int, parent: _Index = QModelIndex()):
+        self.beginInsertRows(parent, row, row + count - 1)
+        self._rows[row:row] = [["", ""] for _ in range(count)]
+        self.endInsertRows()
+        return True
+
+    def removeRows(self, row: int, count: int, parent: _Index = QModelIndex()):
+        if count <= 0 or row < 0 or row + count > len(self._rows):
+            return False
+        self.beginRemoveRows(parent, row, row + count - 1)
+        del self._rows[row : row + count]
+        self.endRemoveRows()
+        return True
+
+    def remove_rows(self, rows: Iterable[int]) -> None:
+        # bottom up, so the remaining row numbers stay valid
+        for first, last in reversed(_ranges(sorted(set(rows)))):
+            self.removeRows(first, last - first + 1)
+
+    def _set_value(self, row: int, value: str) -> None:
+        if self._rows[row][1] != value:
+            self._rows[row][1] = value
+            index = self.index(row, 1)
+            self.dataChanged.emit(index, index, [Qt.ItemDataRole.DisplayRole])
 
-        # 第一列为可编辑下拉列表
-        combo = QComboBox()
+    def _append(self, pairs: List[Tuple[str, str]]) -> None:
+        if not pairs:
+            return
+        first = len(self._rows)
+        self.beginInsertRows(QModelIndex(), first, first + len(pairs) - 1)
+        self._rows.extend([name, value] for name, value in pairs)
+        self.endInsertRows()
+
+    def load(self, value: Dict[str, str]) -> None:
+        """
+        Make the rows match value. Existing names keep their row, rows whose
+        name is gone (or repeated) are removed and new names are appended.
+        """
+        seen = set()
+        stale = []
+        for row, (name, _) in enumerate(self._rows):
+            if name in seen or name not in value:
+                stale.append(row)
+                continue
+            seen.add(name)
+            self._set_value(row, value[name])
+        self.remove_rows(stale)
+        self._append([(k, v) for k, v in value.items() if k not in seen])
+
+    def merge(self, pairs: List[Tuple[str, str]]) -> int:
+        """
+        Set the values of pasted or imported variables, adding the missing
+        ones. Returns the number of variables merged.
+        """
+        rows = {name: row for row, (name, _) in enumerate(self._rows) if name}
+        added: Dict[str, str] = {}
+        for name, value in pairs:
+            if name in rows:
+                self._set_value(rows[name], value)
+            else:
+                added[name] = value
+        self._append(list(added.items()))
+        return len(pairs)
+
+    def to_dict(self) -> Dict[str, str]:
+        return {name: value for name, value in self._rows if name and value != ""}
+
+
+class NameDelegate(QStyledItemDelegate):
+    """
+    Edit the name column with an editable combo of the common variables.
+    The combo only exists while a cell is being edited.
+    """
+
+    def createEditor(self, parent: QWidget, option, index: _Index) -> QWidget:
+        if index.column() != 0:
+            return super().createEditor(parent, option, index)
+        combo = QComboBox(parent)
         combo.setEditable(True)
-        combo.addItems(
-            ["HF_TOKEN", "HF_ENDPOINT", "HTTP_PROXY", "HTTPS_PROXY", "NO_PROXY"]
-        )  # 可根据需要自定义
-        self.envvar.setCellWidget(row_position, 0, combo)
+        combo.addItems(name_suggestions)
+        return combo
+
+    def setEditorData(self, editor: QWidget, index: _Index) -> None:
+        if isinstance(editor, QComboBox):
+            editor.setCurrentText(index.data(Qt.ItemDataRole.EditRole) or "")
+            return
+        super().setEditorData(editor, index)
 
-        # 第二列为可编辑文本
-        item = QTableWidgetItem()
-        item.setFlags(item.flags() | Qt.ItemFlag.ItemIsEditable)
-        self.envvar.setItem(row_position, 1, item)
+    def setModelData(self, editor: QWidget, model, index: _Index) -> None:
+        if isinstance(editor, QComboBox):
+            model.setData(index, editor.currentText(), Qt.ItemDataRole.EditRole)
+            return
+        super().setModelData(editor, model, index)
+
+
+class EnvironmentVariablePage(DataBindWidget):
+    envvar: QTableView = None
+    model: EnvironmentVariableModel = None
+
+    def add_row(self):
+        row = self.model.rowCount()
+        self.model.insertRows(row, 1)
+        index = self.model.index(row, 0)
+        self.envvar.setCurrentIndex(index)
+        self.envvar.edit(index)
 
     def remove_row(self):
-        current_row = self.envvar.currentRow()
-        if current_row >= 0:
-            self.envvar.removeRow(current_row)
+        rows = {index.row() for index in self.envvar.selectionModel().selectedIndexes()}
+        if not rows and self.envvar.currentIndex().isValid():
+            rows = {self.envvar.currentIndex().row()}
+        self.model.remove_rows(rows)
+
+    def paste(self):
+        self.model.merge(parse_env(QApplication.clipboard().text()))
+
+    def import_env_file(self):
+        path, _ = QFileDialog.getOpenFileName(
+            self,
+            "导入环境变量",
+            os.path.expanduser("~"),
+            "Env (*.env .env);;All (*)",
+        )
+        if not path:
+            return
+        with open(path, "r", encoding="utf-8") as f:
+            self.model.merge(parse_env(f.read()))
 
     def on_save(self, cfg, config):
-        editor = self.envvar.focusWidget()
-        if editor and isinstance(editor, QLineEdit):
-            index = self.envvar.currentIndex()
-            row, col = index.row(), index.column()
-            # 手动将 QLineEdit 的内容写回 QTableWidgetItem
-            item = self.envvar.item(row, col)
-            if item is not None:
-                item.setText(editor.text())
+        # the value of a cell still being edited isn't in the model yet
+        editor = QApplication.focusWidget()
+        if editor is not None and self.envvar.isAncestorOf(editor):
+            self.envvar.commitData(editor)
         return super().on_save(cfg, config)
 
     def __init__(self, onShowSignal: SignalInstance, onSaveSignal: SignalInstance):
@@ -63,13 +244,24 @@ class EnvironmentVariablePage(DataBindWidget):
         main_layout = QVBoxLayout()
         self.setLayout(main_layout)
 
-        table = QTableWidget()
+        self.model = EnvironmentVariableModel(self)
+        table = QTableView()
+        table.setModel(self.model)
+        table.setItemDelegateForColumn(0, NameDelegate(table))
         table.verticalHeader().setVisible(False)
-        table.setColumnCount(2)
-        table.setHorizontalHeaderLabels(["Name", "Value"])
         table.setStyleSheet(table_style)
+        table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        table.setEditTriggers(
+            QAbstractItemView.EditTrigger.DoubleClicked
+            | QAbstractItemView.EditTrigger.EditKeyPressed
+            | QAbstractItemView.EditTrigger.AnyKeyPressed
+        )
         table.horizontalHeader().setStretchLastSection(True)
         table.horizontalHeader().setMinimumSectionSize(140)
+        paste = QShortcut(QKeySequence.StandardKey.Paste, table)
+        # not while a cell editor has the focus, it pastes into the cell
+        paste.setContext(Qt.ShortcutContext.WidgetShortcut)
+        paste.activated.connect(self.paste)
 
         main_layout.addWidget(table)
         self.envvar = table
@@ -83,12 +275,17 @@ class EnvironmentVariablePage(DataBindWidget):
         remove_button.setFixedSize(30, 30)
         remove_button.clicked.connect(self.remove_row)
 
+        # 从 .env 文件导入, 也可以直接粘贴 NAME=value 格式的多行文本
+        import_button = QPushButton("导入 .env")
+        import_button.clicked.connect(self.import_env_file)
+
         button_layout = QHBoxLayout()
         button_layout.addWidget(add_button)
         button_layout.addWidget(remove_button)
         button_layout.addStretch()
+        button_layout.addWidget(import_button)
         main_layout.addLayout(button_layout)
 
         self.helper_binders.append(
-            HelperConfig.bind("EnvironmentVariables", self.envvar)
+            HelperConfig.bind("EnvironmentVariables", self.model)
         )
@@ -0,0 +1,106 @@
+import sys
+from PySide6.QtWidgets import (
+    QVBoxLayout,
+    QGroupBox,
+    QLabel,
+    QSpinBox,
+    QComboBox,
+    QCheckBox,
+    QWidget,
+)
+from PySide6.QtCore import Qt, SignalInstance
+from typing import List, Tuple, Union
+from gpustack_helper.config import HelperConfig, CleanConfig, process_types
+from gpustack_helper.quickconfig.common import (
+    fixed_titled_input,
+    fixed_titled_port_input,
+    fixed_titled_choice,
+    create_stand_box,
+    DataBindWidget,
+)
+
+priority_choices = (
+    ("", "默认"),
+    ("IDLE_PRIORITY_CLASS", "低"),
+    ("BELOW_NORMAL_PRIORITY_CLASS", "低于正常"),
+    ("ABOVE_NORMAL_PRIORITY_CLASS", "高于正常"),
+    ("HIGH_PRIORITY_CLASS", "高"),
+    ("REALTIME_PRIORITY_CLASS", "实时"),
+)
+max_open_files = 1024 * 1024
+
+
+def _titled_count(title: str, minimum: int, maximum: int) -> Tuple[QLabel, QSpinBox]:
+    label, input = fixed_titled_port_input(title)
+    input.setRange(minimum, maximum)
+    return (label, input)
+
+
+class ResourceConfigPage(DataBindWidget):
+    """
+    Scheduling and resource limits of the service, launchd keys on macOS and
+    nssm parameters on Windows. 0 or empty keeps the system default.
+    """
+
+    def _create_launchd_groups(self) -> List[QGroupBox]:
+        process_type = fixed_titled_choice(
+            "调度类型:", (("", "默认"),) + tuple((t, t) for t in process_types)
+        )
+        nice = _titled_count("Nice:", -20, 20)
+        low_priority_io = QCheckBox("低优先级磁盘 IO")
+        rows: List[Union[QWidget, Tuple[QLabel, Union[QComboBox, QSpinBox]]]] = [
+            process_type,
+            nice,
+            low_priority_io,
+        ]
+        for key, widget in (
+            ("ProcessType", process_type[1]),
+            ("Nice", nice[1]),
+            ("LowPriorityIO", low_priority_io),
+        ):
+            self.helper_binders.append(
+                HelperConfig.bind(key, widget, ignore_zero_value=True)
+            )
+
+        limits: List[Tuple[QLabel, QSpinBox]] = []
+        for key, title in (
+            ("SoftResourceLimits.NumberOfFiles", "软限制:"),
+            ("HardResourceLimits.NumberOfFiles", "硬限制:"),
+        ):
+            label, input = _titled_count(title, 0, max_open_files)
+            self.helper_binders.append(
+                HelperConfig.bind(key, input, ignore_zero_value=True)
+            )
+            limits.append((label, input))
+        return [
+            create_stand_box("进程调度", rows),
+            create_stand_box("最大打开文件数", limits),
+        ]
+
+    def _create_nssm_groups(self) -> List[QGroupBox]:
+        priority = fixed_titled_choice("进程优先级:", priority_choices)
+        affinity = fixed_titled_input("CPU 亲和性:")
+        affinity[1].setPlaceholderText("如 0-3,6, 为空时使用全部 CPU")
+        self.helper_binders.append(
+            HelperConfig.bind("AppPriority", priority[1], ignore_zero_value=True)
+        )
+        self.helper_binders.append(
+            HelperConfig.bind("AppAffinity", affinity[1], ignore_zero_value=True)
+        )
+        return [create_stand_box("进程调度", [priority, affinity])]
+
+    def on_save(self, cfg: HelperConfig, config: CleanConfig) -> None:
+        pass
+
+    def __init__(self, onShowSignal: SignalInstance, onSaveSignal: SignalInstance):
+        super().__init__(onShowSignal, onSaveSignal)
+        layout = QVBoxLayout()
+        layout.setAlignment(Qt.AlignmentFlag.AlignTop)
+        groups = (
+            self._create_launchd_groups()
+            if sys.platform == "darwin"
+            else self._create_nssm_groups()
+        )
+        for group in groups:
+            layout.addWidget(group)
+        self.setLayout(layout)
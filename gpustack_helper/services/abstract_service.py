@@ -16,6 +16,7 @@ class AbstractService(ABC):
         STOPPED = ("stopped", "停止")
         STOPPING = ("stopping", "停止中")
         RESTARTING = ("restarting", "重新启动中")
+        SYNCING = ("syncing", "同步中")
         STARTING = ("starting", "启动中")
         TO_SYNC = ("to_sync", "需要同步")
         UNKNOWN = ("unknown", "未知")
@@ -53,6 +54,13 @@ class AbstractService(ABC):
         Restart the service. Override this method in subclasses to provide specific restart logic.
         """
 
+    @classmethod
+    @abstractmethod
+    def sync(cls, cfg: HelperConfig) -> Union[QProcess, QThread]:
+        """
+        Apply the service definition (launchd plist / registry) without restarting the running process. Override this method in subclasses to provide specific sync logic.
+        """
+
     @classmethod
     @abstractmethod
     def get_current_state(cls, cfg: HelperConfig) -> State:
@@ -1,17 +1,26 @@
 import subprocess
 import logging
+import plistlib
 import re
 import os
-from os.path import exists, abspath, dirname, islink
-from typing import Dict, Any, List, Tuple
+import sys
+from os.path import exists, abspath, dirname, islink, join
+from typing import Dict, Any, List, Optional, Tuple
 from PySide6.QtCore import QProcess
 from gpustack_helper.config import HelperConfig
+from gpustack_helper.defaults import base_path
+from gpustack_helper.qos import qos_level_path
+from gpustack_helper.migration import needs_data_migration, import_legacy_env
+from gpustack_helper.updates import installed_app_dir, staged_version
 from gpustack_helper.services.abstract_service import AbstractService
 
 logger = logging.getLogger(__name__)
 
 service_id = "system/ai.gpustack"
 plist_path = "/Library/LaunchDaemons/ai.gpustack.plist"
+rotation_label = "ai.gpustack.logrotate"
+rotation_interval = 300
+qos_label = "ai.gpustack.qos"
 
 
 def parse_service_status() -> Dict[str, Any]:
@@ -46,7 +55,160 @@ def parse_service_status() -> Dict[str, Any]:
     return data
 
 
-def get_start_script(cfg: HelperConfig, restart: bool = False) -> str:
+def _helper_program() -> List[str]:
+    return (
+        [sys.executable]
+        if getattr(sys, "frozen", False)
+        else [sys.executable, "-m", "gpustack_helper.main"]
+    )
+
+
+def _helper_command(cfg: HelperConfig, args: List[str]) -> str:
+    return " ".join(
+        "'" + arg.replace("'", "'\\''") + "'"
+        for arg in _helper_program() + [f"--config={abspath(cfg.filepath)}"] + args
+    )
+
+
+def get_helper_script(cfg: HelperConfig, args: List[str], prompt: str) -> str:
+    """
+    AppleScript running the helper with args as root, for the operations on
+    the root owned data dir, e.g. the snapshots.
+    """
+    command = _helper_command(cfg, args).replace("\\", "\\\\").replace('"', '\\"')
+    logger.debug(f"准备以admin权限运行该shell脚本 :\n{command}")
+    return f"""do shell script "{command}" with prompt "{prompt}" with administrator privileges"""
+
+
+def _read_bytes(path: str) -> Optional[bytes]:
+    if not exists(path):
+        return None
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _write_job_source(path: str, content: bytes) -> None:
+    # replaced rather than rewritten, an older helper may have left a root
+    # owned copy in the user's config dir
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(content)
+    os.replace(tmp, path)
+
+
+def _job_script(
+    cfg: HelperConfig,
+    label: str,
+    definition: Optional[Dict[str, Any]],
+    write: bool = False,
+) -> Optional[str]:
+    """
+    Install a root launchd job running the helper, the same way as the
+    service itself: the plist is kept next to the helper config and copied
+    to the active data dir. Without a definition the job is booted out and
+    removed. Returns None if there's nothing to do. The check only reads,
+    the plist next to the helper config is written with write, when the
+    script is about to run.
+    """
+    job_plist_path = f"/Library/LaunchDaemons/{label}.plist"
+    src = join(dirname(abspath(cfg.filepath)), f"{label}.plist")
+    dst = join(abspath(cfg.active_data_dir), f"{label}.plist")
+    if definition is None:
+        if not exists(job_plist_path) and not islink(job_plist_path):
+            return None
+        return ";".join(
+            [
+                f"launchctl bootout system/{label} 2>/dev/null",
+                f"rm -f '{job_plist_path}' '{dst}'",
+            ]
+        )
+    content = plistlib.dumps(definition)
+    if (
+        _read_bytes(dst) == content
+        and islink(job_plist_path)
+        and os.readlink(job_plist_path) == dst
+    ):
+        return None
+    if write and _read_bytes(src) != content:
+        _write_job_source(src, content)
+    return ";".join(
+        [
+            f"mkdir -p '{dirname(dst)}'",
+            f"cp -f '{src}' '{dst}'; chmod 0644 '{dst}'; chown root:wheel '{dst}'",
+            f"rm -f '{job_plist_path}'; ln -sf '{dst}' '{job_plist_path}'",
+            f"launchctl bootout system/{label} 2>/dev/null",
+            f"launchctl bootstrap system {job_plist_path}",
+        ]
+    )
+
+
+def get_rotation_script(cfg: HelperConfig, write: bool = False) -> Optional[str]:
+    """
+    launchd keeps the log opened for the service, so it can't be rotated by
+    renaming. A root job runs the helper periodically to copy and truncate
+    the log in place, see gpustack_helper.logs.rotate. The job is removed
+    when neither a size nor an age limit is set.
+    """
+    settings = cfg.helper_settings
+    if not settings.log_rotate_bytes and not settings.log_rotate_seconds:
+        return _job_script(cfg, rotation_label, None)
+    definition = {
+        "Label": rotation_label,
+        "ProgramArguments": _helper_program()
+        + [f"--config={abspath(cfg.filepath)}", "--rotate-logs"],
+        "StartInterval": rotation_interval,
+        "WorkingDirectory": base_path,
+    }
+    return _job_script(cfg, rotation_label, definition, write)
+
+
+def get_qos_script(cfg: HelperConfig, write: bool = False) -> Optional[str]:
+    """
+    The helper can't renice the root owned service. It records the wanted
+    level in a file which a root job watches and applies, see
+    gpustack_helper.qos. The job is only installed while the setting is on.
+    """
+    if not cfg.helper_settings.qos_enabled:
+        return _job_script(cfg, qos_label, None)
+    definition = {
+        "Label": qos_label,
+        "ProgramArguments": _helper_program()
+        + [f"--config={abspath(cfg.filepath)}", "--apply-qos"],
+        "WatchPaths": [abspath(qos_level_path(cfg))],
+        "WorkingDirectory": base_path,
+    }
+    return _job_script(cfg, qos_label, definition, write)
+
+
+def jobs_changed(cfg: HelperConfig) -> bool:
+    """
+    Whether a helper job has to be installed or removed to follow the
+    helper settings, without writing anything.
+    """
+    return get_rotation_script(cfg) is not None or get_qos_script(cfg) is not None
+
+
+def definition_changed(cfg: HelperConfig) -> bool:
+    """
+    Whether the saved plist differs from the copy launchd has loaded, e.g.
+    after the scheduling class or the open file limit was changed.
+    """
+    try:
+        with open(cfg.filepath, "rb") as f:
+            saved = plistlib.load(f)
+        with open(cfg.active_config_path, "rb") as f:
+            active = plistlib.load(f)
+    except FileNotFoundError:
+        return False
+    except Exception as e:
+        logger.debug(f"Failed to compare the service definitions: {e}")
+        return False
+    return saved != active
+
+
+def get_start_script(
+    cfg: HelperConfig, restart: bool = False, sync_only: bool = False
+) -> str:
     gpustack_config = cfg.user_gpustack_config
     target_path = abspath(cfg.active_config_path)
     if not exists(cfg.filepath):
@@ -90,6 +252,34 @@ def get_start_script(cfg: HelperConfig, restart: bool = False) -> str:
         or copy_script is not None
         else None
     )
+    rotation_script = get_rotation_script(cfg, write=True)
+    qos_script = get_qos_script(cfg, write=True)
+    if sync_only:
+        # launchd reads the definition through the symlink on next load, the
+        # running process is left alone.
+        joined_script = (
+            ";".join(
+                filter(None, [copy_script, link_script, rotation_script, qos_script])
+            )
+            or ":"
+        )
+        logger.debug(f"准备以admin权限运行该shell脚本 :\n{joined_script}")
+        return f"""do shell script "{joined_script}" with prompt "GPUStack 需要同步后台服务配置" with administrator privileges"""
+    # moved by root before the service first starts on the new data dir, a
+    # failed migration aborts the start instead of starting on an empty one
+    migrate_command = (
+        f"{_helper_command(cfg, ['--migrate-data'])} || exit 1"
+        if not restart and needs_data_migration(cfg)
+        else None
+    )
+    # the staged update is verified and swapped in by root once the service
+    # is stopped, see gpustack_helper.updates.apply_staged_update
+    app_dir = installed_app_dir()
+    update_command = (
+        _helper_command(cfg, ["--apply-update"])
+        if app_dir is not None and staged_version(app_dir) is not None
+        else None
+    )
     stop_command = f"launchctl bootout {service_id}" if restart else None
     wait_for_stopped = (
         f"while true; do launchctl print {service_id} >/dev/null 2>&1; [ $? -eq 113 ] && break; sleep 0.5; done"
@@ -104,8 +294,12 @@ def get_start_script(cfg: HelperConfig, restart: bool = False) -> str:
             [
                 copy_script,
                 link_script,
+                rotation_script,
+                qos_script,
+                migrate_command,
                 stop_command,
                 wait_for_stopped,
+                update_command,
                 register_command,
                 start_command,
             ],
@@ -115,7 +309,9 @@ def get_start_script(cfg: HelperConfig, restart: bool = False) -> str:
     return f"""do shell script "{joined_script}" with prompt "GPUStack 需要启动后台服务" with administrator privileges"""
 
 
-def launch_service(cfg: HelperConfig, restart: bool = False) -> QProcess:
+def launch_service(
+    cfg: HelperConfig, restart: bool = False, sync_only: bool = False
+) -> QProcess:
     """
     prompt sudo privileges to run following command
     1. remove /Library/LaunchDaemons/ai.gpustack.plist if not a symlink or not targetting the right path
@@ -123,7 +319,7 @@ def launch_service(cfg: HelperConfig, restart: bool = False) -> QProcess:
     3. launch service with launchctl bootstrap system /Library/LaunchDaemons/ai.gpustack.plist
     the commands will be put into an AppleScript to run with administrator privileges
     """
-    applescript = get_start_script(cfg, restart=restart)
+    applescript = get_start_script(cfg, restart=restart, sync_only=sync_only)
     qprocess_launch = QProcess()
     qprocess_launch.setProgram("osascript")
     qprocess_launch.setArguments(["-e", applescript])
@@ -156,6 +352,10 @@ class DarwinService(AbstractService):
     def restart(self, cfg: HelperConfig) -> QProcess:
         return launch_service(cfg, restart=True)
 
+    @classmethod
+    def sync(self, cfg: HelperConfig) -> QProcess:
+        return launch_service(cfg, sync_only=True)
+
     @classmethod
     def get_current_state(self, cfg: HelperConfig) -> AbstractService.State:
         output = parse_service_status()
@@ -165,8 +365,11 @@ class DarwinService(AbstractService):
             common: Dict[str, any] = output.get(service_id, {})
             is_running = common.get("state", "") == "running"
             current_plist_path = common.get("path", "")
-        is_sync = current_plist_path is not None and current_plist_path == abspath(
-            cfg.active_config_path
+        is_sync = (
+            current_plist_path is not None
+            and current_plist_path == abspath(cfg.active_config_path)
+            and not definition_changed(cfg)
+            and not jobs_changed(cfg)
         )
 
         if not is_running:
@@ -178,5 +381,6 @@ class DarwinService(AbstractService):
 
     @classmethod
     def migrate(self, cfg: HelperConfig) -> None:
-        # TODO
-        pass
+        # the env file is readable by the user, the data dir is moved by
+        # root in the start script, see get_start_script
+        import_legacy_env(cfg)
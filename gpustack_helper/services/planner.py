@@ -0,0 +1,109 @@
+import logging
+import os
+import plistlib
+import yaml
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Any, Dict, List, Optional
+
+from gpustack_helper.config import HelperConfig
+
+logger = logging.getLogger(__name__)
+
+# helper config keys which only live in the service definition (launchd plist
+# or the registry "Start" value) and are picked up without bouncing the process
+service_definition_keys = ("RunAtLoad",)
+
+
+class Action(IntEnum):
+    # ordered by cost, the plan takes the most expensive action of all changes
+    NOOP = 0
+    SYNC = 1
+    RESTART = 2
+
+
+@dataclass
+class ConfigSnapshot:
+    helper: Optional[Dict[str, Any]] = None
+    config: Optional[Dict[str, Any]] = None
+
+
+@dataclass
+class RestartPlan:
+    action: Action = Action.NOOP
+    changes: Dict[Action, List[str]] = field(default_factory=dict)
+
+    def add(self, action: Action, key: str) -> None:
+        self.changes.setdefault(action, []).append(key)
+        if action > self.action:
+            self.action = action
+
+
+def _load(path: str, plist: bool) -> Optional[Dict[str, Any]]:
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "rb") as f:
+            data = plistlib.load(f) if plist else yaml.safe_load(f)
+    except Exception as e:
+        logger.warning(f"Failed to load {path} for restart planning: {e}")
+        return None
+    return _normalize(data or {})
+
+
+def _normalize(data: Dict[str, Any]) -> Dict[str, Any]:
+    # None and missing keys mean the same to both launchd and gpustack
+    return {k: v for k, v in data.items() if v is not None}
+
+
+def active_snapshot(cfg: HelperConfig) -> ConfigSnapshot:
+    """
+    The configs the running service has been started with.
+    """
+    return ConfigSnapshot(
+        helper=_load(cfg.active_config_path, plist=True),
+        config=_load(cfg.user_gpustack_config.active_config_path, plist=False),
+    )
+
+
+def user_snapshot(cfg: HelperConfig) -> ConfigSnapshot:
+    """
+    The configs saved by the user which are going to be applied.
+    """
+    return ConfigSnapshot(
+        helper=_load(cfg.filepath, plist=True),
+        config=_load(cfg.user_gpustack_config.filepath, plist=False),
+    )
+
+
+def plan_restart(old: ConfigSnapshot, new: ConfigSnapshot) -> RestartPlan:
+    """
+    Diff the applied and the desired configs and classify every changed key.
+    Anything unknown, including a missing active copy, requires a restart.
+    """
+    plan = RestartPlan()
+    if old.helper is None or old.config is None:
+        plan.add(Action.RESTART, "<active config missing>")
+        return plan
+    new_helper = new.helper or {}
+    new_config = new.config or {}
+
+    for key in sorted(set(old.helper) | set(new_helper)):
+        if old.helper.get(key) == new_helper.get(key):
+            continue
+        if key in service_definition_keys:
+            plan.add(Action.SYNC, key)
+        else:
+            plan.add(Action.RESTART, key)
+
+    for key in sorted(set(old.config) | set(new_config)):
+        if old.config.get(key) != new_config.get(key):
+            plan.add(Action.RESTART, f"config.{key}")
+
+    logger.info(
+        f"Restart plan: {plan.action.name}, changes: "
+        + ", ".join(
+            f"{action.name}={keys}" for action, keys in sorted(plan.changes.items())
+        )
+    )
+    return plan
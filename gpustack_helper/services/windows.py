@@ -3,6 +3,7 @@ import os
 import logging
 import winreg
 import win32service
+import win32process
 import shutil
 from typing import Dict, Tuple, Callable, Any, List
 from PySide6.QtCore import QThread
@@ -10,12 +11,27 @@ from PySide6.QtCore import QThread
 from gpustack_helper.defaults import nssm_binary_path
 from gpustack_helper.services.abstract_service import AbstractService
 from gpustack_helper.config import HelperConfig
+from gpustack_helper.migration import (
+    import_legacy_env,
+    migrate_data,
+    needs_data_migration,
+)
 
 logger = logging.getLogger(__name__)
 
 service_name = "gpustack"
 default_registry_path = r"SYSTEM\CurrentControlSet\Services\GPUStack"
 
+# nssm stores AppPriority as the priority class constant, normal is the
+# absence of the value
+priority_class_values: Dict[str, int] = {
+    "IDLE_PRIORITY_CLASS": win32process.IDLE_PRIORITY_CLASS,
+    "BELOW_NORMAL_PRIORITY_CLASS": win32process.BELOW_NORMAL_PRIORITY_CLASS,
+    "ABOVE_NORMAL_PRIORITY_CLASS": win32process.ABOVE_NORMAL_PRIORITY_CLASS,
+    "HIGH_PRIORITY_CLASS": win32process.HIGH_PRIORITY_CLASS,
+    "REALTIME_PRIORITY_CLASS": win32process.REALTIME_PRIORITY_CLASS,
+}
+
 config_key_mapping: Dict[str, Tuple[Tuple[str, int, Callable], ...]] = {
     "ProgramArguments": (
         (
@@ -54,6 +70,21 @@ config_key_mapping: Dict[str, Tuple[Tuple[str, int, Callable], ...]] = {
         ),
     ),
     "AppDirectory": ((r"Parameters\AppDirectory", winreg.REG_EXPAND_SZ, lambda x: x),),
+    "AppPriority": (
+        (
+            r"Parameters\AppPriority",
+            winreg.REG_DWORD,
+            lambda x: priority_class_values.get(x),
+        ),
+    ),
+    "AppAffinity": (
+        (
+            r"Parameters\AppAffinity",
+            winreg.REG_SZ,
+            # nssm removes the value for all processors as well
+            lambda x: x if x and x.lower() != "all" else None,
+        ),
+    ),
 }
 windows_service_default_params: Tuple[Tuple[str, int, Any], ...] = (
     ("DisplayName", winreg.REG_SZ, "GPUStack"),
@@ -72,6 +103,29 @@ windows_service_default_params: Tuple[Tuple[str, int, Any], ...] = (
 )
 
 
+def rotation_registry(cfg: HelperConfig) -> List[Tuple[str, int, Any]]:
+    """
+    nssm rotates AppStdout/AppStderr itself, the helper only compresses and
+    prunes the rotated files. See gpustack_helper.logs.rotate.
+    """
+    settings = cfg.helper_settings
+    enabled = int(settings.log_rotate_bytes > 0 or settings.log_rotate_seconds > 0)
+    return [
+        (r"Parameters\AppRotateFiles", winreg.REG_DWORD, enabled),
+        (r"Parameters\AppRotateOnline", winreg.REG_DWORD, enabled),
+        (
+            r"Parameters\AppRotateBytes",
+            winreg.REG_DWORD,
+            min(max(settings.log_rotate_bytes, 0), 0xFFFFFFFF),
+        ),
+        (
+            r"Parameters\AppRotateSeconds",
+            winreg.REG_DWORD,
+            max(settings.log_rotate_seconds, 0),
+        ),
+    ]
+
+
 def parse_registry(cfg: HelperConfig) -> List[Tuple[str, int, Any]]:
     service_data: List[Tuple[str, int, Any]] = list(windows_service_default_params)
     data = cfg.model_dump()
@@ -88,6 +142,7 @@ def parse_registry(cfg: HelperConfig) -> List[Tuple[str, int, Any]]:
             continue
         for sub_key, reg_type, func in function_map:
             service_data.append((sub_key, reg_type, func(value)))
+    service_data.extend(rotation_registry(cfg))
 
     return service_data
 
@@ -220,9 +275,36 @@ class ThreadWrapper(QThread):
         return self.target(self.cfg)
 
 
+def _copy_to_active(src: str, dst: str) -> None:
+    """
+    Copy the user config to the active path if the content differs.
+    """
+    if src == dst or not os.path.exists(src):
+        return
+    with open(src, "rb") as f:
+        new_content = f.read()
+    if os.path.exists(dst):
+        with open(dst, "rb") as f:
+            if f.read() == new_content:
+                return
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    shutil.copy(src, dst)
+
+
+def _sync_windows_service(cfg: HelperConfig) -> None:
+    try:
+        set_in_registry(diff_registry(parse_registry(cfg)))
+        _copy_to_active(cfg.filepath, cfg.active_config_path)
+        logger.info(f"Service {service_name} definition synced.")
+    except Exception as e:
+        logger.error(f"Failed to sync service: {e}")
+
+
 def _start_windows_service(cfg: HelperConfig) -> None:
     registry_data = parse_registry(cfg)
     try:
+        if needs_data_migration(cfg):
+            migrate_data(cfg)
         diff_registry_data = diff_registry(registry_data)
         gpustack_config = cfg.user_gpustack_config
         if not os.path.exists(cfg.filepath):
@@ -233,20 +315,8 @@ def _start_windows_service(cfg: HelperConfig) -> None:
         # set helper config to registry
         set_in_registry(diff_registry_data)
         # copy
-        config_sync = gpustack_config.filepath == gpustack_config.active_config_path
-        if not config_sync:
-            if os.path.exists(gpustack_config.active_config_path):
-                with open(gpustack_config.active_config_path, "rb") as f:
-                    active_content = f.read()
-                with open(gpustack_config.filepath, "rb") as f:
-                    new_content = f.read()
-                config_sync = active_content == new_content
-
-        if not config_sync:
-            os.makedirs(
-                os.path.dirname(gpustack_config.active_config_path), exist_ok=True
-            )
-            shutil.copy(gpustack_config.filepath, gpustack_config.active_config_path)
+        _copy_to_active(gpustack_config.filepath, gpustack_config.active_config_path)
+        _copy_to_active(cfg.filepath, cfg.active_config_path)
 
         scm = win32service.OpenSCManager(None, None, win32service.SC_MANAGER_ALL_ACCESS)
         service_handle = None
@@ -321,6 +391,10 @@ class WindowsService(AbstractService):
     def restart(self, cfg: HelperConfig) -> QThread:
         return ThreadWrapper(cfg, _restart_windows_service)
 
+    @classmethod
+    def sync(self, cfg: HelperConfig) -> QThread:
+        return ThreadWrapper(cfg, _sync_windows_service)
+
     @classmethod
     def get_current_state(self, cfg: HelperConfig) -> AbstractService.State:
         # 调用 nssm status gpustack 获取服务状态
@@ -351,5 +425,5 @@ class WindowsService(AbstractService):
 
     @classmethod
     def migrate(self, cfg: HelperConfig) -> None:
-        # TODO
-        pass
+        # the data dir is moved in the start thread, see _start_windows_service
+        import_legacy_env(cfg)
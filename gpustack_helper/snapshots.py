@@ -0,0 +1,508 @@
+import errno
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import stat
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from gpustack_helper.artifacts import clone_or_copy
+from gpustack_helper.migration import _chown_like
+
+logger = logging.getLogger(__name__)
+
+snapshot_suffix = ".snapshots"
+partial_suffix = ".partial"
+restoring_suffix = ".restoring"
+manifest_name = "snapshot.json"
+data_subdir = "data"
+config_subdir = "config"
+# left out of snapshots and carried over as is by a restore
+excluded_entries = ("log",)
+# the model caches only add and remove files, a downloaded file is never
+# written in place, so they can be hardlinked if they can't be cloned
+immutable_dirs = ("cache",)
+# downloads in progress
+skipped_suffixes = (".incomplete", ".tmp", ".migrating")
+database_suffixes = (".db", ".sqlite")
+# part of the database, included by the backup
+database_sidecars = ("-wal", "-shm", "-journal")
+sqlite_magic = b"SQLite format 3\x00"
+label_max_length = 64
+
+
+@dataclass
+class SnapshotReport:
+    files: int = 0
+    cloned: int = 0
+    linked: int = 0
+    copied: int = 0
+    databases: int = 0
+    skipped: int = 0
+    bytes: int = 0
+    copied_bytes: int = 0
+    seconds: float = 0.0
+
+    def summary(self) -> str:
+        return (
+            f"{self.files} files, {self.bytes / 2**20:.1f} MiB in "
+            f"{self.seconds:.1f}s: {self.cloned} cloned, {self.linked} linked, "
+            f"{self.copied} copied, {self.databases} databases "
+            f"({self.copied_bytes / 2**20:.1f} MiB written), {self.skipped} skipped"
+        )
+
+
+@dataclass
+class SnapshotPolicy:
+    # 0 disables the limit
+    keep: int = 5
+    max_age_days: int = 0
+
+    @classmethod
+    def from_settings(cls, settings) -> "SnapshotPolicy":
+        return cls(
+            keep=settings.snapshot_keep, max_age_days=settings.snapshot_max_age_days
+        )
+
+
+@dataclass
+class Snapshot:
+    id: str
+    path: str
+    created: float
+    label: str = ""
+    # manual, or before-restore for the data replaced by a restore
+    reason: str = "manual"
+    configs: Dict[str, str] = field(default_factory=dict)
+    report: Optional[Dict[str, Any]] = None
+
+    @property
+    def data_path(self) -> str:
+        return os.path.join(self.path, data_subdir)
+
+    def config_path(self, key: str) -> str:
+        return os.path.join(self.path, config_subdir, key)
+
+    def title(self) -> str:
+        created = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.created))
+        return f"{created} {self.label}".strip()
+
+    @classmethod
+    def load(cls, path: str) -> "Snapshot":
+        with open(os.path.join(path, manifest_name), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        return cls(
+            id=manifest["id"],
+            path=path,
+            created=manifest["created"],
+            label=manifest.get("label", ""),
+            reason=manifest.get("reason", "manual"),
+            configs=manifest.get("configs", {}),
+            report=manifest.get("report"),
+        )
+
+    def save(self) -> None:
+        manifest = {"version": 1, **asdict(self)}
+        manifest.pop("path")
+        with open(os.path.join(self.path, manifest_name), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+
+
+def default_snapshot_root(data_dir: str) -> str:
+    # next to the data dir, on the same filesystem for clones and hardlinks
+    return os.path.abspath(data_dir).rstrip(os.sep) + snapshot_suffix
+
+
+def _is_database(path: str, name: str) -> bool:
+    if not name.endswith(database_suffixes):
+        return False
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(sqlite_magic)) == sqlite_magic
+    except OSError:
+        return False
+
+
+def _is_database_sidecar(root: str, name: str) -> bool:
+    for sidecar in database_sidecars:
+        if name.endswith(sidecar) and _is_database(
+            os.path.join(root, name[: -len(sidecar)]), name[: -len(sidecar)]
+        ):
+            return True
+    return False
+
+
+def _backup_database(src: str, dst: str) -> None:
+    """
+    Copy a sqlite database through its backup API, the copy is consistent
+    even while the service writes to it.
+    """
+    source = sqlite3.connect(src)
+    try:
+        target = sqlite3.connect(dst)
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+    finally:
+        source.close()
+    shutil.copymode(src, dst)
+
+
+class _Cloner:
+    """
+    Place the files of a data dir in another dir as cheaply as possible:
+    cloned copy-on-write where the filesystem supports it (APFS, btrfs,
+    xfs), hardlinked if the file is immutable, copied otherwise. Databases
+    are always copied through the sqlite backup.
+    """
+
+    src: str
+    dst: str
+    report: SnapshotReport
+    progress: Optional[Callable[[SnapshotReport], None]]
+
+    def __init__(self, src, dst, report, progress=None):
+        self.src = src
+        self.dst = dst
+        self.report = report
+        self.progress = progress
+
+    def run(self) -> None:
+        for root, dirs, files in os.walk(self.src):
+            rel_root = os.path.relpath(root, self.src)
+            if rel_root == os.curdir:
+                dirs[:] = [d for d in dirs if d not in excluded_entries]
+                files = [f for f in files if f not in excluded_entries]
+            target_root = os.path.normpath(os.path.join(self.dst, rel_root))
+            os.makedirs(target_root, exist_ok=True)
+            shutil.copymode(root, target_root)
+            # symlinked dirs are listed as dirs but not descended into
+            for name in [d for d in dirs if os.path.islink(os.path.join(root, d))]:
+                dirs.remove(name)
+                files.append(name)
+            immutable = rel_root.split(os.sep)[0] in immutable_dirs
+            for name in files:
+                self.file(root, name, target_root, immutable)
+            if self.progress is not None:
+                self.progress(self.report)
+
+    def file(self, root: str, name: str, target_root: str, immutable: bool) -> None:
+        src = os.path.join(root, name)
+        dst = os.path.join(target_root, name)
+        st = os.lstat(src)
+        report = self.report
+        report.files += 1
+        if stat.S_ISLNK(st.st_mode):
+            os.symlink(os.readlink(src), dst)
+            _chown_like(st, dst)
+            return
+        if (
+            not stat.S_ISREG(st.st_mode)
+            or name.endswith(skipped_suffixes)
+            or _is_database_sidecar(root, name)
+        ):
+            report.skipped += 1
+            return
+        report.bytes += st.st_size
+        if _is_database(src, name):
+            _backup_database(src, dst)
+            report.databases += 1
+            report.copied_bytes += os.path.getsize(dst)
+        else:
+            method = clone_or_copy(src, dst, hardlink=immutable)
+            if method == "hardlink":
+                report.linked += 1
+                return
+            if method == "reflink":
+                report.cloned += 1
+            else:
+                report.copied += 1
+                report.copied_bytes += st.st_size
+        _chown_like(st, dst)
+
+
+class SnapshotStore:
+    """
+    Snapshots of the data dir and the user configs synced to the service.
+    Each snapshot is a dir named by its id with the data tree, the configs
+    and a manifest. It's written under a partial name and renamed when
+    complete, so a listed snapshot is always whole.
+    """
+
+    root: str
+    data_dir: str
+    # key to the path of the user config
+    configs: Dict[str, str]
+    policy: SnapshotPolicy
+
+    def __init__(
+        self,
+        root: str,
+        data_dir: str,
+        configs: Optional[Dict[str, str]] = None,
+        policy: Optional[SnapshotPolicy] = None,
+    ):
+        self.root = os.path.abspath(root)
+        self.data_dir = os.path.abspath(data_dir)
+        self.configs = configs or {}
+        self.policy = policy or SnapshotPolicy()
+
+    @classmethod
+    def from_config(cls, cfg) -> "SnapshotStore":
+        settings = cfg.helper_settings
+        return cls(
+            settings.snapshot_dir or default_snapshot_root(cfg.active_data_dir),
+            cfg.active_data_dir,
+            {
+                "helper": cfg.filepath,
+                "gpustack": cfg.user_gpustack_config.filepath,
+            },
+            SnapshotPolicy.from_settings(settings),
+        )
+
+    def list(self) -> List[Snapshot]:
+        """
+        The complete snapshots, newest first.
+        """
+        if not os.path.isdir(self.root):
+            return []
+        snapshots = []
+        for entry in os.scandir(self.root):
+            if entry.name.startswith(".") or not entry.is_dir():
+                continue
+            try:
+                snapshots.append(Snapshot.load(entry.path))
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"Ignored the broken snapshot {entry.path}: {e}")
+        return sorted(snapshots, key=lambda s: (s.created, s.id), reverse=True)
+
+    def get(self, id: str) -> Snapshot:
+        path = os.path.join(self.root, os.path.basename(id))
+        if not os.path.isfile(os.path.join(path, manifest_name)):
+            raise FileNotFoundError(f"Snapshot {id} doesn't exist in {self.root}")
+        return Snapshot.load(path)
+
+    def _new_snapshot(self, label: str, reason: str) -> Snapshot:
+        os.makedirs(self.root, exist_ok=True)
+        created = time.time()
+        base = time.strftime("%Y%m%d-%H%M%S", time.localtime(created))
+        id, n = base, 1
+        while os.path.exists(os.path.join(self.root, id)):
+            n += 1
+            id = f"{base}-{n}"
+        label = " ".join(label.split())[:label_max_length]
+        staging = os.path.join(self.root, f".{id}{partial_suffix}")
+        if os.path.exists(staging):
+            shutil.rmtree(staging)
+        os.makedirs(os.path.join(staging, config_subdir))
+        return Snapshot(
+            id=id, path=staging, created=created, label=label, reason=reason
+        )
+
+    def _commit(self, snapshot: Snapshot) -> Snapshot:
+        for key, path in self.configs.items():
+            if os.path.isfile(path):
+                dst = snapshot.config_path(key)
+                shutil.copy2(path, dst)
+                _chown_like(os.stat(path), dst)
+                snapshot.configs[key] = path
+        snapshot.save()
+        final = os.path.join(self.root, snapshot.id)
+        os.rename(snapshot.path, final)
+        snapshot.path = final
+        return snapshot
+
+    def create(
+        self,
+        label: str = "",
+        reason: str = "manual",
+        progress: Optional[Callable[[SnapshotReport], None]] = None,
+        protect=(),
+    ) -> Snapshot:
+        started = time.perf_counter()
+        snapshot = self._new_snapshot(label, reason)
+        report = SnapshotReport()
+        try:
+            if os.path.isdir(self.data_dir):
+                _Cloner(self.data_dir, snapshot.data_path, report, progress).run()
+            report.seconds = time.perf_counter() - started
+            snapshot.report = asdict(report)
+            snapshot = self._commit(snapshot)
+        except BaseException:
+            shutil.rmtree(snapshot.path, ignore_errors=True)
+            raise
+        logger.info(f"Created snapshot {snapshot.id}: {report.summary()}")
+        self.prune(protect=protect)
+        return snapshot
+
+    def _move_entries(self, src: str, dst: str, names) -> List[str]:
+        moved = []
+        for name in names:
+            if os.path.lexists(os.path.join(src, name)):
+                os.rename(os.path.join(src, name), os.path.join(dst, name))
+                moved.append(name)
+        return moved
+
+    def _take_over_data_dir(self, protect=()) -> Snapshot:
+        """
+        Keep the current data dir as a snapshot. It's moved into the store
+        when both are on the same filesystem, so nothing is copied. The
+        snapshots in protect survive the pruning of a copied one.
+        """
+        snapshot = self._new_snapshot("", "before-restore")
+        try:
+            os.rename(self.data_dir, snapshot.data_path)
+        except OSError as e:
+            shutil.rmtree(snapshot.path, ignore_errors=True)
+            if e.errno != errno.EXDEV:
+                raise
+            snapshot = self.create(reason="before-restore", protect=protect)
+            shutil.rmtree(self.data_dir)
+            return snapshot
+        try:
+            return self._commit(snapshot)
+        except BaseException:
+            # the data dir is the only copy, put it back before the partial
+            # snapshot is pruned
+            os.rename(snapshot.data_path, self.data_dir)
+            shutil.rmtree(snapshot.path, ignore_errors=True)
+            raise
+
+    def _restore_configs(self, snapshot: Snapshot) -> None:
+        for key, path in self.configs.items():
+            src = snapshot.config_path(key)
+            if not os.path.isfile(src):
+                continue
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}{restoring_suffix}"
+            shutil.copy2(src, tmp)
+            _chown_like(os.stat(path if os.path.exists(path) else src), tmp)
+            os.replace(tmp, path)
+
+    def restore(
+        self, id: str, progress: Optional[Callable[[SnapshotReport], None]] = None
+    ) -> Snapshot:
+        """
+        Replace the data dir and the user configs with the snapshot, the
+        service must be stopped. The replaced data is kept as a snapshot,
+        which is returned, so a restore can be undone as well.
+        """
+        snapshot = self.get(id)
+        staging = f"{self.data_dir}{restoring_suffix}"
+        if os.path.exists(staging):
+            shutil.rmtree(staging)
+        report = SnapshotReport()
+        try:
+            _Cloner(snapshot.data_path, staging, report, progress).run()
+            moved = self._move_entries(self.data_dir, staging, excluded_entries)
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        try:
+            before = (
+                self._take_over_data_dir(protect=(snapshot.id,))
+                if os.path.exists(self.data_dir)
+                else None
+            )
+        except BaseException:
+            self._move_entries(staging, self.data_dir, moved)
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        os.rename(staging, self.data_dir)
+        self._restore_configs(snapshot)
+        logger.info(f"Restored snapshot {snapshot.id}: {report.summary()}")
+        self.prune(protect=(snapshot.id,))
+        return before
+
+    def delete(self, id: str) -> None:
+        shutil.rmtree(self.get(id).path)
+        logger.info(f"Deleted snapshot {id}")
+
+    def prune(self, protect=()) -> List[str]:
+        """
+        Delete the snapshots beyond the retention policy and the leftovers
+        of interrupted ones. The newest snapshot is always kept.
+        """
+        if not os.path.isdir(self.root):
+            return []
+        for entry in os.scandir(self.root):
+            if entry.name.startswith(".") and entry.name.endswith(partial_suffix):
+                shutil.rmtree(entry.path, ignore_errors=True)
+        policy = self.policy
+        oldest = time.time() - policy.max_age_days * 86400
+        deleted = []
+        for n, snapshot in enumerate(self.list()):
+            if n == 0 or snapshot.id in protect:
+                continue
+            if (policy.keep > 0 and n >= policy.keep) or (
+                policy.max_age_days > 0 and snapshot.created < oldest
+            ):
+                shutil.rmtree(snapshot.path, ignore_errors=True)
+                deleted.append(snapshot.id)
+        if deleted:
+            logger.info(f"Pruned snapshots {', '.join(deleted)}")
+        return deleted
+
+
+def _tree_size(path: str) -> int:
+    return sum(
+        os.lstat(os.path.join(root, f)).st_size
+        for root, _, files in os.walk(path)
+        for f in files
+    )
+
+
+def benchmark(size_mb: int = 1024, files: int = 32, db_mb: int = 32) -> None:
+    """
+    Snapshot and restore a synthetic data dir with a model cache and a
+    database, compared to a full copy of the same tree.
+    """
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = os.path.join(tmp, "GPUStack")
+        for i in range(files):
+            sub = os.path.join(data_dir, "cache", "huggingface", f"model-{i % 4}")
+            os.makedirs(sub, exist_ok=True)
+            with open(os.path.join(sub, f"blob-{i}"), "wb") as f:
+                f.write(os.urandom(size_mb * 1024 * 1024 // files))
+        db = sqlite3.connect(os.path.join(data_dir, "database.db"))
+        db.execute("pragma journal_mode=wal")
+        db.execute("create table t (id integer primary key, v blob)")
+        db.executemany(
+            "insert into t (v) values (?)",
+            ((os.urandom(4096),) for _ in range(db_mb * 256)),
+        )
+        db.commit()
+        with open(os.path.join(data_dir, "token"), "w") as f:
+            f.write("token")
+        print(f"data dir: {_tree_size(data_dir) / 2**20:.1f} MiB")
+
+        started = time.perf_counter()
+        shutil.copytree(data_dir, os.path.join(tmp, "full-copy"))
+        print(f"full copy: {time.perf_counter() - started:.2f}s")
+
+        store = SnapshotStore(default_snapshot_root(data_dir), data_dir)
+        # the database is still opened, with uncheckpointed pages in the wal
+        snapshot = store.create("benchmark")
+        db.close()
+        print(f"snapshot: {SnapshotReport(**snapshot.report).summary()}")
+        os.remove(os.path.join(data_dir, "token"))
+        started = time.perf_counter()
+        before = store.restore(snapshot.id)
+        print(
+            f"restore: {time.perf_counter() - started:.2f}s, "
+            f"token restored: {os.path.exists(os.path.join(data_dir, 'token'))}, "
+            f"replaced data kept as {before.id}"
+        )
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    benchmark()
+    sys.exit(0)
@@ -1,11 +1,12 @@
 import logging
+import threading
 from PySide6.QtWidgets import QMenu
-import socket
 from PySide6.QtGui import QAction, QActionGroup
 from PySide6.QtCore import Slot, Signal, QProcess, QThread
 from typing import Optional, Tuple, Union
 from gpustack_helper.config import HelperConfig
 from gpustack_helper.common import create_menu_action, show_warning
+from gpustack_helper.preflight import Preflight, PreflightReport
 from gpustack_helper.services.abstract_service import AbstractService as service
 from gpustack_helper.services.factory import get_service_class
 
@@ -14,6 +15,8 @@ logger = logging.getLogger(__name__)
 
 class Status(QMenu):
     status_signal = Signal(service.State)
+    # restart and the report, None if the checks couldn't run
+    preflight_finished = Signal(bool, object)
     cfg: HelperConfig
     start_or_stop: QAction
     restart: QAction
@@ -35,11 +38,14 @@ class Status(QMenu):
     daemon: QAction
 
     qprocess: Optional[Union[QProcess, QThread]] = None
+    preflight: Preflight = None
+    _preflight_running: bool = False
 
     service_class: service = get_service_class()
 
     def __init__(self, parent: QMenu, cfg: HelperConfig):
         self.cfg = cfg
+        self.preflight = Preflight()
         self._status = service.State.UNKNOWN
         # --- status
         super().__init__(f"状态({self.status.display_text})", parent)
@@ -58,6 +64,7 @@ class Status(QMenu):
         self.update_title()
         # functions
         self.status_signal.connect(self.on_status_changed)
+        self.preflight_finished.connect(self.on_preflight_finished)
         # QProcess 实例
         self.qprocess = None
 
@@ -117,6 +124,11 @@ class Status(QMenu):
                 self.service_class.restart(self.cfg),
                 (service.State.STOPPED, service.State.STARTED),
             )
+        elif status == service.State.SYNCING:
+            self.start_process(
+                self.service_class.sync(self.cfg),
+                (service.State.TO_SYNC, service.State.STARTED),
+            )
         elif status == service.State.STOPPING:
             self.start_process(
                 self.service_class.stop(self.cfg),
@@ -134,34 +146,76 @@ class Status(QMenu):
             status = self.status
         self.setTitle(f"状态({status.display_text})")
 
-    @Slot()
-    def start_or_stop_action(self):
-        self.start_or_stop.setDisabled(True)
-        if self.status == service.State.STOPPED and not self.is_port_available():
-            config = self.cfg.user_gpustack_config
-            port = config.port
-            host = config.host
+    def preflight_check(self, restart: bool = False) -> None:
+        """
+        Run the preflight checks off the GUI thread, they take up to the
+        check timeout. The start continues in on_preflight_finished.
+        """
+        self._preflight_running = True
+
+        def run():
+            report = None
+            try:
+                report = self.preflight.run(self.cfg, restart=restart)
+            except Exception as e:
+                logger.error(f"Failed to run the preflight checks: {e}")
+            self.preflight_finished.emit(restart, report)
+
+        threading.Thread(target=run, name="preflight-run", daemon=True).start()
+
+    @Slot(bool, object)
+    def on_preflight_finished(self, restart: bool, report: Optional[PreflightReport]):
+        self._preflight_running = False
+        if report is not None and not report.ok:
             show_warning(
                 self,
-                "端口不可用",
-                f"无法启动服务，因为端口 {host}:{port} 已被占用。请检查是否有其他服务在运行。",
+                "启动前检查失败",
+                "无法启动服务:\n" + "\n".join(r.message for r in report.errors),
             )
+            self.start_or_stop.setEnabled(True)
+            self.restart.setEnabled(True)
+            return
+        if restart:
+            self.status = service.State.RESTARTING
         else:
-            self.status = (
-                service.State.STARTING
-                if self.status == service.State.STOPPED
-                else service.State.STOPPING
-            )
+            self.migrate()
+            self.status = service.State.STARTING
         self.start_or_stop.setEnabled(True)
 
+    def migrate(self):
+        """
+        Pick up the env file and the data of a legacy installation before
+        the service is started.
+        """
+        try:
+            self.service_class.migrate(self.cfg)
+        except Exception as e:
+            logger.error(f"Failed to migrate the legacy installation: {e}")
+            show_warning(self, "迁移旧版本数据失败", str(e))
+
+    @Slot()
+    def start_or_stop_action(self):
+        if self._preflight_running:
+            return
+        self.start_or_stop.setDisabled(True)
+        if self.status != service.State.STOPPED:
+            self.status = service.State.STOPPING
+            self.start_or_stop.setEnabled(True)
+        else:
+            self.preflight_check()
+
     @Slot()
     def restart_action(self):
+        if self._preflight_running:
+            return
         self.restart.setDisabled(True)
-        self.status = service.State.RESTARTING
+        self.preflight_check(restart=True)
 
     @Slot()
     def update_menu_status(self):
         logger.debug("Query service status")
+        if self._preflight_running:
+            return
         if not self.start_or_stop.isEnabled():
             self.start_or_stop.setEnabled(True)
         if self.qprocess is not None:
@@ -183,16 +237,3 @@ class Status(QMenu):
                 self.qprocess.waitForFinished()
             elif isinstance(self.qprocess, QThread):
                 self.qprocess.wait()
-
-    def is_port_available(self) -> bool:
-        config = self.cfg.user_gpustack_config
-        port = config.port
-        host = config.host
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-            try:
-                s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-                s.bind((host, port))
-                return True
-            except OSError as e:
-                logger.debug(f"端口 {host}:{port} 不可用: {e}")
-                return False
@@ -1,12 +1,29 @@
+import json
 import os
 import shutil
 import re
 import stat
+import threading
+from dataclasses import dataclass, field
+from fnmatch import fnmatch
 from pathlib import Path
-from typing import Dict
+from typing import Dict, List, Optional, Tuple
+import yaml
 from gpustack.worker.tools_manager import ToolsManager, BUILTIN_LLAMA_BOX_VERSION
 from gpustack.utils.platform import system, arch, DeviceTypeEnum
 from importlib.resources import files
+from gpustack_helper.artifacts import (
+    ArtifactCache,
+    checksums_name,
+    file_sha256,
+    installed_release_name,
+)
+from gpustack_helper.integrity import write_manifest
+from gpustack_helper.downloads import (
+    DownloadScheduler,
+    default_chunk_size,
+    extract_zip,
+)
 
 LLAMA_BOX = 'llama-box'
 LLAMA_BOX_VERSION = os.getenv("LLAMA_BOX_VERSION", BUILTIN_LLAMA_BOX_VERSION)
@@ -14,6 +31,13 @@ LLAMA_BOX_DOWNLOAD_REPO = os.getenv("LLAMA_BOX_DOWNLOAD_REPO", f"gpustack/{LLAMA
 PREFERRED_BASE_URL = os.getenv("PREFERRED_BASE_URL", None)
 VERSION_URL_PREFIX = f"{LLAMA_BOX_DOWNLOAD_REPO}/releases/download/{LLAMA_BOX_VERSION}"
 TARGET_PREFIX = f"{LLAMA_BOX}-{system()}-{arch()}-"
+# archive checksum of every installed llama-box variant
+INSTALLED_CHECKSUMS = "checksums.json"
+# comma separated patterns, e.g. LLAMA_BOX_INCLUDE="cuda-12.*,cpu"
+LLAMA_BOX_INCLUDE = os.getenv("LLAMA_BOX_INCLUDE", "")
+LLAMA_BOX_EXCLUDE = os.getenv("LLAMA_BOX_EXCLUDE", "")
+# yaml manifest with include and exclude lists, merged with the env
+LLAMA_BOX_VARIANTS_FILE = os.getenv("LLAMA_BOX_VARIANTS_FILE", None)
 
 
 def exe() -> str:
@@ -51,17 +75,74 @@ def verify_file_checksum(file_path: str, expected_checksum: str) -> bool:
 
     sha256_hash = hashlib.sha256()
     with open(file_path, "rb") as f:
-        for byte_block in iter(lambda: f.read(4096), b""):
+        for byte_block in iter(lambda: f.read(default_chunk_size), b""):
             sha256_hash.update(byte_block)
     return sha256_hash.hexdigest() == expected_checksum
 
 
+def split_variant(file_name: str) -> Tuple[str, str]:
+    # e.g. llama-box-windows-amd64-cuda-12.4.zip -> cuda and 12.4
+    # e.g. llama-box-darwin-arm64-metal.zip -> metal and ''
+    suffix = file_name.removeprefix(TARGET_PREFIX).removesuffix(".zip").split("-", 1)
+    return suffix[0], suffix[1] if len(suffix) == 2 else ""
+
+
+def _patterns(value: str) -> List[str]:
+    return [p.strip() for p in value.split(",") if p.strip()]
+
+
+@dataclass
+class VariantSelection:
+    """
+    Select llama-box variants by toolkit and version suffix. Patterns are
+    shell style and match the device or toolkit name, alone or followed by
+    the version, e.g. `cuda`, `hip-6.*`, `npu-8.0*`. An empty include list
+    selects everything, excludes are applied afterwards.
+    """
+
+    include: List[str] = field(default_factory=list)
+    exclude: List[str] = field(default_factory=list)
+    skipped: List[str] = field(default_factory=list)
+
+    @classmethod
+    def from_env(cls) -> "VariantSelection":
+        selection = cls(_patterns(LLAMA_BOX_INCLUDE), _patterns(LLAMA_BOX_EXCLUDE))
+        if LLAMA_BOX_VARIANTS_FILE:
+            with open(LLAMA_BOX_VARIANTS_FILE, "r", encoding="utf-8") as f:
+                manifest = yaml.safe_load(f) or {}
+            selection.include += manifest.get("include", [])
+            selection.exclude += manifest.get("exclude", [])
+        return selection
+
+    @staticmethod
+    def _names(file_name: str) -> List[str]:
+        device, version = split_variant(file_name)
+        names = [device, get_toolkit_name(device)]
+        if version:
+            names += [f"{name}-{version}" for name in names]
+        return names
+
+    def _matches(self, patterns: List[str], file_name: str) -> bool:
+        return any(
+            fnmatch(name, pattern)
+            for pattern in patterns
+            for name in self._names(file_name)
+        )
+
+    def selects(self, file_name: str) -> bool:
+        if self.include and not self._matches(self.include, file_name):
+            return False
+        return not self._matches(self.exclude, file_name)
+
+
 def download_checksum(
-    manager: ToolsManager, tmp_dir: Path, BaseURL: str
+    manager: ToolsManager,
+    tmp_dir: Path,
+    BaseURL: str,
+    selection: Optional[VariantSelection] = None,
 ) -> Dict[str, str]:
-    checksum_filename = "sha256sum.txt"
-    checksum_file_path = tmp_dir / checksum_filename
-    url_path = f"{VERSION_URL_PREFIX}/{checksum_filename}"
+    checksum_file_path = tmp_dir / checksums_name
+    url_path = f"{VERSION_URL_PREFIX}/{checksums_name}"
     files_checksum: Dict[str, str] = {}
     try:
         manager._download_file(
@@ -74,6 +155,9 @@ def download_checksum(
                     continue
                 if not pair[1].startswith(TARGET_PREFIX):
                     continue
+                if selection is not None and not selection.selects(pair[1]):
+                    selection.skipped.append(pair[1])
+                    continue
                 files_checksum[pair[1]] = pair[0]
 
     except Exception as e:
@@ -81,38 +165,69 @@ def download_checksum(
     return files_checksum
 
 
-def download_and_extract(manager: ToolsManager, file_path: Path, checksum: str) -> Path:
+def resolve_base_url(manager: ToolsManager) -> str:
+    if PREFERRED_BASE_URL:
+        return PREFERRED_BASE_URL
+    if not manager._download_base_url:
+        # picks the fastest of github and its mirror
+        manager._check_and_set_download_base_url()
+    return manager._download_base_url
+
+
+def download_and_extract(
+    scheduler: DownloadScheduler,
+    base_url: str,
+    file_path: Path,
+    checksum: str,
+    cache: Optional[ArtifactCache] = None,
+) -> Path:
+    """
+    Download, verify and extract an archive reading it only once: it is
+    hashed while downloading and extracted right after the digest matched.
+    The verified archive is published to the mirror of the cache if given.
+    """
+    url_path = f"{VERSION_URL_PREFIX}/{file_path.name}"
     try:
-        manager._download_file(
-            f"{VERSION_URL_PREFIX}/{file_path.name}",
-            file_path,
-            base_url=PREFERRED_BASE_URL,
-        )
-        if not verify_file_checksum(file_path, checksum):
-            raise RuntimeError(f"Checksum verification failed for {file_path.name}")
-        manager._extract_file(file_path, file_path.parent)
+        scheduler.download(f"{base_url}/{url_path}", file_path, sha256=checksum)
+        if cache is not None:
+            cache.publish(url_path, file_path)
+        extract_zip(file_path, file_path.parent)
+        os.remove(file_path)
         source_binary: Path = file_path.parent / f'{LLAMA_BOX}{exe()}'
         return source_binary
     except Exception as e:
         raise RuntimeError(f"Failed to download or verify {file_path.name}: {e}")
 
 
-def move_and_rename(file_name: str, source_binary: Path, target_dir: Path) -> str:
-    # e.g. llama-box-windows-amd64-cuda-12.4.zip -> cuda and 12.4.zip
-    # e.g. llama-box-darwin-arm64-metal.zip -> metal and .zip
-    suffix = file_name.removeprefix(TARGET_PREFIX).split("-", 1)
-    if len(suffix) < 2:
-        device_name = suffix[0].removesuffix(".zip")
-        version_suffix = ".zip"
-    else:
-        device_name, version_suffix = suffix[0], suffix[1]
+def target_name(file_name: str) -> str:
+    device_name, version_suffix = split_variant(file_name)
     # e.g. get the toolkit name from mapping, metal -> mps, cuda -> cuda, etc.
     toolkit_name = get_toolkit_name(device_name)
-    # e.g. 12.4.zip -> 12.4
-    version_suffix = version_suffix.removesuffix(".zip")
     if version_suffix != "":
         version_suffix = "-" + version_suffix
-    target_file_name = f"{TARGET_PREFIX}{toolkit_name}{version_suffix}{exe()}"
+    return f"{TARGET_PREFIX}{toolkit_name}{version_suffix}{exe()}"
+
+
+def report_skipped(scheduler: DownloadScheduler, base_url: str, skipped: List[str]):
+    if not skipped:
+        return
+    sizes = scheduler.map(
+        lambda name: scheduler.remote_size(f"{base_url}/{VERSION_URL_PREFIX}/{name}"),
+        {name: name for name in skipped},
+    )
+    known = [size for size in sizes.values() if size is not None]
+    unknown = len(skipped) - len(known)
+    print(
+        f"skipped {len(skipped)} llama-box variant(s) by selection, "
+        f"saved {sum(known) / 2**20:.1f} MiB"
+        f"{f' ({unknown} of unknown size)' if unknown else ''}"
+    )
+    for name in sorted(skipped):
+        print(f"  {name}")
+
+
+def move_and_rename(file_name: str, source_binary: Path, target_dir: Path) -> str:
+    target_file_name = target_name(file_name)
     if not os.path.exists(source_binary):
         raise RuntimeError(
             f"Expected binary {source_binary} not found after extraction."
@@ -121,38 +236,201 @@ def move_and_rename(file_name: str, source_binary: Path, target_dir: Path) -> st
         st = os.stat(source_binary)
         os.chmod(source_binary, st.st_mode | stat.S_IEXEC)
     shutil.move(source_binary, target_dir / target_file_name)
+    return target_file_name
 
 
-def download_llama_box(manager: ToolsManager):
+def load_installed_checksums(target_dir: Path) -> Dict[str, str]:
+    try:
+        with open(target_dir / INSTALLED_CHECKSUMS, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_installed_checksums(target_dir: Path, checksums: Dict[str, str]) -> None:
+    with open(target_dir / INSTALLED_CHECKSUMS, "w", encoding="utf-8") as f:
+        json.dump(checksums, f, indent=4, sort_keys=True)
+
+
+def _archive_ref(checksum: str) -> str:
+    # the cache keeps the extracted binary keyed by its own digest, the ref
+    # points the archive digest of sha256sum.txt at it
+    return f"{LLAMA_BOX}-archive-{checksum.lower()}"
+
+
+def save_installed_release(target_dir: Path, files_checksum: Dict[str, str]) -> None:
+    release = {
+        "repo": LLAMA_BOX_DOWNLOAD_REPO,
+        "version": LLAMA_BOX_VERSION,
+        "archives": {target_name(name): name for name in files_checksum},
+    }
+    with open(target_dir / installed_release_name, "w", encoding="utf-8") as f:
+        json.dump(release, f, indent=4, sort_keys=True)
+
+
+def plan_llama_box(
+    manager: ToolsManager,
+    cache: ArtifactCache,
+    target_dir: Path,
+    files_checksum: Dict[str, str],
+    installed: Dict[str, str],
+) -> Tuple[Dict[str, str], List[str]]:
+    """
+    Diff the wanted variants against the installed ones. Unchanged ones are
+    kept, cached ones are restored. Return the archives left to download
+    and a summary of what was done.
+    """
+    pending: Dict[str, str] = {}
+    summary: List[str] = []
+    wanted = set()
+    for file_name, checksum in files_checksum.items():
+        name = target_name(file_name)
+        wanted.add(name)
+        target = target_dir / name
+        if (
+            target.is_file()
+            and installed.get(name) == checksum
+            and manager._current_tools_version.get(name) == LLAMA_BOX_VERSION
+        ):
+            summary.append(f"{name}: unchanged")
+            continue
+        # the binary is always replaced by rename, never written in place,
+        # so sharing the inode with the cache is safe
+        ref = cache.get_ref(_archive_ref(checksum))
+        method = (
+            cache.restore(ref["sha256"], target, verify=True)
+            if ref is not None
+            else None
+        )
+        if method is not None:
+            installed[name] = checksum
+            manager._update_versions_file(name, LLAMA_BOX_VERSION)
+            summary.append(f"{name}: restored from cache ({method})")
+            continue
+        pending[file_name] = checksum
+    for name in os.listdir(target_dir):
+        if name.startswith(TARGET_PREFIX) and name not in wanted:
+            os.remove(target_dir / name)
+            installed.pop(name, None)
+            summary.append(f"{name}: removed")
+    return pending, summary
+
+
+def download_llama_box(manager: ToolsManager, cache: ArtifactCache):
     target_dir = manager.third_party_bin_path / LLAMA_BOX
     llama_box_tmp_dir = target_dir / f"tmp-{LLAMA_BOX}"
     if os.path.exists(llama_box_tmp_dir):
         shutil.rmtree(llama_box_tmp_dir)
     os.makedirs(llama_box_tmp_dir, exist_ok=True)
-    files_checksum = download_checksum(manager, llama_box_tmp_dir, PREFERRED_BASE_URL)
-    for file_name, checksum in files_checksum.items():
-        file_path = llama_box_tmp_dir / file_name
+    selection = VariantSelection.from_env()
+    files_checksum = download_checksum(
+        manager, llama_box_tmp_dir, PREFERRED_BASE_URL, selection
+    )
+    installed = load_installed_checksums(target_dir)
+    pending, summary = plan_llama_box(
+        manager, cache, target_dir, files_checksum, installed
+    )
+    # _update_versions_file rewrites versions.json from a shared dict
+    versions_lock = threading.Lock()
+
+    def fetch(file_name: str) -> str:
+        # every archive contains a binary named llama-box, keep them apart
+        work_dir = llama_box_tmp_dir / file_name.removesuffix(".zip")
+        os.makedirs(work_dir, exist_ok=True)
+        checksum = pending[file_name]
         try:
-            source_binary = download_and_extract(manager, file_path, checksum)
+            source_binary = download_and_extract(
+                scheduler,
+                base_url,
+                work_dir / file_name,
+                checksum,
+                cache,
+            )
             target_file_name = move_and_rename(file_name, source_binary, target_dir)
-            manager._update_versions_file(target_file_name, LLAMA_BOX_VERSION)
-
+            binary = target_dir / target_file_name
+            binary_checksum = file_sha256(binary)
+            cache.put(binary_checksum, binary)
+            cache.set_ref(_archive_ref(checksum), sha256=binary_checksum)
+            with versions_lock:
+                manager._update_versions_file(target_file_name, LLAMA_BOX_VERSION)
+                installed[target_file_name] = checksum
+            return target_file_name
         except Exception as e:
             raise RuntimeError(f"Failed to download or verify {file_name}: {e}")
 
+    try:
+        if pending or selection.skipped:
+            base_url = resolve_base_url(manager)
+            # sized by GPUSTACK_DOWNLOAD_WORKERS, see gpustack_helper.downloads
+            with DownloadScheduler() as scheduler:
+                for name in scheduler.map(fetch, {name: name for name in pending}):
+                    summary.append(f"{target_name(name)}: downloaded")
+                report_skipped(scheduler, base_url, selection.skipped)
+    finally:
+        save_installed_checksums(target_dir, installed)
+    save_installed_release(target_dir, files_checksum)
+    # the upstream file lists every variant, the mirror only has the selected
+    cache.publish_checksums(VERSION_URL_PREFIX, files_checksum)
+    for line in sorted(summary):
+        print(line)
+
     # remove tmp dir
     if os.path.exists(llama_box_tmp_dir):
         shutil.rmtree(llama_box_tmp_dir)
 
 
-def download():
+def cached_tool(
+    manager: ToolsManager, cache: ArtifactCache, target: Path, download
+) -> None:
+    """
+    Tools without published checksums are tracked by a named ref. The last
+    downloaded binary is restored before asking the manager, which skips
+    the download if the restored version is the one it wants.
+    """
+    name = target.name
+    ref_name = f"{system()}-{arch()}-{name}"
+    ref = cache.get_ref(ref_name)
+    if ref is not None and not target.is_file():
+        # the manager downloads in place, never share the inode with the cache
+        if (
+            cache.restore(ref["sha256"], target, hardlink=False, verify=True)
+            is not None
+        ):
+            manager._update_versions_file(name, ref["version"])
+    download()
+    version = manager._current_tools_version.get(name)
+    if not target.is_file() or version is None:
+        return
+    if ref is None or ref.get("version") != version:
+        checksum = file_sha256(target)
+        cache.put(checksum, target, hardlink=False)
+        cache.set_ref(ref_name, version=version, sha256=checksum)
+
+
+def download(clean: Optional[bool] = None):
+    if clean is None:
+        clean = os.getenv("GPUSTACK_TOOLS_CLEAN") is not None
     manager = ToolsManager()
+    cache = ArtifactCache()
     try:
-        # cleanup third_party bin path
-        manager.remove_cached_tools()
-        manager.download_fastfetch()
-        manager.download_gguf_parser()
-        download_llama_box(manager)
+        if clean:
+            # cleanup third_party bin path
+            manager.remove_cached_tools()
+        bin_path = manager.third_party_bin_path
+        cached_tool(
+            manager,
+            cache,
+            bin_path / "fastfetch" / f"fastfetch{exe()}",
+            manager.download_fastfetch,
+        )
+        cached_tool(
+            manager,
+            cache,
+            bin_path / "gguf-parser" / f"gguf-parser{exe()}",
+            manager.download_gguf_parser,
+        )
+        download_llama_box(manager, cache)
+        print(f"Wrote {write_manifest(str(bin_path))}")
     except Exception as e:
         print(f"Error downloading tools: {e}")
         raise
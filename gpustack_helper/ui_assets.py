@@ -0,0 +1,257 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+manifest_name = "precompressed.json"
+# read by the spec files, "0" builds without the precompressed siblings
+PRECOMPRESS_ENV = "GPUSTACK_PRECOMPRESS_UI"
+compressible_suffixes = (
+    ".js",
+    ".mjs",
+    ".css",
+    ".html",
+    ".svg",
+    ".json",
+    ".map",
+    ".txt",
+    ".xml",
+    ".wasm",
+    ".ttf",
+    ".otf",
+    ".eot",
+    ".ico",
+    ".webmanifest",
+)
+encodings = {"br": ".br", "gzip": ".gz"}
+# smaller files don't fill the first tcp round trip anyway
+min_size = 1024
+# siblings saving less than this share of the bytes are not kept
+min_saving = 0.05
+# file names with a content hash never change, e.g. umi.3f2a1b9c.js
+_hashed_name = re.compile(r"[.-][0-9a-f]{8,}\.")
+immutable_cache_control = "public, max-age=31536000, immutable"
+revalidate_cache_control = "no-cache"
+# bytes per second
+link_speeds = {"2 Mbit/s": 2e6 / 8, "10 Mbit/s": 10e6 / 8, "100 Mbit/s": 100e6 / 8}
+default_workers = min(4, os.cpu_count() or 1)
+
+_brotli_missing_logged = False
+
+
+def spec_precompress() -> bool:
+    return os.getenv(PRECOMPRESS_ENV, "1") != "0"
+
+
+def _brotli(data: bytes) -> Optional[bytes]:
+    global _brotli_missing_logged
+    try:
+        import brotli
+    except ImportError:
+        if not _brotli_missing_logged:
+            logger.error("brotli is not installed, only gzip siblings are written.")
+            _brotli_missing_logged = True
+        return None
+    return brotli.compress(data, quality=11)
+
+
+def _available_encodings() -> List[str]:
+    try:
+        import brotli  # noqa: F401
+    except ImportError:
+        return ["gzip"]
+    return sorted(encodings)
+
+
+def _gzip(data: bytes) -> bytes:
+    # mtime=0 keeps the output reproducible
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _write(path: str, data: bytes, source: str) -> None:
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    shutil.copystat(source, tmp)
+    os.replace(tmp, path)
+
+
+@dataclass
+class PrecompressReport:
+    files: int = 0
+    compressed: int = 0
+    reused: int = 0
+    raw_bytes: int = 0
+    best_bytes: int = 0
+    encoded_bytes: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def saved(self) -> int:
+        return self.raw_bytes - self.best_bytes
+
+    def transfer_times(self) -> Dict[str, Dict[str, float]]:
+        return {
+            link: {"raw": self.raw_bytes / speed, "best": self.best_bytes / speed}
+            for link, speed in link_speeds.items()
+        }
+
+
+def _assets(ui_dir: str) -> List[str]:
+    assets = []
+    for root, _, names in os.walk(ui_dir):
+        for name in names:
+            if name == manifest_name or name.endswith((".br", ".gz", ".tmp")):
+                continue
+            rel = os.path.relpath(os.path.join(root, name), ui_dir)
+            assets.append(rel.replace(os.sep, "/"))
+    return sorted(assets)
+
+
+def _siblings_current(ui_dir: str, rel: str, entry: Dict[str, Any]) -> bool:
+    # e.g. brotli was installed since, the .br siblings are missing
+    if entry.get("codecs") != _available_encodings():
+        return False
+    for name, e in entry.get("encodings", {}).items():
+        sibling = os.path.join(ui_dir, rel + encodings[name])
+        if not os.path.isfile(sibling) or os.path.getsize(sibling) != e["size"]:
+            return False
+    return True
+
+
+def _process(ui_dir: str, rel: str, previous: Optional[Dict[str, Any]]):
+    """
+    Hash an asset and write its compressed siblings, unless the previous
+    manifest entry shows they are current. Return the entry and whether it
+    was reused.
+    """
+    path = os.path.join(ui_dir, rel)
+    with open(path, "rb") as f:
+        data = f.read()
+    digest = _sha256(data)
+    if (
+        previous is not None
+        and previous["sha256"] == digest
+        and _siblings_current(ui_dir, rel, previous)
+    ):
+        return previous, True
+    entry: Dict[str, Any] = {
+        "size": len(data),
+        "sha256": digest,
+        "etag": f'"{digest}"',
+        "cache_control": (
+            immutable_cache_control
+            if _hashed_name.search(os.path.basename(rel))
+            else revalidate_cache_control
+        ),
+        "encodings": {},
+        "codecs": _available_encodings(),
+    }
+    compressible = rel.lower().endswith(compressible_suffixes) and len(data) >= min_size
+    for name, suffix in encodings.items():
+        sibling = os.path.join(ui_dir, rel + suffix)
+        encoded = None
+        if compressible:
+            encoded = _brotli(data) if name == "br" else _gzip(data)
+        if encoded is None or len(encoded) > len(data) * (1 - min_saving):
+            if os.path.exists(sibling):
+                os.remove(sibling)
+            continue
+        _write(sibling, encoded, path)
+        entry["encodings"][name] = {
+            "size": len(encoded),
+            "sha256": _sha256(encoded),
+            "etag": f'"{digest}-{name}"',
+        }
+    return entry, False
+
+
+def load_manifest(ui_dir: str) -> Dict[str, Any]:
+    try:
+        with open(os.path.join(ui_dir, manifest_name), "r", encoding="utf-8") as f:
+            return json.load(f).get("files", {})
+    except (OSError, ValueError):
+        return {}
+
+
+def precompress(ui_dir: str, workers: int = default_workers) -> PrecompressReport:
+    """
+    Write .br and .gz siblings next to the compressible assets of the web
+    console and a manifest with the sha256, strong ETags and the cache
+    policy of every asset and encoding. Assets unchanged since the last run
+    are not compressed again.
+    """
+    previous = load_manifest(ui_dir)
+    assets = _assets(ui_dir)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ui") as pool:
+        results = list(
+            pool.map(lambda rel: _process(ui_dir, rel, previous.get(rel)), assets)
+        )
+    report = PrecompressReport(encoded_bytes={name: 0 for name in encodings})
+    files: Dict[str, Any] = {}
+    for rel, (entry, reused) in zip(assets, results):
+        files[rel] = entry
+        report.files += 1
+        report.reused += reused
+        if not entry["encodings"]:
+            continue
+        report.compressed += 1
+        report.raw_bytes += entry["size"]
+        report.best_bytes += min(e["size"] for e in entry["encodings"].values())
+        for name, e in entry["encodings"].items():
+            report.encoded_bytes[name] += e["size"]
+    for rel in previous.keys() - files.keys():
+        # the siblings written for assets which are gone
+        for name in previous[rel].get("encodings", {}):
+            sibling = os.path.join(ui_dir, rel + encodings[name])
+            if os.path.exists(sibling):
+                os.remove(sibling)
+    with open(os.path.join(ui_dir, manifest_name), "w", encoding="utf-8") as f:
+        json.dump({"version": 1, "files": files}, f, indent=2, sort_keys=True)
+    return report
+
+
+def remove_siblings(ui_dir: str) -> int:
+    """
+    Remove the siblings and the manifest written by precompress, files of
+    the package itself are left alone. Return how many were removed.
+    """
+    removed = 0
+    for rel, entry in load_manifest(ui_dir).items():
+        for name in entry.get("encodings", {}):
+            sibling = os.path.join(ui_dir, rel + encodings[name])
+            if os.path.exists(sibling):
+                os.remove(sibling)
+                removed += 1
+    path = os.path.join(ui_dir, manifest_name)
+    if os.path.exists(path):
+        os.remove(path)
+    return removed
+
+
+def print_report(report: PrecompressReport) -> None:
+    print(
+        f"Precompressed {report.compressed} of {report.files} UI assets "
+        f"({report.reused} unchanged): {report.raw_bytes / 2**20:.1f} MiB -> "
+        f"{report.best_bytes / 2**20:.1f} MiB, saved {report.saved / 2**20:.1f} MiB"
+    )
+    for name, size in report.encoded_bytes.items():
+        print(f"  {name}: {size / 2**20:.1f} MiB")
+    for link, times in report.transfer_times().items():
+        print(f"  at {link}: {times['raw']:.1f}s -> {times['best']:.1f}s")
+
+
+if __name__ == "__main__":
+    print_report(precompress(sys.argv[1]))
@@ -0,0 +1,809 @@
+import base64
+import gzip
+import hashlib
+import json
+import logging
+import os
+import shutil
+import stat
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from gpustack_helper.artifacts import file_sha256, link_or_copy
+from gpustack_helper.downloads import DownloadScheduler, default_chunk_size
+
+logger = logging.getLogger(__name__)
+
+manifest_version = 1
+latest_name = "latest.json"
+signature_suffix = ".sig"
+# the ed25519 key latest.json is signed with, embedded at packaging
+public_key_name = "update-public-key"
+public_key_env = "GPUSTACK_UPDATE_PUBLIC_KEY"
+staged_marker = ".staged.json"
+staged_manifest = ".manifest.json"
+staging_suffix = ".staging"
+installing_suffix = ".installing"
+backup_suffix = ".previous"
+# the delta source is loaded in memory as the zstd dictionary
+max_delta_source = 512 * 1024 * 1024
+_zstd_level = 19
+# 2**26 entries, 256 MiB of tables at most
+_max_hash_log = 26
+default_workers = min(4, os.cpu_count() or 1)
+
+
+def installed_manifest_relpath() -> Optional[str]:
+    """
+    None on macOS, any file added to a signed .app breaks its seal. The
+    updater scans the installed app instead.
+    """
+    if sys.platform == "darwin":
+        return None
+    return "update-manifest.json"
+
+
+def installed_app_dir() -> Optional[str]:
+    """
+    The root of the installed app, GPUStack.app or the folder of the
+    executables, None when not frozen.
+    """
+    if not getattr(sys, "frozen", False):
+        return None
+    exe_dir = os.path.dirname(os.path.abspath(sys.executable))
+    if sys.platform == "darwin":
+        # GPUStack.app/Contents/MacOS
+        return os.path.dirname(os.path.dirname(exe_dir))
+    return exe_dir
+
+
+def object_path(digest: str) -> str:
+    return f"objects/{digest[:2]}/{digest}.gz"
+
+
+def delta_path(source: str, target: str) -> str:
+    return f"deltas/{source}/{target}.zst"
+
+
+def _ed25519():
+    try:
+        from cryptography.hazmat.primitives.asymmetric import ed25519
+
+        return ed25519
+    except ImportError:
+        logger.error("cryptography is not installed, updates can't be verified.")
+        return None
+
+
+def generate_signing_key(path: str) -> str:
+    """
+    Write a new ed25519 private key to path as PEM, return the public key to
+    embed at packaging, see public_key_datas.
+    """
+    from cryptography.hazmat.primitives import serialization
+
+    key = _ed25519().Ed25519PrivateKey.generate()
+    with open(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600), "wb") as f:
+        f.write(
+            key.private_bytes(
+                serialization.Encoding.PEM,
+                serialization.PrivateFormat.PKCS8,
+                serialization.NoEncryption(),
+            )
+        )
+    return base64.b64encode(
+        key.public_key().public_bytes(
+            serialization.Encoding.Raw, serialization.PublicFormat.Raw
+        )
+    ).decode()
+
+
+def sign(key_path: str, data: bytes) -> bytes:
+    from cryptography.hazmat.primitives import serialization
+
+    with open(key_path, "rb") as f:
+        key = serialization.load_pem_private_key(f.read(), password=None)
+    return key.sign(data)
+
+
+def verify_latest(public_key: bytes, data: bytes, signature: bytes) -> Dict[str, Any]:
+    """
+    Check the signature of latest.json and return its content. It pins the
+    sha256 of the manifest, which pins every file.
+    """
+    ed25519 = _ed25519()
+    if ed25519 is None:
+        raise RuntimeError("cryptography is required to verify updates")
+    from cryptography.exceptions import InvalidSignature
+
+    try:
+        ed25519.Ed25519PublicKey.from_public_bytes(public_key).verify(signature, data)
+    except InvalidSignature:
+        raise RuntimeError(f"Invalid signature of {latest_name}")
+    return json.loads(data)
+
+
+def public_key_datas(build_dir: str) -> List[Tuple[str, str]]:
+    """
+    PyInstaller datas embedding the update public key given by the env, run
+    at packaging. Without it the built app refuses updates.
+    """
+    encoded = os.getenv(public_key_env, "")
+    if not encoded:
+        logger.warning(f"{public_key_env} is not set, the app can't be updated")
+        return []
+    if len(base64.b64decode(encoded, validate=True)) != 32:
+        raise ValueError(f"{public_key_env} is not a base64 ed25519 public key")
+    os.makedirs(build_dir, exist_ok=True)
+    path = os.path.join(build_dir, public_key_name)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(encoded)
+    return [(path, "./")]
+
+
+def embedded_public_key() -> Optional[bytes]:
+    """
+    The update public key bundled with the frozen app, None if it was
+    built without one.
+    """
+    if not getattr(sys, "frozen", False):
+        return None
+    try:
+        with open(os.path.join(getattr(sys, "_MEIPASS"), public_key_name), "r") as f:
+            return base64.b64decode(f.read().strip())
+    except (OSError, ValueError):
+        return None
+
+
+def _zstandard():
+    try:
+        import zstandard
+
+        return zstandard
+    except ImportError:
+        logger.error("zstandard is not installed, deltas are not available.")
+        return None
+
+
+def scan(app_dir: str, version: str) -> Dict[str, Any]:
+    """
+    Manifest of an app tree: size, sha256 and mode of every file and the
+    target of every symlink.
+    """
+    files: Dict[str, Dict[str, Any]] = {}
+    links: Dict[str, str] = {}
+    skip = installed_manifest_relpath()
+    for root, dirs, names in os.walk(app_dir):
+        for name in names + [d for d in dirs if os.path.islink(os.path.join(root, d))]:
+            path = os.path.join(root, name)
+            rel = os.path.relpath(path, app_dir).replace(os.sep, "/")
+            if rel == skip:
+                continue
+            if os.path.islink(path):
+                links[rel] = os.readlink(path)
+                continue
+            st = os.stat(path)
+            files[rel] = {"size": st.st_size, "mode": stat.S_IMODE(st.st_mode)}
+    paths = sorted(files)
+    with ThreadPoolExecutor(max_workers=default_workers) as pool:
+        for rel, digest in zip(
+            paths, pool.map(lambda r: file_sha256(os.path.join(app_dir, r)), paths)
+        ):
+            files[rel]["sha256"] = digest
+    return {
+        "manifest_version": manifest_version,
+        "version": version,
+        "files": files,
+        "links": links,
+    }
+
+
+def write_installed_manifest(app_dir: str, version: str) -> Optional[str]:
+    """
+    Record the files of the built app inside it, run at packaging. The
+    updater diffs it against the published manifests.
+    """
+    rel = installed_manifest_relpath()
+    if rel is None:
+        return None
+    path = os.path.join(app_dir, rel)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(scan(app_dir, version), f, indent=1, sort_keys=True)
+    return path
+
+
+def read_installed_manifest(app_dir: str) -> Optional[Dict[str, Any]]:
+    rel = installed_manifest_relpath()
+    if rel is None:
+        return None
+    try:
+        with open(os.path.join(app_dir, rel), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+# --- publishing
+
+
+def _write_object(out_dir: str, source: str, digest: str) -> Tuple[int, str]:
+    target = os.path.join(out_dir, object_path(digest))
+    if not os.path.isfile(target):
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(source, "rb") as src, gzip.open(f"{target}.tmp", "wb", 6) as dst:
+            shutil.copyfileobj(src, dst, default_chunk_size)
+        os.replace(f"{target}.tmp", target)
+    return os.path.getsize(target), file_sha256(target)
+
+
+def make_delta(source: str, target: str) -> Optional[bytes]:
+    """
+    zstd compress target with source as a raw content dictionary, like
+    `zstd --patch-from`. None if zstandard is missing or source too large.
+    """
+    zstandard = _zstandard()
+    if zstandard is None or os.path.getsize(source) > max_delta_source:
+        return None
+    with open(source, "rb") as f:
+        dictionary = zstandard.ZstdCompressionDict(
+            f.read(), dict_type=zstandard.DICT_TYPE_RAWCONTENT
+        )
+    with open(target, "rb") as f:
+        data = f.read()
+    window_log = max(
+        (len(dictionary.as_bytes()) + len(data)).bit_length(),
+        zstandard.WINDOWLOG_MIN,
+    )
+    window_log = min(window_log, zstandard.WINDOWLOG_MAX)
+    # the match tables have to index the whole source, the defaults of the
+    # level only index its tail
+    params = zstandard.ZstdCompressionParameters.from_level(
+        _zstd_level,
+        window_log=window_log,
+        hash_log=min(window_log - 1, _max_hash_log),
+        chain_log=min(window_log, _max_hash_log + 1),
+        enable_ldm=True,
+    )
+    dictionary.precompute_compress(compression_params=params)
+    compressor = zstandard.ZstdCompressor(
+        dict_data=dictionary, compression_params=params
+    )
+    return compressor.compress(data)
+
+
+def apply_delta(source: str, delta: str, target: str) -> None:
+    zstandard = _zstandard()
+    if zstandard is None:
+        raise RuntimeError("zstandard is required to apply deltas")
+    with open(source, "rb") as f:
+        dictionary = zstandard.ZstdCompressionDict(
+            f.read(), dict_type=zstandard.DICT_TYPE_RAWCONTENT
+        )
+    decompressor = zstandard.ZstdDecompressor(
+        dict_data=dictionary, max_window_size=2**31
+    )
+    with open(delta, "rb") as src, open(target, "wb") as dst:
+        decompressor.copy_stream(src, dst, write_size=default_chunk_size)
+
+
+@dataclass
+class PublishReport:
+    files: int = 0
+    full_bytes: int = 0
+    objects: int = 0
+    deltas: int = 0
+    delta_bytes: int = 0
+
+
+def _publish_deltas(
+    out_dir: str,
+    app_dir: str,
+    manifest: Dict[str, Any],
+    previous_dir: str,
+    report: PublishReport,
+) -> None:
+    previous = read_installed_manifest(previous_dir) or scan(previous_dir, "")
+    for rel, entry in manifest["files"].items():
+        old = previous["files"].get(rel)
+        if old is None or old["sha256"] == entry["sha256"]:
+            continue
+        target = os.path.join(out_dir, delta_path(old["sha256"], entry["sha256"]))
+        if not os.path.isfile(target):
+            delta = make_delta(
+                os.path.join(previous_dir, rel), os.path.join(app_dir, rel)
+            )
+            if delta is None or len(delta) >= entry["packed_size"]:
+                continue
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(f"{target}.tmp", "wb") as f:
+                f.write(delta)
+            os.replace(f"{target}.tmp", target)
+        entry.setdefault("deltas", {})[old["sha256"]] = {
+            "size": os.path.getsize(target),
+            "sha256": file_sha256(target),
+        }
+        report.deltas += 1
+        report.delta_bytes += os.path.getsize(target)
+
+
+def publish(
+    app_dir: str,
+    version: str,
+    out_dir: str,
+    key_path: str,
+    previous_dirs: Optional[List[str]] = None,
+) -> PublishReport:
+    """
+    Publish a built app to out_dir, a static tree any HTTP server can serve:
+    the manifest of the version, gzip objects of every file and zstd deltas
+    from the same file of the previous versions, where they are smaller.
+    latest.json is signed with the private key at key_path.
+    """
+    report = PublishReport()
+    manifest = scan(app_dir, version)
+    for rel, entry in manifest["files"].items():
+        size, digest = _write_object(
+            out_dir, os.path.join(app_dir, rel), entry["sha256"]
+        )
+        entry["packed_size"], entry["packed_sha256"] = size, digest
+        report.files += 1
+        report.full_bytes += size
+    report.objects = len({e["sha256"] for e in manifest["files"].values()})
+    for previous_dir in previous_dirs or []:
+        _publish_deltas(out_dir, app_dir, manifest, previous_dir, report)
+    manifest_rel = f"{version}/manifest.json"
+    os.makedirs(os.path.join(out_dir, version), exist_ok=True)
+    with open(os.path.join(out_dir, manifest_rel), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, sort_keys=True)
+    latest = json.dumps(
+        {
+            "version": version,
+            "manifest": manifest_rel,
+            "sha256": file_sha256(Path(out_dir) / manifest_rel),
+        }
+    ).encode()
+    # the signature first, a helper fetching in between sees the old pair fail
+    for name, data in (
+        (f"{latest_name}{signature_suffix}", sign(key_path, latest)),
+        (latest_name, latest),
+    ):
+        with open(os.path.join(out_dir, f"{name}.tmp"), "wb") as f:
+            f.write(data)
+        os.replace(os.path.join(out_dir, f"{name}.tmp"), os.path.join(out_dir, name))
+    return report
+
+
+# --- updating
+
+
+@dataclass
+class _Fetch:
+    rel: str
+    url_path: str
+    packed_sha256: str
+    size: int
+    sha256: str
+    mode: int
+    # the installed file the delta applies to, None for full objects
+    source: Optional[str] = None
+
+
+@dataclass
+class UpdatePlan:
+    version: str
+    manifest: Dict[str, Any]
+    reuse: List[str] = field(default_factory=list)
+    fetch: List[_Fetch] = field(default_factory=list)
+    # the signed latest.json and the manifest as downloaded, verified again
+    # before the staged tree is swapped in
+    latest: bytes = b""
+    signature: bytes = b""
+    manifest_data: bytes = b""
+
+    @property
+    def download_bytes(self) -> int:
+        return sum(f.size for f in self.fetch)
+
+    @property
+    def full_bytes(self) -> int:
+        return sum(e["packed_size"] for e in self.manifest["files"].values())
+
+
+def plan_update(
+    app_dir: str, installed: Dict[str, Any], remote: Dict[str, Any]
+) -> UpdatePlan:
+    """
+    Diff the installed manifest against the remote one. Unchanged files are
+    reused, changed ones are fetched as a delta from the installed file if
+    one is published, the rest as full objects.
+    """
+    plan = UpdatePlan(remote["version"], remote)
+    use_deltas = _zstandard() is not None
+    for rel, entry in remote["files"].items():
+        old = installed["files"].get(rel)
+        if old is not None and old["sha256"] == entry["sha256"]:
+            plan.reuse.append(rel)
+            continue
+        delta = entry.get("deltas", {}).get(old["sha256"]) if old else None
+        if delta is not None and use_deltas:
+            plan.fetch.append(
+                _Fetch(
+                    rel,
+                    delta_path(old["sha256"], entry["sha256"]),
+                    delta["sha256"],
+                    delta["size"],
+                    entry["sha256"],
+                    entry["mode"],
+                    os.path.join(app_dir, rel),
+                )
+            )
+            continue
+        plan.fetch.append(
+            _Fetch(
+                rel,
+                object_path(entry["sha256"]),
+                entry["packed_sha256"],
+                entry["packed_size"],
+                entry["sha256"],
+                entry["mode"],
+            )
+        )
+    return plan
+
+
+def staging_dir(app_dir: str) -> str:
+    # next to the app, on the same filesystem for the swap by rename
+    return f"{app_dir.rstrip(os.sep)}{staging_suffix}"
+
+
+def _read_staged(staging: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(os.path.join(staging, staged_marker), "r") as f:
+            marker = json.load(f)
+        return {
+            "version": marker["version"],
+            "latest": base64.b64decode(marker["latest"]),
+            "signature": base64.b64decode(marker["signature"]),
+        }
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def staged_version(app_dir: str) -> Optional[str]:
+    marker = _read_staged(staging_dir(app_dir))
+    return marker["version"] if marker is not None else None
+
+
+class Updater:
+    """
+    Download the changed files of a newer version and stage the complete
+    new tree next to the installed app. apply_staged_update() swaps it in
+    while the service is restarted. Nothing is trusted unless latest.json
+    is signed by the key embedded in the app.
+    """
+
+    base_url: str
+    app_dir: str
+    report: Callable[[str], None]
+    public_key: Optional[bytes]
+
+    def __init__(
+        self,
+        base_url: str,
+        app_dir: str,
+        report: Callable[[str], None] = print,
+        public_key: Optional[bytes] = None,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.app_dir = app_dir
+        self.report = report
+        self.public_key = public_key or embedded_public_key()
+
+    def _get(self, scheduler: DownloadScheduler, url_path: str, sha256=None) -> bytes:
+        target = Path(staging_dir(self.app_dir) + ".download")
+        try:
+            scheduler.download(f"{self.base_url}/{url_path}", target, sha256=sha256)
+            with open(target, "rb") as f:
+                return f.read()
+        finally:
+            if target.exists():
+                os.remove(target)
+
+    def check(self, scheduler: DownloadScheduler) -> Optional[UpdatePlan]:
+        """
+        Return the plan to the latest version, None if it is installed.
+        """
+        if self.public_key is None:
+            raise RuntimeError("The app was built without an update signing key")
+        latest_data = self._get(scheduler, latest_name)
+        signature = self._get(scheduler, f"{latest_name}{signature_suffix}")
+        latest = verify_latest(self.public_key, latest_data, signature)
+        installed = read_installed_manifest(self.app_dir)
+        if installed is None:
+            self.report("No update manifest in the installed app, scanning it")
+            installed = scan(self.app_dir, "")
+        if installed.get("version") == latest["version"]:
+            return None
+        manifest_data = self._get(scheduler, latest["manifest"], latest["sha256"])
+        remote = json.loads(manifest_data)
+        if remote.get("version") != latest["version"]:
+            raise RuntimeError(f"The manifest of {latest['version']} doesn't match")
+        plan = plan_update(self.app_dir, installed, remote)
+        plan.latest, plan.signature, plan.manifest_data = (
+            latest_data,
+            signature,
+            manifest_data,
+        )
+        return plan
+
+    def _place(self, scheduler: DownloadScheduler, staging: str, item: _Fetch):
+        target = os.path.join(staging, item.rel)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        packed = Path(f"{target}.packed")
+        scheduler.download(
+            f"{self.base_url}/{item.url_path}", packed, sha256=item.packed_sha256
+        )
+        if item.source is not None:
+            apply_delta(item.source, str(packed), target)
+        else:
+            with gzip.open(packed, "rb") as src, open(target, "wb") as dst:
+                shutil.copyfileobj(src, dst, default_chunk_size)
+        os.remove(packed)
+        if file_sha256(target) != item.sha256:
+            os.remove(target)
+            raise RuntimeError(f"Checksum mismatch of {item.rel} after unpacking")
+        os.chmod(target, item.mode)
+        return item.rel
+
+    def stage(self, scheduler: DownloadScheduler, plan: UpdatePlan) -> str:
+        """
+        Build the tree of the new version in the staging directory. The
+        marker is written last, a partial staging is started over.
+        """
+        staging = staging_dir(self.app_dir)
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+        # the installed app is never written in place, only swapped
+        for rel in plan.reuse:
+            target = os.path.join(staging, rel)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            link_or_copy(os.path.join(self.app_dir, rel), target)
+        scheduler.map(
+            lambda item: self._place(scheduler, staging, item),
+            {item.rel: item for item in plan.fetch},
+        )
+        for rel, link in plan.manifest["links"].items():
+            target = os.path.join(staging, rel)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.symlink(link, target)
+        with open(os.path.join(staging, staged_manifest), "wb") as f:
+            f.write(plan.manifest_data)
+        with open(os.path.join(staging, staged_marker), "w") as f:
+            json.dump(
+                {
+                    "version": plan.version,
+                    "latest": base64.b64encode(plan.latest).decode(),
+                    "signature": base64.b64encode(plan.signature).decode(),
+                },
+                f,
+            )
+        return staging
+
+    def update(self, workers: int = default_workers) -> Optional[UpdatePlan]:
+        """
+        Check and stage the latest version, return the staged plan or None
+        if it is already installed or staged.
+        """
+        with DownloadScheduler(workers=workers, report=self.report) as scheduler:
+            plan = self.check(scheduler)
+            if plan is None or staged_version(self.app_dir) == plan.version:
+                return None
+            self.stage(scheduler, plan)
+        self.report(
+            f"Staged {plan.version}: downloaded {plan.download_bytes / 2**20:.1f} "
+            f"of {plan.full_bytes / 2**20:.1f} MiB, reused {len(plan.reuse)} files"
+        )
+        return plan
+
+
+def recover(app_dir: str) -> None:
+    """
+    Finish or undo a swap interrupted between its two renames.
+    """
+    backup = f"{app_dir.rstrip(os.sep)}{backup_suffix}"
+    if not os.path.exists(app_dir) and os.path.isdir(backup):
+        os.rename(backup, app_dir)
+
+
+def _safe_path(root: str, rel: str) -> str:
+    path = os.path.normpath(os.path.join(root, rel))
+    if os.path.isabs(rel) or not path.startswith(os.path.join(root, "")):
+        raise RuntimeError(f"Invalid path {rel} in the update manifest")
+    return path
+
+
+def _install_verified(staging: str, target: str, manifest: Dict[str, Any]) -> None:
+    """
+    Build the tree of the manifest in target from the staged files. Every
+    file is cloned or copied to a new inode and hashed there, so nothing
+    written by the unprivileged helper is trusted. target stays private
+    until it is complete and, as root, owned by root:wheel.
+    """
+    shutil.rmtree(target, ignore_errors=True)
+    os.makedirs(target, mode=0o700)
+    as_root = hasattr(os, "geteuid") and os.geteuid() == 0
+    for rel, entry in manifest["files"].items():
+        src = _safe_path(staging, rel)
+        dst = _safe_path(target, rel)
+        os.makedirs(os.path.dirname(dst), mode=0o755, exist_ok=True)
+        if not stat.S_ISREG(os.lstat(src).st_mode):
+            raise RuntimeError(f"The staged {rel} is not a regular file")
+        link_or_copy(src, dst, hardlink=False)
+        if (
+            not stat.S_ISREG(os.lstat(dst).st_mode)
+            or file_sha256(dst) != entry["sha256"]
+        ):
+            raise RuntimeError(f"Checksum mismatch of the staged {rel}")
+        # never writable by group or others, whatever the manifest says
+        os.chmod(dst, entry["mode"] & 0o755)
+    for rel, link in manifest["links"].items():
+        dst = _safe_path(target, rel)
+        os.makedirs(os.path.dirname(dst), mode=0o755, exist_ok=True)
+        os.symlink(link, dst)
+    if as_root:
+        for root, dirs, names in os.walk(target):
+            for name in dirs + names:
+                os.lchown(os.path.join(root, name), 0, 0)
+        os.chown(target, 0, 0)
+    os.chmod(target, 0o755)
+
+
+def _verified_manifest(
+    staging: str, marker: Dict[str, Any], public_key: Optional[bytes]
+) -> bytes:
+    public_key = public_key or embedded_public_key()
+    if public_key is None:
+        raise RuntimeError("The app was built without an update signing key")
+    latest = verify_latest(public_key, marker["latest"], marker["signature"])
+    with open(os.path.join(staging, staged_manifest), "rb") as f:
+        manifest_data = f.read()
+    if hashlib.sha256(manifest_data).hexdigest() != latest["sha256"]:
+        raise RuntimeError("The staged manifest doesn't match the signed one")
+    if json.loads(manifest_data).get("version") != latest["version"]:
+        raise RuntimeError(f"The staged manifest isn't the one of {latest['version']}")
+    return manifest_data
+
+
+def apply_staged_update(
+    app_dir: Optional[str] = None, public_key: Optional[bytes] = None
+) -> Optional[str]:
+    """
+    Swap the staged tree in place of the app, keep the previous one as a
+    backup. Return the applied version, None if nothing was staged. The
+    signature, the manifest and every staged file are verified again here,
+    so on macOS it runs as root from the start script. Run while the
+    service is restarted, the running processes keep the files they
+    already opened.
+    """
+    if sys.platform == "win32":
+        # the running executables and DLLs lock the folder, it can't be
+        # renamed from a process started out of it
+        raise NotImplementedError("Updates can't be applied in place on Windows")
+    app_dir = app_dir or installed_app_dir()
+    if app_dir is None:
+        return None
+    recover(app_dir)
+    staging = staging_dir(app_dir)
+    marker = _read_staged(staging)
+    if marker is None:
+        return None
+    if sys.platform == "darwin" and os.geteuid() != 0:
+        raise PermissionError("Updates are applied by root on macOS")
+    manifest_data = _verified_manifest(staging, marker, public_key)
+    manifest = json.loads(manifest_data)
+    version = manifest["version"]
+    target = f"{app_dir.rstrip(os.sep)}{installing_suffix}"
+    try:
+        _install_verified(staging, target, manifest)
+        rel = installed_manifest_relpath()
+        if rel is not None:
+            with open(os.path.join(target, rel), "wb") as f:
+                f.write(manifest_data)
+    except BaseException:
+        shutil.rmtree(target, ignore_errors=True)
+        raise
+    backup = f"{app_dir.rstrip(os.sep)}{backup_suffix}"
+    shutil.rmtree(backup, ignore_errors=True)
+    os.rename(app_dir, backup)
+    try:
+        os.rename(target, app_dir)
+    except OSError:
+        os.rename(backup, app_dir)
+        raise
+    shutil.rmtree(staging, ignore_errors=True)
+    logger.info(f"Applied update {version} to {app_dir}")
+    return version
+
+
+def benchmark(size_mb: int = 64) -> None:
+    """
+    Publish two synthetic versions, update an install of the first one from
+    a local server and check the result matches the second one.
+    """
+    import random
+    import tempfile
+    from gpustack_helper.downloads import serve_directory
+
+    def build(root: str, base: bytes, extra: bytes) -> None:
+        os.makedirs(os.path.join(root, "_internal", "lib"), exist_ok=True)
+        # the archive of the bytecode, changes a bit in every release
+        half = len(base) // 2
+        with open(os.path.join(root, "_internal", "base_library.zip"), "wb") as f:
+            f.write(base[:half] + extra + base[half:])
+        with open(os.path.join(root, "gpustack"), "wb") as f:
+            f.write(extra * 1024)
+        os.chmod(os.path.join(root, "gpustack"), 0o755)
+        for i in range(8):
+            with open(os.path.join(root, "_internal", "lib", f"lib{i}.so"), "wb") as f:
+                f.write(random.Random(i).randbytes(2 * 1024 * 1024))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        base = random.randbytes(size_mb * 1024 * 1024)
+        v1, v2, out = (os.path.join(tmp, n) for n in ("v1", "v2", "out"))
+        build(v1, base, b"v1" * 512)
+        build(v2, base, b"v2" * 4096)
+        os.remove(os.path.join(v2, "_internal", "lib", "lib7.so"))
+        with open(os.path.join(v2, "_internal", "new.dat"), "wb") as f:
+            f.write(random.randbytes(1024 * 1024))
+        key_path = os.path.join(tmp, "update-key.pem")
+        public_key = base64.b64decode(generate_signing_key(key_path))
+        publish(v1, "1.0.0", out, key_path)
+        report = publish(v2, "1.1.0", out, key_path, [v1])
+        print(report)
+
+        install = os.path.join(tmp, "install", "GPUStack")
+        shutil.copytree(v1, install)
+        write_installed_manifest(install, "1.0.0")
+        with serve_directory(out) as base_url:
+            plan = Updater(
+                base_url, install, report=lambda _: None, public_key=public_key
+            ).update()
+        print(
+            f"downloaded {plan.download_bytes / 2**20:.1f} MiB instead of "
+            f"{plan.full_bytes / 2**20:.1f} MiB, reused {len(plan.reuse)}, "
+            f"fetched {len(plan.fetch)} files"
+        )
+        print(f"applied {apply_staged_update(install, public_key)}")
+        expected = {r: e["sha256"] for r, e in scan(v2, "")["files"].items()}
+        actual = {r: e["sha256"] for r, e in scan(install, "")["files"].items()}
+        assert actual == expected, "the updated install differs from 1.1.0"
+        print("the updated install matches 1.1.0")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Publish app updates")
+    parser.add_argument("--benchmark", action="store_true")
+    parser.add_argument("--app", help="the built GPUStack.app or dist/main")
+    parser.add_argument("--version")
+    parser.add_argument("--out", help="the directory served to the helpers")
+    parser.add_argument(
+        "--previous", action="append", default=[], help="apps of older versions"
+    )
+    parser.add_argument("--key", help="the ed25519 private key signing latest.json")
+    parser.add_argument(
+        "--generate-key",
+        metavar="PATH",
+        help=f"write a new private key to PATH and print the {public_key_env}",
+    )
+    args = parser.parse_args()
+    if args.benchmark:
+        benchmark()
+    elif args.generate_key:
+        print(f"{public_key_env}={generate_signing_key(args.generate_key)}")
+    else:
+        print(publish(args.app, args.version, args.out, args.key, args.previous))
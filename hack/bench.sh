@@ -0,0 +1,23 @@
+#!/usr/bin/env bash
+
+set -o errexit
+set -o nounset
+set -o pipefail
+
+ROOT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")/.." && pwd -P)"
+source "${ROOT_DIR}/hack/lib/init.sh"
+
+function bench() {
+  # make takes options after the target as its own, they are passed in ARGS:
+  # e.g. make bench ARGS="--variant upx1-O0 --variant upx0-O2 --budget budget.json"
+  # shellcheck disable=SC2086
+  poetry run python -m gpustack_helper.bundle_bench ${ARGS:-} "$@"
+}
+
+#
+# main
+#
+
+gpustack::log::info "+++ BENCH +++"
+bench "$@"
+gpustack::log::info "--- BENCH ---"
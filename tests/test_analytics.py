@@ -0,0 +1,27 @@
+from gpustack_helper.logs import analytics
+from gpustack_helper.logs.analytics import LogAnalyzer
+
+line = b"2025-06-10T10:00:00+08:00 - gpustack.worker - INFO - hello\n"
+
+
+def _analyzer(tmp_path, content: bytes) -> LogAnalyzer:
+    log = tmp_path / "gpustack.log"
+    log.write_bytes(content)
+    return LogAnalyzer(str(log), str(tmp_path / "state.json"))
+
+
+def test_background_poll_catches_up(tmp_path, monkeypatch):
+    # the limit falls in the middle of a line, no poll reads it all
+    monkeypatch.setattr(analytics, "_max_read_per_poll", len(line) * 3 + 7)
+    analyzer = _analyzer(tmp_path, line * 100)
+    analyzer.poll_in_background()
+    analyzer._thread.join(timeout=10)
+    assert analyzer.offset == len(line) * 100
+
+
+def test_line_longer_than_a_poll(tmp_path, monkeypatch):
+    monkeypatch.setattr(analytics, "_max_read_per_poll", 64)
+    analyzer = _analyzer(tmp_path, b"x" * 200 + b"\n" + line)
+    analyzer.poll_in_background()
+    analyzer._thread.join(timeout=10)
+    assert analyzer.offset == 201 + len(line)
@@ -0,0 +1,15 @@
+from gpustack_helper.artifacts import ArtifactCache, file_sha256
+
+
+def test_restore_verifies_the_stored_content(tmp_path):
+    cache = ArtifactCache(str(tmp_path / "cache"))
+    binary = tmp_path / "llama-box"
+    binary.write_bytes(b"binary")
+    key = file_sha256(binary)
+    cache.put(key, binary)
+    assert cache.restore(key, tmp_path / "restored", verify=True) is not None
+    # written in place through the hardlink shared with the cache
+    with open(binary, "r+b") as f:
+        f.write(b"BINARY")
+    assert cache.restore(key, tmp_path / "again", verify=True) is None
+    assert not cache.has(key)
@@ -0,0 +1,92 @@
+import hashlib
+import io
+import zipfile
+
+import pytest
+import requests
+
+from gpustack_helper import download_nssm
+from gpustack_helper.artifacts import ArtifactCache
+from gpustack_helper.downloads import (
+    ChecksumMismatch,
+    DownloadScheduler,
+    serve_directory,
+)
+
+version = download_nssm.NSSM_VERSION
+
+
+@pytest.fixture
+def release(tmp_path):
+    """
+    A stand-in for the release zip with the layout of the official one.
+    """
+    path = tmp_path / "release"
+    path.mkdir()
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_STORED) as z:
+        for arch in ("win32", "win64"):
+            z.writestr(f"{version}/{arch}/nssm.exe", arch.encode() * 2**18)
+    (path / f"{version}.zip").write_bytes(buffer.getvalue())
+    return path
+
+
+@pytest.fixture
+def serve(release, monkeypatch):
+    with serve_directory(str(release)) as base_url:
+        monkeypatch.setattr(
+            download_nssm, "NSSM_DOWNLOAD_URL", f"{base_url}/{version}.zip"
+        )
+        yield release / f"{version}.zip"
+
+
+def _pin(monkeypatch, sha256: str) -> None:
+    monkeypatch.setattr(download_nssm, "NSSM_SHA256", sha256)
+
+
+def test_digest_mismatch_fails(serve, tmp_path, monkeypatch):
+    _pin(monkeypatch, "0" * 64)
+    cache = ArtifactCache(str(tmp_path / "cache"))
+    with pytest.raises(ChecksumMismatch):
+        download_nssm.download_nssm(str(tmp_path / "build"), "win64", cache)
+    assert not cache.has("0" * 64)
+    assert not (tmp_path / "build" / version).exists()
+
+
+def test_resumed_download(serve, tmp_path, monkeypatch):
+    content = serve.read_bytes()
+    _pin(monkeypatch, hashlib.sha256(content).hexdigest())
+    calls = []
+
+    class FlakyScheduler(DownloadScheduler):
+        def __init__(self, **kwargs):
+            super().__init__(backoff=0, report=lambda _: None, **kwargs)
+
+        def _fetch(self, url, target, sha256, first_attempt, resume):
+            calls.append(first_attempt)
+            if first_attempt:
+                target.write_bytes(content[: len(content) // 2])
+                raise requests.ConnectionError("dropped")
+            return super()._fetch(url, target, sha256, first_attempt, resume)
+
+    monkeypatch.setattr(download_nssm, "DownloadScheduler", FlakyScheduler)
+    cache = ArtifactCache(str(tmp_path / "cache"))
+    target = download_nssm.download_nssm(str(tmp_path / "build"), "win32", cache)
+    assert calls == [True, False]
+    with open(target, "rb") as f:
+        assert f.read() == b"win32" * 2**18
+    assert not (cache.root / "partial" / f"{version}.zip").exists()
+
+
+def test_unpinned_digest_is_recorded(serve, tmp_path, monkeypatch):
+    _pin(monkeypatch, "")
+    cache = ArtifactCache(str(tmp_path / "cache"))
+    download_nssm.fetch_nssm_archive(cache)
+    sha256 = hashlib.sha256(serve.read_bytes()).hexdigest()
+    assert cache.get_ref(f"nssm-{version}") == {"sha256": sha256}
+
+    # a later build enforces the recorded digest
+    serve.write_bytes(b"tampered")
+    cache.object_path(sha256).unlink()
+    with pytest.raises(ChecksumMismatch):
+        download_nssm.fetch_nssm_archive(cache)
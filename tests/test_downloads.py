@@ -0,0 +1,125 @@
+import hashlib
+import os
+import threading
+import time
+
+import pytest
+import requests
+
+from gpustack_helper.downloads import DownloadError, DownloadScheduler, serve_directory
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "source"
+    path.mkdir()
+    (path / "file.bin").write_bytes(os.urandom(3 * 2**20))
+    return path
+
+
+def _sha256(path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def _fail_first_attempt(scheduler, partial: bytes):
+    """
+    Leave `partial` behind and fail the first attempt like a dropped
+    connection, so the second one resumes from it.
+    """
+    fetch = scheduler._fetch
+    calls = []
+
+    def flaky(url, target, sha256, first_attempt, resume):
+        calls.append(first_attempt)
+        if first_attempt:
+            target.write_bytes(partial)
+            raise requests.ConnectionError("dropped")
+        return fetch(url, target, sha256, first_attempt, resume)
+
+    scheduler._fetch = flaky
+    return calls
+
+
+def test_resume_after_dropped_connection(source, tmp_path):
+    target = tmp_path / "file.bin"
+    content = (source / "file.bin").read_bytes()
+    with serve_directory(str(source)) as base_url:
+        with DownloadScheduler(backoff=0, report=lambda _: None) as scheduler:
+            calls = _fail_first_attempt(scheduler, content[: 2**20])
+            received = scheduler.download(
+                f"{base_url}/file.bin", target, _sha256(source / "file.bin"), True
+            )
+    assert calls == [True, False]
+    assert received == len(content)
+    assert target.read_bytes() == content
+
+
+def test_stale_partial_starts_over(source, tmp_path):
+    target = tmp_path / "file.bin"
+    with serve_directory(str(source)) as base_url:
+        with DownloadScheduler(backoff=0, report=lambda _: None) as scheduler:
+            # longer than the remote file, its range can't be satisfied
+            calls = _fail_first_attempt(scheduler, b"x" * (4 * 2**20))
+            scheduler.download(
+                f"{base_url}/file.bin", target, _sha256(source / "file.bin"), True
+            )
+    assert calls == [True, False, False]
+    assert target.read_bytes() == (source / "file.bin").read_bytes()
+
+
+def test_client_errors_are_final(source, tmp_path):
+    with serve_directory(str(source)) as base_url:
+        with DownloadScheduler(backoff=0, report=lambda _: None) as scheduler:
+            with pytest.raises(DownloadError):
+                scheduler.download(f"{base_url}/missing.bin", tmp_path / "missing")
+
+
+def test_map_is_bounded_by_workers():
+    running, peak = [0], [0]
+    lock = threading.Lock()
+
+    def task(n):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.05)
+        with lock:
+            running[0] -= 1
+        return n * 2
+
+    with DownloadScheduler(workers=3, report=lambda _: None) as scheduler:
+        results = scheduler.map(task, {str(n): n for n in range(12)})
+    assert results == {str(n): n * 2 for n in range(12)}
+    assert peak[0] == 3
+
+
+def test_map_cancels_pending_after_a_failure():
+    started = []
+
+    def task(n):
+        started.append(n)
+        if n == 0:
+            raise DownloadError("broken")
+        time.sleep(0.05)
+        return n
+
+    with DownloadScheduler(workers=1, report=lambda _: None) as scheduler:
+        with pytest.raises(DownloadError, match="Failed to fetch 0"):
+            scheduler.map(task, {str(n): n for n in range(10)})
+    assert len(started) < 10
+
+
+def test_parallel_downloads(source, tmp_path):
+    for n in range(6):
+        (source / f"part-{n}.bin").write_bytes(os.urandom(2**20))
+    names = sorted(os.listdir(source))
+    with serve_directory(str(source), delay=0.05) as base_url:
+        with DownloadScheduler(workers=4, report=lambda _: None) as scheduler:
+            scheduler.map(
+                lambda name: scheduler.download(
+                    f"{base_url}/{name}", tmp_path / name, _sha256(source / name)
+                ),
+                {name: name for name in names},
+            )
+    for name in names:
+        assert (tmp_path / name).read_bytes() == (source / name).read_bytes()
@@ -0,0 +1,27 @@
+import os
+from types import SimpleNamespace
+
+from gpustack_helper import migration
+from gpustack_helper.migration import migrate_data, needs_data_migration
+
+
+def test_conflicts_are_reported_once(tmp_path, monkeypatch):
+    legacy = tmp_path / "legacy"
+    active = tmp_path / "active"
+    os.makedirs(legacy)
+    os.makedirs(active)
+    (legacy / "database.db").write_bytes(b"old")
+    (legacy / "model.gguf").write_bytes(b"weights")
+    (active / "database.db").write_bytes(b"newer")
+    monkeypatch.setattr(migration, "legacy_data_dir", str(legacy))
+    cfg = SimpleNamespace(active_data_dir=str(active))
+
+    assert needs_data_migration(cfg)
+    report = migrate_data(cfg)
+    assert report.conflicts == 1
+    assert (active / "model.gguf").read_bytes() == b"weights"
+    assert (active / "database.db").read_bytes() == b"newer"
+    # the legacy dir is kept, but not migrated again on the next start
+    assert legacy.is_dir()
+    assert not needs_data_migration(cfg)
+    assert migrate_data(cfg).files == 0
@@ -0,0 +1,63 @@
+import json
+import os
+import urllib.request
+import zipfile
+
+from gpustack_helper.artifacts import ArtifactCache, file_sha256
+from gpustack_helper.downloads import extract_zip
+from gpustack_helper.mirror import ArtifactMirror, fill_from_bundle
+
+url_dir = "gpustack/llama-box/releases/download/v0.0.1"
+
+
+def _bundle(bin_dir):
+    os.makedirs(bin_dir)
+    for target in ("llama-box-darwin-arm64-mps", "llama-box-darwin-arm64-cpu"):
+        with open(bin_dir / target, "wb") as f:
+            f.write(target.encode() * 1024)
+        os.chmod(bin_dir / target, 0o755)
+    with open(bin_dir / "release.json", "w") as f:
+        json.dump(
+            {
+                "repo": "gpustack/llama-box",
+                "version": "v0.0.1",
+                "archives": {
+                    "llama-box-darwin-arm64-mps": "llama-box-darwin-arm64-metal.zip",
+                    "llama-box-darwin-arm64-cpu": "llama-box-darwin-arm64-cpu.zip",
+                    "llama-box-darwin-arm64-vulkan": "llama-box-darwin-arm64-vulkan.zip",
+                },
+            },
+            f,
+        )
+
+
+def test_fill_from_bundle(tmp_path):
+    bin_dir = tmp_path / "bin" / "llama-box"
+    _bundle(bin_dir)
+    cache = ArtifactCache(str(tmp_path / "cache"))
+    assert fill_from_bundle(cache, bin_dir) == 2
+    assert fill_from_bundle(cache, bin_dir) == 0
+
+    mirror = ArtifactMirror(str(cache.mirror_root), ("127.0.0.1", 0))
+    mirror.start()
+    try:
+        base = f"http://127.0.0.1:{mirror.port}/{url_dir}"
+        with urllib.request.urlopen(f"{base}/sha256sum.txt") as response:
+            listed = dict(
+                reversed(line.split()) for line in response.read().decode().splitlines()
+            )
+        # the variant which isn't bundled isn't listed
+        assert sorted(listed) == [
+            "llama-box-darwin-arm64-cpu.zip",
+            "llama-box-darwin-arm64-metal.zip",
+        ]
+        archive = tmp_path / "metal.zip"
+        urllib.request.urlretrieve(f"{base}/llama-box-darwin-arm64-metal.zip", archive)
+    finally:
+        mirror.stop()
+    assert file_sha256(archive) == listed["llama-box-darwin-arm64-metal.zip"]
+    assert zipfile.ZipFile(archive).namelist() == ["llama-box"]
+    extract_zip(archive, tmp_path / "out")
+    binary = tmp_path / "out" / "llama-box"
+    assert binary.read_bytes() == (bin_dir / "llama-box-darwin-arm64-mps").read_bytes()
+    assert os.stat(binary).st_mode & 0o111
@@ -0,0 +1,90 @@
+import pytest
+
+from gpustack_helper.qos import (
+    Activity,
+    ActivitySource,
+    FakeActivitySource,
+    Level,
+    QoSEngine,
+    QoSPolicy,
+    simulate,
+)
+
+policy = QoSPolicy(
+    active_idle_seconds=30, restore_idle_seconds=300, engage_after=10, min_interval=30
+)
+
+
+def _trace(idle_at, fullscreen_at=lambda t: False, until=1200, step=2):
+    return [
+        (float(t), Activity(float(idle_at(t)), fullscreen_at(t)))
+        for t in range(0, until, step)
+    ]
+
+
+def test_activity_source_is_abstract():
+    with pytest.raises(TypeError):
+        ActivitySource()
+
+
+def test_stays_full_while_idle():
+    assert simulate(_trace(lambda t: 600 + t), policy) == []
+
+
+def test_engages_after_sustained_activity():
+    changes = simulate(_trace(lambda t: t % 20), policy)
+    assert changes == [(10.0, Level.BACKGROUND)]
+
+
+def test_unknown_idle_keeps_the_level():
+    trace = [(float(t), Activity(None)) for t in range(0, 600, 2)]
+    assert simulate(trace, policy) == []
+
+
+def test_hysteresis_between_active_and_restore():
+    # active for a minute, then idle: the level only comes back once the
+    # user was away for restore_idle_seconds, not when crossing 30s
+    changes = simulate(_trace(lambda t: t % 20 if t < 60 else t - 60), policy)
+    assert changes == [(10.0, Level.BACKGROUND), (360.0, Level.FULL)]
+
+
+def test_min_interval_between_changes():
+    restore_quickly = QoSPolicy(
+        active_idle_seconds=30,
+        restore_idle_seconds=30,
+        engage_after=0,
+        min_interval=120,
+    )
+    # active, away, active again: the changes are held back by min_interval
+    changes = simulate(
+        _trace(lambda t: 0 if t < 10 or t >= 50 else t - 10, until=400),
+        restore_quickly,
+    )
+    assert changes[0] == (0.0, Level.BACKGROUND)
+    times = [at for at, _ in changes]
+    assert all(b - a >= 120 for a, b in zip(times, times[1:]))
+
+
+def test_fullscreen_counts_as_active():
+    changes = simulate(
+        _trace(lambda t: 600 + t, fullscreen_at=lambda t: 100 <= t < 200), policy
+    )
+    assert changes == [(110.0, Level.BACKGROUND), (200.0, Level.FULL)]
+
+
+def test_failed_apply_is_retried():
+    now = [0.0]
+    calls = []
+
+    def apply(level):
+        calls.append(level)
+        if len(calls) == 1:
+            raise PermissionError("denied")
+
+    source = FakeActivitySource(0.0)
+    engine = QoSEngine(source, apply, policy, lambda: now[0])
+    for t in range(0, 100, 2):
+        now[0] = float(t)
+        engine.tick()
+    assert calls == [Level.BACKGROUND, Level.BACKGROUND]
+    assert engine.level == Level.BACKGROUND
@@ -0,0 +1,63 @@
+import errno
+import os
+
+import pytest
+
+from gpustack_helper import snapshots
+from gpustack_helper.snapshots import SnapshotPolicy, SnapshotStore
+
+
+def _store(tmp_path, keep=5) -> SnapshotStore:
+    data_dir = tmp_path / "GPUStack"
+    os.makedirs(data_dir / "cache")
+    (data_dir / "cache" / "model.gguf").write_bytes(b"weights")
+    (data_dir / "worker.bin").write_bytes(b"state")
+    return SnapshotStore(
+        str(tmp_path / "snapshots"), str(data_dir), policy=SnapshotPolicy(keep=keep)
+    )
+
+
+def test_mutable_files_are_never_hardlinked(tmp_path):
+    store = _store(tmp_path)
+    snapshot = store.create()
+    copied = os.path.join(snapshot.data_path, "worker.bin")
+    assert not os.path.samefile(copied, os.path.join(store.data_dir, "worker.bin"))
+    with open(os.path.join(store.data_dir, "worker.bin"), "r+b") as f:
+        f.write(b"STATE")
+    with open(copied, "rb") as f:
+        assert f.read() == b"state"
+
+
+def test_restore_across_filesystems_keeps_the_target(tmp_path, monkeypatch):
+    store = _store(tmp_path, keep=1)
+    target = store.create(label="good")
+    (tmp_path / "GPUStack" / "worker.bin").write_bytes(b"broken")
+    rename = os.rename
+
+    def cross_device(src, dst):
+        if src == store.data_dir:
+            raise OSError(errno.EXDEV, "Invalid cross-device link")
+        rename(src, dst)
+
+    monkeypatch.setattr(snapshots.os, "rename", cross_device)
+    before = store.restore(target.id)
+    assert (tmp_path / "GPUStack" / "worker.bin").read_bytes() == b"state"
+    ids = [s.id for s in store.list()]
+    assert target.id in ids and before.id in ids
+
+
+def test_failed_take_over_keeps_the_data_dir(tmp_path, monkeypatch):
+    store = _store(tmp_path)
+    target = store.create(label="good")
+    (tmp_path / "GPUStack" / "worker.bin").write_bytes(b"current")
+
+    def fail(snapshot):
+        raise OSError(errno.ENOSPC, "No space left on device")
+
+    monkeypatch.setattr(store, "_commit", fail)
+    with pytest.raises(OSError):
+        store.restore(target.id)
+    assert (tmp_path / "GPUStack" / "worker.bin").read_bytes() == b"current"
+    assert (tmp_path / "GPUStack" / "cache" / "model.gguf").read_bytes() == b"weights"
+    assert [s.id for s in store.list()] == [target.id]
+    assert not [n for n in os.listdir(store.root) if n.startswith(".")]
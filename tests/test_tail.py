@@ -0,0 +1,30 @@
+from gpustack_helper.logs import tail
+from gpustack_helper.logs.tail import LogFollower
+
+
+def test_follows_appends(tmp_path):
+    path = tmp_path / "gpustack.log"
+    path.write_bytes(b"one\ntwo\n")
+    follower = LogFollower(str(path))
+    assert follower.reset() == ["one", "two"]
+    with open(path, "ab") as f:
+        f.write(b"three\nfo")
+    assert follower.poll() == (["three"], False)
+    with open(path, "ab") as f:
+        f.write(b"ur\n")
+    assert follower.poll() == (["four"], False)
+
+
+def test_line_longer_than_a_poll(tmp_path, monkeypatch):
+    monkeypatch.setattr(tail, "_max_poll_bytes", 16)
+    path = tmp_path / "gpustack.log"
+    path.write_bytes(b"")
+    follower = LogFollower(str(path))
+    follower.reset()
+    with open(path, "ab") as f:
+        f.write(b"x" * 40 + b"\nafter\n")
+    lines = []
+    for _ in range(5):
+        lines += follower.poll()[0]
+    assert "".join(lines[:-1]) == "x" * 40
+    assert lines[-1] == "after"
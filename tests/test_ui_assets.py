@@ -0,0 +1,40 @@
+import os
+import sys
+
+from gpustack_helper import ui_assets
+from gpustack_helper.ui_assets import precompress, remove_siblings
+
+
+def _ui(tmp_path):
+    ui_dir = tmp_path / "ui"
+    ui_dir.mkdir()
+    (ui_dir / "umi.3f2a1b9c.js").write_text("console.log('gpustack');\n" * 200)
+    (ui_dir / "vendor.js.gz").write_bytes(b"shipped by the package")
+    return ui_dir
+
+
+def test_siblings_follow_new_codecs(tmp_path, monkeypatch):
+    ui_dir = _ui(tmp_path)
+    monkeypatch.setitem(sys.modules, "brotli", None)
+    precompress(str(ui_dir))
+    assert not (ui_dir / "umi.3f2a1b9c.js.br").exists()
+
+    class Brotli:
+        @staticmethod
+        def compress(data, quality):
+            return data[: len(data) // 10]
+
+    monkeypatch.setitem(sys.modules, "brotli", Brotli)
+    report = precompress(str(ui_dir))
+    assert report.reused == 0
+    assert (ui_dir / "umi.3f2a1b9c.js.br").exists()
+    assert precompress(str(ui_dir)).reused == 1
+
+
+def test_remove_siblings(tmp_path, monkeypatch):
+    ui_dir = _ui(tmp_path)
+    monkeypatch.setitem(sys.modules, "brotli", None)
+    precompress(str(ui_dir))
+    assert remove_siblings(str(ui_dir)) == 1
+    assert sorted(os.listdir(ui_dir)) == ["umi.3f2a1b9c.js", "vendor.js.gz"]
+    assert not os.path.exists(ui_dir / ui_assets.manifest_name)
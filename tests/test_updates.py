@@ -0,0 +1,106 @@
+import base64
+import json
+import os
+import random
+import shutil
+import sys
+
+import pytest
+
+pytest.importorskip("cryptography")
+
+from gpustack_helper.downloads import serve_directory  # noqa: E402
+from gpustack_helper.updates import (  # noqa: E402
+    Updater,
+    apply_staged_update,
+    generate_signing_key,
+    latest_name,
+    publish,
+    scan,
+    staging_dir,
+    write_installed_manifest,
+)
+
+pytestmark = pytest.mark.skipif(
+    sys.platform == "darwin" and os.geteuid() != 0,
+    reason="updates are applied by root on macOS",
+)
+
+
+def _build(root: str, version: bytes) -> None:
+    os.makedirs(os.path.join(root, "lib"), exist_ok=True)
+    with open(os.path.join(root, "gpustack"), "wb") as f:
+        f.write(version * 1024)
+    os.chmod(os.path.join(root, "gpustack"), 0o755)
+    for i in range(4):
+        with open(os.path.join(root, "lib", f"lib{i}.so"), "wb") as f:
+            f.write(random.Random(i).randbytes(256 * 1024))
+
+
+def _digests(root: str):
+    return {rel: e["sha256"] for rel, e in scan(root, "")["files"].items()}
+
+
+@pytest.fixture
+def channel(tmp_path):
+    """
+    Two published versions and an install of the first one.
+    """
+    v1, v2, out = (str(tmp_path / n) for n in ("v1", "v2", "out"))
+    _build(v1, b"v1")
+    _build(v2, b"v2")
+    os.remove(os.path.join(v2, "lib", "lib3.so"))
+    key_path = str(tmp_path / "key.pem")
+    public_key = base64.b64decode(generate_signing_key(key_path))
+    publish(v1, "1.0.0", out, key_path)
+    publish(v2, "1.1.0", out, key_path, [v1])
+    install = str(tmp_path / "install" / "GPUStack")
+    shutil.copytree(v1, install)
+    write_installed_manifest(install, "1.0.0")
+    return v2, out, install, public_key
+
+
+def test_update_end_to_end(channel):
+    v2, out, install, public_key = channel
+    with serve_directory(out) as base_url:
+        plan = Updater(base_url, install, lambda _: None, public_key).update()
+    assert plan.version == "1.1.0"
+    # the unchanged libraries aren't downloaded again
+    assert len(plan.reuse) == 3
+    assert apply_staged_update(install, public_key) == "1.1.0"
+    assert _digests(install) == _digests(v2)
+    assert not os.path.exists(staging_dir(install))
+
+
+def test_rejects_unsigned_latest(channel, tmp_path):
+    _, out, install, _ = channel
+    other = base64.b64decode(generate_signing_key(str(tmp_path / "other.pem")))
+    with serve_directory(out) as base_url:
+        with pytest.raises(RuntimeError, match="signature"):
+            Updater(base_url, install, lambda _: None, other).update()
+
+
+def test_rejects_tampered_latest(channel):
+    _, out, install, public_key = channel
+    path = os.path.join(out, latest_name)
+    with open(path, "r") as f:
+        latest = json.load(f)
+    latest["version"] = "9.9.9"
+    with open(path, "w") as f:
+        json.dump(latest, f)
+    with serve_directory(out) as base_url:
+        with pytest.raises(RuntimeError, match="signature"):
+            Updater(base_url, install, lambda _: None, public_key).update()
+
+
+def test_rejects_tampered_staging(channel):
+    _, out, install, public_key = channel
+    before = _digests(install)
+    with serve_directory(out) as base_url:
+        Updater(base_url, install, lambda _: None, public_key).update()
+    # written after the download was verified, e.g. by another user process
+    with open(os.path.join(staging_dir(install), "gpustack"), "wb") as f:
+        f.write(b"#!/bin/sh\n")
+    with pytest.raises(RuntimeError, match="Checksum mismatch"):
+        apply_staged_update(install, public_key)
+    assert _digests(install) == before
@@ -2,7 +2,10 @@
 import os
 from PyInstaller.utils.hooks import collect_all
 from gpustack_helper.tools import download, get_package_dir
-from gpustack_helper.download_nssm import download_nssm, NSSM_VERSION
+from gpustack_helper.download_nssm import download_nssm, NSSM_ARCH, NSSM_VERSION
+from gpustack_helper.updates import public_key_datas, write_installed_manifest
+from gpustack_helper.ui_assets import precompress, print_report, remove_siblings, spec_precompress
+from gpustack_helper.bundle_bench import spec_optimize, spec_upx, write_size_report
 
 app_name = 'GPUStack'
 
@@ -13,12 +16,20 @@ datas = [
   (get_package_dir('gpustack.third_party'),'./gpustack/third_party'),
   (os.path.join(get_package_dir('gpustack.detectors.fastfetch'),'*.jsonc'), './gpustack/detectors/fastfetch/'),
   ('./tray_icon.png', './'),
-  (f'./build/{NSSM_VERSION}/win64/nssm.exe', './'),
+  (f'./build/{NSSM_VERSION}/{NSSM_ARCH}/nssm.exe', './'),
 ]
+# the key latest.json of the update channel is signed with
+datas += public_key_datas(os.path.join(os.getcwd(), 'build'))
 
 # download nssm to ${pwd}/build dir
 download_nssm(os.path.join(os.getcwd(), 'build'))
 download()
+# GPUSTACK_PRECOMPRESS_UI=0 builds without the precompressed siblings of
+# the web console, removing the ones an earlier build left in the package
+if spec_precompress():
+    print_report(precompress(get_package_dir('gpustack.ui')))
+else:
+    remove_siblings(get_package_dir('gpustack.ui'))
 
 binaries = []
 hiddenimports = []
@@ -37,7 +48,7 @@ a = Analysis(
     runtime_hooks=[],
     excludes=[],
     noarchive=False,
-    optimize=0,
+    optimize=spec_optimize(),
 )
 pyz = PYZ(a.pure)
 
@@ -50,7 +61,7 @@ exe = EXE(
     debug=False,
     bootloader_ignore_signals=False,
     strip=False,
-    upx=True,
+    upx=spec_upx(),
     console=True,
     disable_windowed_traceback=False,
     argv_emulation=False,
@@ -64,7 +75,17 @@ coll = COLLECT(
     a.binaries,
     a.datas,
     strip=False,
-    upx=True,
+    upx=spec_upx(),
     upx_exclude=[],
     name='main',
 )
+
+# sizes per package of every analysis, see gpustack_helper/bundle_bench.py
+write_size_report({'helper': a}, os.path.join(DISTPATH, 'bundle-sizes.json'))
+
+# no dedup here, the installer and zip packaging expand hardlinks into
+# full copies again, see gpustack_helper/dedup.py
+
+# per file manifest diffed by the delta updater
+version = os.getenv('GIT_VERSION', '0.99.0.0').removeprefix('v')
+write_installed_manifest(os.path.join(DISTPATH, 'main'), version)